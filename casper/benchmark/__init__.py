@@ -0,0 +1,13 @@
+#! /usr/bin/env python
+##########################################################################
+# CASPER - Copyright (C) AGrigis, 2013
+# Distributed under the terms of the CeCILL-B license, as published by
+# the CEA-CNRS-INRIA. Refer to the LICENSE file or to
+# http://www.cecill.info/licences/Licence_CeCILL-B_V1-en.html
+# for details.
+##########################################################################
+
+""" Benchmarks of the casper pipeline engine.
+
+Each module can be executed as a script and prints its timings.
+"""
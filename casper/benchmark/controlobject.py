@@ -0,0 +1,84 @@
+#! /usr/bin/env python
+##########################################################################
+# CASPER - Copyright (C) AGrigis, 2013
+# Distributed under the terms of the CeCILL-B license, as published by
+# the CEA-CNRS-INRIA. Refer to the LICENSE file or to
+# http://www.cecill.info/licences/Licence_CeCILL-B_V1-en.html
+# for details.
+##########################################################################
+
+""" Measure the time needed to set and get the controls of a control
+object.
+
+Control objects with 'nb_controls' integer controls are created and all
+their controls are set and got by name 'repeat' times. The control object
+is compared with the list-based registry it replaces.
+"""
+
+# System import
+import timeit
+
+# Casper import
+from casper.lib.controls import controls
+from casper.pipeline.utils import ControlObject
+
+
+class ListControlObject(object):
+    """ The former control object storing the control names in a list.
+    """
+    def __init__(self):
+        self.controls = []
+
+    def __getitem__(self, name):
+        if name in self.controls:
+            return getattr(self, name)
+        raise ValueError(name)
+
+    def __setattr__(self, name, value):
+        if hasattr(self, "controls") and name not in self.controls:
+            self.controls.append(name)
+        if hasattr(self, name):
+            self.__getattribute__(name).value = value
+        else:
+            super(ListControlObject, self).__setattr__(name, value)
+
+
+def benchmark(sizes=(10, 100, 1000, 5000), repeat=5):
+    """ Compare the list and dict based control registries.
+
+    Parameters
+    ----------
+    sizes: list of int (optional)
+        the numbers of controls.
+    repeat: int (optional, default 5)
+        the number of times all the controls are set and got.
+
+    Returns
+    -------
+    measures: list of 3-uplet
+        the number of controls and the time in seconds needed to set and
+        get all the controls with the list and the dict registries.
+    """
+    measures = []
+    for size in sizes:
+        names = ["control{0}".format(index) for index in range(size)]
+        result = [size]
+        for klass in (ListControlObject, ControlObject):
+            controller = klass()
+            for name in names:
+                setattr(controller, name, controls["Int"]())
+            tic = timeit.default_timer()
+            for index in range(repeat):
+                for name in names:
+                    setattr(controller, name, index)
+                    controller[name]
+            result.append(timeit.default_timer() - tic)
+        measures.append(tuple(result))
+    return measures
+
+
+if __name__ == "__main__":
+    print("{0:>10} {1:>12} {2:>12}".format("controls", "list (s)", "dict (s)"))
+    for size, list_time, dict_time in benchmark():
+        print("{0:>10} {1:>12.4f} {2:>12.4f}".format(
+            size, list_time, dict_time))
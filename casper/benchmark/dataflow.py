@@ -0,0 +1,145 @@
+#! /usr/bin/env python
+##########################################################################
+# CASPER - Copyright (C) AGrigis, 2013
+# Distributed under the terms of the CeCILL-B license, as published by
+# the CEA-CNRS-INRIA. Refer to the LICENSE file or to
+# http://www.cecill.info/licences/Licence_CeCILL-B_V1-en.html
+# for details.
+##########################################################################
+
+""" Measure the time needed to propagate the box outputs through the links
+of a pipeline.
+
+A pipeline of 'nb_links' links between list-valued controls is created:
+each box output feeds the next box and every box also reads the pipeline
+input. The outputs of all the boxes are set with one control set per
+output, each propagated by the observers, and with a single batch update
+of the pipeline dataflow table.
+"""
+
+# System import
+import os
+import sys
+import shutil
+import tempfile
+import timeit
+
+# Casper import
+from casper.pipeline import Pbox
+
+
+def create_list_pipeline(directory, nb_links):
+    """ Create a module containing a pipeline of list-valued boxes.
+
+    Parameters
+    ----------
+    directory: str (mandatory)
+        the directory where the module is created.
+    nb_links: int (mandatory)
+        the number of links between the boxes.
+
+    Returns
+    -------
+    xmldesc: str
+        the pipeline description.
+    """
+    module_name = "casper_benchmark_dataflow"
+    module_dir = os.path.join(directory, module_name)
+    os.mkdir(module_dir)
+    open(os.path.join(module_dir, "__init__.py"), "w").close()
+    with open(os.path.join(module_dir, "functions.py"), "w") as open_file:
+        open_file.write("\n".join([
+            "def forward(values, offsets):",
+            "    \"\"\" Forward the input values.",
+            "",
+            "    <unit>",
+            "        <input name=\"values\" type=\"List\" content=\"Float\" "
+            "description=\"in\"/>",
+            "        <input name=\"offsets\" type=\"List\" content=\"Float\" "
+            "description=\"in\"/>",
+            "        <output name=\"outp\" type=\"List\" content=\"Float\" "
+            "description=\"out\"/>",
+            "    </unit>",
+            "    \"\"\"",
+            "    outp = values",
+            "    return outp",
+            ""]))
+    nb_units = nb_links // 2 + 1
+    units = ["        <unit name=\"u{0}\">\n"
+             "            <module>{1}.functions.forward</module>\n"
+             "        </unit>".format(index, module_name)
+             for index in range(nb_units)]
+    links = ["        <link source=\"inp\" destination=\"u0.values\"/>",
+             "        <link source=\"offsets\" destination=\"u0.offsets\"/>",
+             "        <link source=\"u{0}.outp\" destination=\"outp\"/>"
+             "".format(nb_units - 1)]
+    for index in range(1, nb_units):
+        links.extend([
+            "        <link source=\"u{0}.outp\" destination=\"u{1}.values\"/>"
+            "".format(index - 1, index),
+            "        <link source=\"offsets\" destination=\"u{0}.offsets\"/>"
+            "".format(index)])
+    with open(os.path.join(module_dir, "pipeline.xml"), "w") as open_file:
+        open_file.write("\n".join(
+            ["<pipeline version=\"1.0\">", "    <units>"] + units +
+            ["    </units>", "    <links>"] + links +
+            ["    </links>", "</pipeline>", ""]))
+    sys.path.insert(0, directory)
+    return "{0}.pipeline.xml".format(module_name)
+
+
+def benchmark(nb_links=500, sizes=(10, 1000, 10000), repeat=5):
+    """ Compare the observer propagation with the batch update.
+
+    Parameters
+    ----------
+    nb_links: int (optional, default 500)
+        the number of links in the pipeline.
+    sizes: list of int (optional)
+        the lengths of the list values.
+    repeat: int (optional, default 5)
+        the number of updates of all the outputs.
+
+    Returns
+    -------
+    measures: list of 3-uplet
+        the length of the list values and the time in seconds needed to
+        update all the outputs with the observers and in batch.
+    """
+    directory = tempfile.mkdtemp()
+    try:
+        pbox = Pbox(create_list_pipeline(directory, nb_links))
+    finally:
+        sys.path.remove(directory)
+        shutil.rmtree(directory)
+    boxes = [pbox._boxes[name] for name in sorted(
+        pbox._boxes, key=lambda name: int(name[1:]))]
+    measures = []
+    for size in sizes:
+        values = [float(index) for index in range(size)]
+        pbox.inputs.offsets = values
+        result = [size]
+
+        # Set the outputs one by one
+        tic = timeit.default_timer()
+        for index in range(repeat):
+            for box in boxes:
+                box.outputs.outp = values
+        result.append(timeit.default_timer() - tic)
+
+        # Set the outputs in batch
+        tic = timeit.default_timer()
+        for index in range(repeat):
+            pbox.update_controls(
+                [(box.outputs.outp, values) for box in boxes])
+        result.append(timeit.default_timer() - tic)
+        measures.append(tuple(result))
+    return measures
+
+
+if __name__ == "__main__":
+    print("{0:>10} {1:>16} {2:>12}".format(
+        "list size", "observers (s)", "batch (s)"))
+    for size, observer_time, batch_time in benchmark():
+        print("{0:>10} {1:>16.4f} {2:>12.4f}".format(
+            size, observer_time, batch_time))
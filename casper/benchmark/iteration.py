@@ -0,0 +1,202 @@
+#! /usr/bin/env python
+##########################################################################
+# CASPER - Copyright (C) AGrigis, 2013
+# Distributed under the terms of the CeCILL-B license, as published by
+# the CEA-CNRS-INRIA. Refer to the LICENSE file or to
+# http://www.cecill.info/licences/Licence_CeCILL-B_V1-en.html
+# for details.
+##########################################################################
+
+""" Measure the time needed to build the iterations of an ibox.
+
+The iterations of the 'clothing' demonstration function and of a linear
+pipeline of 'clothing' boxes are built with 'Ibox.itergraphs' and with a
+deep copy of the iterated box per iteration. The iterations of a parameter
+sweep are built from zipped lists and from the 'product' iteration mode.
+"""
+
+# System import
+import os
+import sys
+import copy
+import itertools
+import shutil
+import tempfile
+import timeit
+
+# Casper import
+from casper.pipeline import Bbox
+from casper.pipeline import Pbox
+from casper.pipeline import Ibox
+
+
+def benchmark(sizes=(1000, 5000, 20000)):
+    """ Compare the lightweight iterations with the deep copied boxes.
+
+    Parameters
+    ----------
+    sizes: list of int (optional)
+        the numbers of iterations.
+
+    Returns
+    -------
+    measures: list of 3-uplet
+        the number of iterations and the time in seconds needed to build
+        the deep copied boxes and the lightweight iterations.
+    """
+    measures = []
+    box = Bbox("casper.demo.module.clothing")
+    for size in sizes:
+        ibox = Ibox(box, iterinputs=["inp"], iteroutputs=["outp"])
+        ibox.inputs.iterinp = [str(index) for index in range(size)]
+
+        # Deep copy the iterated box
+        tic = timeit.default_timer()
+        for value in ibox.inputs.iterinp.value:
+            iterbox = copy.deepcopy(ibox.iterbox)
+            iterbox.inputs.inp = value
+        copy_time = timeit.default_timer() - tic
+
+        # Build the lightweight iterations
+        tic = timeit.default_timer()
+        ibox.itergraphs("ibox")
+        iter_time = timeit.default_timer() - tic
+        measures.append((size, copy_time, iter_time))
+    return measures
+
+
+def create_linear_pipeline(directory, nb_units):
+    """ Create a module containing a linear pipeline of 'clothing' boxes.
+
+    Parameters
+    ----------
+    directory: str (mandatory)
+        the directory where the module is created.
+    nb_units: int (mandatory)
+        the number of boxes in the pipeline.
+
+    Returns
+    -------
+    xmldesc: str
+        the pipeline description.
+    """
+    module_name = "casper_benchmark_linear"
+    module_dir = os.path.join(directory, module_name)
+    os.mkdir(module_dir)
+    open(os.path.join(module_dir, "__init__.py"), "w").close()
+    units = ["        <unit name=\"c{0}\">\n"
+             "            <module>casper.demo.module.clothing</module>\n"
+             "        </unit>".format(index) for index in range(nb_units)]
+    links = ["        <link source=\"inp\" destination=\"c0.inp\"/>",
+             "        <link source=\"c{0}.outp\" destination=\"outp\"/>"
+             "".format(nb_units - 1)]
+    links.extend([
+        "        <link source=\"c{0}.outp\" destination=\"c{1}.inp\"/>"
+        "".format(index, index + 1) for index in range(nb_units - 1)])
+    with open(os.path.join(module_dir, "pipeline.xml"), "w") as open_file:
+        open_file.write("\n".join(
+            ["<pipeline version=\"1.0\">", "    <units>"] + units +
+            ["    </units>", "    <links>"] + links +
+            ["    </links>", "</pipeline>", ""]))
+    sys.path.insert(0, directory)
+    return "{0}.pipeline.xml".format(module_name)
+
+
+def pipeline_benchmark(sizes=(100, 1000, 5000), nb_units=20):
+    """ Compare the graphs expanded from a template with the graphs created
+    from a deep copy of the iterated pipeline.
+
+    Parameters
+    ----------
+    sizes: list of int (optional)
+        the numbers of iterations.
+    nb_units: int (optional, default 20)
+        the number of boxes of the iterated pipeline.
+
+    Returns
+    -------
+    measures: list of 3-uplet
+        the number of iterations and the time in seconds needed to build
+        the graphs of the deep copied pipelines and of the lightweight
+        iterations.
+    """
+    directory = tempfile.mkdtemp()
+    try:
+        pbox = Pbox(create_linear_pipeline(directory, nb_units))
+    finally:
+        shutil.rmtree(directory)
+    measures = []
+    for size in sizes:
+        ibox = Ibox(pbox, iterinputs=["inp"], iteroutputs=["outp"])
+        ibox.inputs.iterinp = [str(index) for index in range(size)]
+
+        # Deep copy the iterated pipeline and create its graph
+        tic = timeit.default_timer()
+        for index, value in enumerate(ibox.inputs.iterinp.value):
+            iterbox = copy.deepcopy(ibox.iterbox)
+            iterbox.inputs.inp = value
+            pbox._create_graph(iterbox, prefix="ibox&{0}.".format(index),
+                               filter_inactive=True)
+        copy_time = timeit.default_timer() - tic
+
+        # Expand the template
+        tic = timeit.default_timer()
+        ibox.itergraphs("ibox")
+        iter_time = timeit.default_timer() - tic
+        measures.append((size, copy_time, iter_time))
+    return measures
+
+
+def sweep_benchmark(shape=(200, 300)):
+    """ Compare a parameter sweep defined by zipped lists with the
+    'product' iteration mode.
+
+    Parameters
+    ----------
+    shape: 2-uplet (optional, default (200, 300))
+        the numbers of values of the two swept parameters.
+
+    Returns
+    -------
+    measures: list of 3-uplet
+        the iteration mode and the times in seconds needed to set the
+        iterative inputs and to build the iterations.
+    """
+    measures = []
+    box = Bbox("casper.demo.module.array_scale")
+    arrays = [str(index) for index in range(shape[0])]
+    factors = [float(index) for index in range(shape[1])]
+    for itermode in Ibox.itermodes:
+        ibox = Ibox(box, iterinputs=["array", "factor"],
+                    iteroutputs=["scaled"], itermode=itermode)
+        tic = timeit.default_timer()
+        if itermode == "zip":
+            values = list(zip(*itertools.product(arrays, factors)))
+            ibox.inputs.iterarray = list(values[0])
+            ibox.inputs.iterfactor = list(values[1])
+        else:
+            ibox.inputs.iterarray = arrays
+            ibox.inputs.iterfactor = factors
+        toc = timeit.default_timer()
+        ibox.itergraphs("ibox")
+        measures.append(
+            (itermode, toc - tic, timeit.default_timer() - toc))
+    return measures
+
+
+if __name__ == "__main__":
+    print("{0:>12} {1:>12} {2:>12}".format(
+        "iterations", "copy (s)", "lazy (s)"))
+    for size, copy_time, iter_time in benchmark():
+        print("{0:>12} {1:>12.3f} {2:>12.3f}".format(
+            size, copy_time, iter_time))
+    print("{0:>12} {1:>12} {2:>12}".format(
+        "pipelines", "copy (s)", "template (s)"))
+    for size, copy_time, iter_time in pipeline_benchmark():
+        print("{0:>12} {1:>12.3f} {2:>12.3f}".format(
+            size, copy_time, iter_time))
+    print("{0:>12} {1:>12} {2:>12}".format(
+        "sweep", "inputs (s)", "expand (s)"))
+    for itermode, inputs_time, expand_time in sweep_benchmark():
+        print("{0:>12} {1:>12.3f} {2:>12.3f}".format(
+            itermode, inputs_time, expand_time))
@@ -0,0 +1,150 @@
+#! /usr/bin/env python
+##########################################################################
+# CASPER - Copyright (C) AGrigis, 2013
+# Distributed under the terms of the CeCILL-B license, as published by
+# the CEA-CNRS-INRIA. Refer to the LICENSE file or to
+# http://www.cecill.info/licences/Licence_CeCILL-B_V1-en.html
+# for details.
+##########################################################################
+
+""" Measure the time needed to load a pipeline of repeated units.
+
+A linear pipeline of 'nb_units' boxes calling 'nb_functions' distinct
+functions is loaded with an empty prototype registry. The loading time is
+compared with the time needed to create one bbox per distinct function.
+"""
+
+# System import
+import os
+import sys
+import shutil
+import tempfile
+import timeit
+
+# Casper import
+from casper.pipeline import Bbox
+from casper.pipeline import Pbox
+from casper.pipeline.compiled import prototypes
+
+
+def create_repeated_pipeline(directory, nb_units, nb_functions):
+    """ Create a module containing a linear pipeline of repeated units.
+
+    Parameters
+    ----------
+    directory: str (mandatory)
+        the directory where the module is created.
+    nb_units: int (mandatory)
+        the number of boxes in the pipeline.
+    nb_functions: int (mandatory)
+        the number of distinct functions called by the boxes.
+
+    Returns
+    -------
+    xmldesc: str
+        the pipeline description.
+    funcdescs: list of str
+        the distinct function descriptions.
+    """
+    module_name = "casper_benchmark_loading"
+    module_dir = os.path.join(directory, module_name)
+    os.mkdir(module_dir)
+    open(os.path.join(module_dir, "__init__.py"), "w").close()
+    functions = []
+    for index in range(nb_functions):
+        functions.extend([
+            "def copy{0}(inp, factor=1):".format(index),
+            "    \"\"\" Copy the input to the output.",
+            "",
+            "    <unit>",
+            "        <input name=\"inp\" type=\"Str\" description=\"in\"/>",
+            "        <input name=\"factor\" type=\"Int\" description=\"f\"/>",
+            "        <output name=\"outp\" type=\"Str\" description=\"out\"/>",
+            "    </unit>",
+            "    \"\"\"",
+            "    outp = inp",
+            "    return outp",
+            "",
+            ""])
+    with open(os.path.join(module_dir, "functions.py"), "w") as open_file:
+        open_file.write("\n".join(functions))
+    funcdescs = ["{0}.functions.copy{1}".format(module_name, index)
+                 for index in range(nb_functions)]
+    units = ["        <unit name=\"c{0}\">\n"
+             "            <module>{1}</module>\n"
+             "        </unit>".format(index, funcdescs[index % nb_functions])
+             for index in range(nb_units)]
+    links = ["        <link source=\"inp\" destination=\"c0.inp\"/>",
+             "        <link source=\"c{0}.outp\" destination=\"outp\"/>"
+             "".format(nb_units - 1)]
+    links.extend([
+        "        <link source=\"c{0}.outp\" destination=\"c{1}.inp\"/>"
+        "".format(index, index + 1) for index in range(nb_units - 1)])
+    with open(os.path.join(module_dir, "pipeline.xml"), "w") as open_file:
+        open_file.write("\n".join(
+            ["<pipeline version=\"1.0\">", "    <units>"] + units +
+            ["    </units>", "    <links>"] + links +
+            ["    </links>", "</pipeline>", ""]))
+    sys.path.insert(0, directory)
+    return "{0}.pipeline.xml".format(module_name), funcdescs
+
+
+def benchmark(sizes=(100, 1000, 5000), nb_functions=20):
+    """ Compare the loading time of a pipeline with the time needed to
+    parse its distinct prototypes.
+
+    Parameters
+    ----------
+    sizes: list of int (optional)
+        the numbers of boxes in the pipeline.
+    nb_functions: int (optional, default 20)
+        the number of distinct functions called by the boxes.
+
+    Returns
+    -------
+    measures: list of 4-uplet
+        the number of boxes, the time in seconds needed to parse the
+        distinct prototypes, to load the pipeline and to load it again with
+        the registered prototypes.
+    """
+    measures = []
+    directory = tempfile.mkdtemp()
+    try:
+        xmldesc, funcdescs = create_repeated_pipeline(
+            directory, 1, nb_functions)
+        for funcdesc in funcdescs:
+            Bbox(funcdesc)
+        module_name = xmldesc.split(".")[0]
+        for size in sizes:
+            result = [size]
+            shutil.rmtree(os.path.join(directory, module_name))
+            create_repeated_pipeline(directory, size, nb_functions)
+            sys.path.remove(directory)
+
+            # Parse the distinct prototypes
+            prototypes.clear()
+            tic = timeit.default_timer()
+            for funcdesc in funcdescs:
+                Bbox(funcdesc)
+            result.append(timeit.default_timer() - tic)
+
+            # Load the pipeline with an empty and a filled registry
+            for clear in (True, False):
+                if clear:
+                    prototypes.clear()
+                tic = timeit.default_timer()
+                Pbox(xmldesc)
+                result.append(timeit.default_timer() - tic)
+            measures.append(tuple(result))
+    finally:
+        sys.path.remove(directory)
+        shutil.rmtree(directory)
+    return measures
+
+
+if __name__ == "__main__":
+    print("{0:>10} {1:>16} {2:>14} {3:>14}".format(
+        "units", "prototypes (s)", "cold (s)", "warm (s)"))
+    for size, proto_time, cold_time, warm_time in benchmark():
+        print("{0:>10} {1:>16.4f} {2:>14.4f} {3:>14.4f}".format(
+            size, proto_time, cold_time, warm_time))
@@ -0,0 +1,233 @@
+#! /usr/bin/env python
+##########################################################################
+# CASPER - Copyright (C) AGrigis, 2013
+# Distributed under the terms of the CeCILL-B license, as published by
+# the CEA-CNRS-INRIA. Refer to the LICENSE file or to
+# http://www.cecill.info/licences/Licence_CeCILL-B_V1-en.html
+# for details.
+##########################################################################
+
+""" Measure the memory used by the controls of an iterative pipeline.
+
+The controls of a box with file, directory and string controls are copied
+once per ibox iteration, as when the iterations are dispatched, and the
+allocated memory is divided by the number of copied controls. The memory
+of the same number of list controls and of the controls of the copies of
+a pipeline with a switch is also reported. The compact slotted controls
+are compared with the dictionary-based controls they replace.
+"""
+
+# System import
+import copy
+import tracemalloc
+import warnings
+
+# Casper import
+from casper.lib.controls import controls
+from casper.pipeline import Bbox
+from casper.pipeline import Pbox
+
+
+class DictObservable(object):
+    """ The former observable creating its signal list and observer
+    dictionary for each instance.
+    """
+    def __init__(self, signals):
+        self._allowed_signals = []
+        self._observers = {}
+        for signal in signals:
+            self._allowed_signals.append(signal)
+            self._observers[signal] = []
+        self._locked = False
+
+
+class DictControl(DictObservable):
+    """ The former control storing its class and extra parameters in its
+    instance dictionary.
+    """
+    def __init__(self, value=None, *args, **kwargs):
+        self._value = None
+        self.optional = False
+        self.type = None
+        self.name = ""
+        self.iterable = False
+        self.inner = False
+        self.copy = False
+        self.nohash = False
+        self.kwargs = kwargs
+        for pkey, pvalue in kwargs.items():
+            setattr(self, pkey, pvalue)
+        DictObservable.__init__(self, ["value"])
+        self._value = value
+
+
+class DictList(DictControl):
+    """ The former list control.
+    """
+    def __init__(self, value=None, *args, **kwargs):
+        inner_desc = kwargs["content"].split("_")
+        inner_kwargs = {"inner": True}
+        if len(inner_desc) > 1:
+            inner_kwargs["content"] = "_".join(inner_desc[1:])
+        self.inner_control = dict_control(inner_desc[0], **inner_kwargs)
+        DictControl.__init__(self, value, *args, **kwargs)
+        self.iterable = True
+
+
+def dict_control(control_type, *args, **kwargs):
+    """ Create a control in the former representation.
+
+    Parameters
+    ----------
+    control_type: str (mandatory)
+        the control type name.
+    args, kwargs: (optional)
+        the control parameters.
+
+    Returns
+    -------
+    control: DictControl
+        the former control.
+    """
+    if control_type == "List":
+        return DictList(*args, **kwargs)
+    return DictControl(*args, **kwargs)
+
+
+def slotted_control(control_type, *args, **kwargs):
+    """ Create a control in the slotted representation.
+
+    Parameters
+    ----------
+    control_type: str (mandatory)
+        the control type name.
+    args, kwargs: (optional)
+        the control parameters.
+
+    Returns
+    -------
+    control: Base
+        the control.
+    """
+    return controls[control_type](*args, **kwargs)
+
+
+def measure(function, *args):
+    """ Measure the memory allocated by a function and kept by its result.
+
+    Parameters
+    ----------
+    function: callable (mandatory)
+        the function creating the measured objects.
+    args: list (optional)
+        the function parameters.
+
+    Returns
+    -------
+    result: object
+        the function result.
+    nbytes: int
+        the memory size in bytes.
+    """
+    tracemalloc.start()
+    try:
+        result = function(*args)
+        nbytes, _ = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return result, nbytes
+
+
+def box_controls(box):
+    """ List the types and parameters of the controls of a box.
+
+    Parameters
+    ----------
+    box: Bbox (mandatory)
+        the box.
+
+    Returns
+    -------
+    descs: list of 2-uplet
+        the control type names and extra parameters.
+    """
+    descs = []
+    for control_object in (box.inputs, box.outputs):
+        for control_name in control_object.controls:
+            control = getattr(control_object, control_name)
+            descs.append((control.__class__.__name__, dict(control.kwargs)))
+    return descs
+
+
+def copy_controls(factory, descs, nb_of_copies):
+    """ Create controls and copy them.
+
+    Parameters
+    ----------
+    factory: callable (mandatory)
+        the function creating a control from its type name and parameters.
+    descs: list of 2-uplet (mandatory)
+        the control type names and extra parameters.
+    nb_of_copies: int (mandatory)
+        the number of copies.
+
+    Returns
+    -------
+    copies: list of list of control
+        the copied controls.
+    """
+    originals = [factory(control_type, **kwargs)
+                 for control_type, kwargs in descs]
+    return [copy.deepcopy(originals) for index in range(nb_of_copies)]
+
+
+def benchmark(nb_of_iterations=100000, nb_of_copies=1000):
+    """ Measure the memory used per control by the former and the slotted
+    controls.
+
+    Parameters
+    ----------
+    nb_of_iterations: int (optional, default 100000)
+        the number of ibox iterations and of list controls.
+    nb_of_copies: int (optional, default 1000)
+        the number of pipeline copies.
+
+    Returns
+    -------
+    measures: list of 3-uplet
+        the measure name and the memory size in bytes per control of the
+        former and the slotted controls.
+    """
+    # The demo function has an invalid default directory
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore", UserWarning)
+        bbox = Bbox("casper.demo.module.a_function_to_wrap")
+    pbox = Pbox("casper.demo.switch_pipeline.xml")
+    pbox_descs = [
+        (getattr(pbox.inputs, control_name).__class__.__name__,
+         dict(getattr(pbox.inputs, control_name).kwargs))
+        for control_name in pbox.inputs.controls]
+    for box in pbox._boxes.values():
+        pbox_descs.extend(box_controls(box))
+    list_descs = [("List", {"content": "File", "desc": "a list of files"})]
+
+    measures = []
+    for name, descs, nb_of_items in (
+            ("ibox iteration", box_controls(bbox), nb_of_iterations),
+            ("list", list_descs, nb_of_iterations),
+            ("pipeline copy", pbox_descs, nb_of_copies)):
+        result = [name]
+        for factory in (dict_control, slotted_control):
+            _, nbytes = measure(copy_controls, factory, descs, nb_of_items)
+            result.append(nbytes / float(nb_of_items * len(descs)))
+        measures.append(tuple(result))
+
+    return measures
+
+
+if __name__ == "__main__":
+    print("{0:>16} {1:>12} {2:>12}".format(
+        "controls", "former (B)", "slotted (B)"))
+    for name, dict_nbytes, slotted_nbytes in benchmark():
+        print("{0:>16} {1:>12.0f} {2:>12.0f}".format(
+            name, dict_nbytes, slotted_nbytes))
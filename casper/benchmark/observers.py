@@ -0,0 +1,121 @@
+#! /usr/bin/env python
+##########################################################################
+# CASPER - Copyright (C) AGrigis, 2013
+# Distributed under the terms of the CeCILL-B license, as published by
+# the CEA-CNRS-INRIA. Refer to the LICENSE file or to
+# http://www.cecill.info/licences/Licence_CeCILL-B_V1-en.html
+# for details.
+##########################################################################
+
+""" Measure the control notification throughput and the memory held by the
+iterations of an iterative pipeline.
+
+A control is set 'nb_of_sets' times with 0, 1 and 10 strong or weak
+observers. The iterations of an ibox over the switch pipeline are then
+built, executed by their graph and released one after the other with the
+garbage collector disabled: the number of pipeline copies still alive and
+the peak memory are reported.
+"""
+
+# System import
+import gc
+import timeit
+import weakref
+import tracemalloc
+
+# Casper import
+from casper.lib.controls import controls
+from casper.pipeline import Ibox
+from casper.pipeline import Pbox
+
+
+class Counter(object):
+    """ An observer counting the notifications.
+    """
+    def __init__(self):
+        self.count = 0
+
+    def update(self, signal):
+        self.count += 1
+
+
+def benchmark_notify(nb_of_sets=100000, nb_of_observers=(0, 1, 10)):
+    """ Measure the number of control sets per second.
+
+    Parameters
+    ----------
+    nb_of_sets: int (optional, default 100000)
+        the number of control sets.
+    nb_of_observers: list of int (optional)
+        the numbers of observers of the control.
+
+    Returns
+    -------
+    measures: list of 3-uplet
+        the number of observers and the number of control sets per second
+        with strong and weak observers.
+    """
+    measures = []
+    for nb_of_observer in nb_of_observers:
+        result = [nb_of_observer]
+        for weak in (False, True):
+            control = controls["Int"](desc="a benchmarked control")
+            counters = [Counter() for index in range(nb_of_observer)]
+            for counter in counters:
+                control.add_observer("value", counter.update, weak=weak)
+            tic = timeit.default_timer()
+            for index in range(nb_of_sets):
+                control.value = index
+            result.append(nb_of_sets / (timeit.default_timer() - tic))
+        measures.append(tuple(result))
+    return measures
+
+
+def benchmark_iterations(nb_of_iterations=10000):
+    """ Measure the pipeline copies kept alive by the ibox iterations.
+
+    Parameters
+    ----------
+    nb_of_iterations: int (optional, default 10000)
+        the number of iterations.
+
+    Returns
+    -------
+    nb_of_alive: int
+        the number of iteration pipeline copies still alive.
+    peak: int
+        the peak memory in bytes allocated while the iterations are
+        processed.
+    """
+    ibox = Ibox(Pbox("casper.demo.switch_pipeline.xml"), iterinputs=["inp"],
+                iteroutputs=["outp"])
+    ibox.inputs.iterinp = [str(index) for index in range(nb_of_iterations)]
+    itergraphs = ibox.itergraphs("switch")
+    copies = []
+    gc.disable()
+    tracemalloc.start()
+    try:
+        while itergraphs:
+            itergraph, iterbox = itergraphs.popitem()[1]
+            iterbox.inputs.bas = "ete"
+            copies.append(weakref.ref(iterbox._box))
+            for node_name in list(itergraph._nodes):
+                itergraph.remove_node(node_name)
+        del itergraph, iterbox
+        _, peak = tracemalloc.get_traced_memory()
+        nb_of_alive = len([copy for copy in copies if copy() is not None])
+    finally:
+        tracemalloc.stop()
+        gc.enable()
+    return nb_of_alive, peak
+
+
+if __name__ == "__main__":
+    print("{0:>10} {1:>16} {2:>16}".format(
+        "observers", "strong (set/s)", "weak (set/s)"))
+    for nb_of_observer, strong_rate, weak_rate in benchmark_notify():
+        print("{0:>10} {1:>16.0f} {2:>16.0f}".format(
+            nb_of_observer, strong_rate, weak_rate))
+    nb_of_alive, peak = benchmark_iterations()
+    print("alive pipeline copies: {0}, peak memory: {1:.1f} MB".format(
+        nb_of_alive, peak / 1024. ** 2))
@@ -0,0 +1,136 @@
+#! /usr/bin/env python
+##########################################################################
+# CASPER - Copyright (C) AGrigis, 2013
+# Distributed under the terms of the CeCILL-B license, as published by
+# the CEA-CNRS-INRIA. Refer to the LICENSE file or to
+# http://www.cecill.info/licences/Licence_CeCILL-B_V1-en.html
+# for details.
+##########################################################################
+
+""" Measure the per-job scheduling overhead of the execution graph.
+
+A flattened iterative pipeline is emulated by 'nb_of_chains' independent
+chains of 'depth' nodes. Each completed job removes a node from the graph
+and collects the newly available nodes, as done in the 'Pbox' scheduler.
+"""
+
+# System import
+import timeit
+
+# Casper import
+from casper.lib.base import Graph
+from casper.lib.base import GraphNode
+
+
+def build_graph(nb_of_chains, depth=3):
+    """ Build a graph made of independent chains.
+
+    Parameters
+    ----------
+    nb_of_chains: int (mandatory)
+        the number of independent chains.
+    depth: int (optional, default 3)
+        the number of nodes in each chain.
+
+    Returns
+    -------
+    graph: Graph
+        the generated graph.
+    """
+    graph = Graph()
+    for chain in range(nb_of_chains):
+        names = ["c{0}.n{1}".format(chain, index) for index in range(depth)]
+        for name in names:
+            graph.add_node(GraphNode(name, None))
+        for from_name, to_name in zip(names[:-1], names[1:]):
+            graph.add_link(from_name, to_name)
+    return graph
+
+
+def run_incremental(graph):
+    """ Execute the graph with the incremental ready queue.
+
+    Parameters
+    ----------
+    graph: Graph (mandatory)
+        the graph to execute.
+
+    Returns
+    -------
+    nb_of_jobs: int
+        the number of executed nodes.
+    """
+    toexec = [node.name for node in graph.pop_ready_nodes()]
+    nb_of_jobs = 0
+    while toexec:
+        name = toexec.pop()
+        graph.remove_node(name)
+        toexec.extend([node.name for node in graph.pop_ready_nodes()])
+        nb_of_jobs += 1
+    return nb_of_jobs
+
+
+def run_rescan(graph):
+    """ Execute the graph by rescanning all the nodes after each job.
+
+    Parameters
+    ----------
+    graph: Graph (mandatory)
+        the graph to execute.
+
+    Returns
+    -------
+    nb_of_jobs: int
+        the number of executed nodes.
+    """
+    inexec = set()
+    nb_of_jobs = 0
+    toexec = sorted([name for name, node in graph._nodes.items()
+                     if node.links_from_degree == 0])
+    while toexec:
+        inexec.update(toexec)
+        name = toexec[0]
+        graph.remove_node(name)
+        inexec.discard(name)
+        available = set([name for name, node in graph._nodes.items()
+                         if node.links_from_degree == 0])
+        toexec = sorted(available - inexec) + sorted(available & inexec)
+        nb_of_jobs += 1
+    return nb_of_jobs
+
+
+def benchmark(sizes=(500, 1000, 2000, 4000), depth=3):
+    """ Compare the per-job scheduling overhead of both strategies.
+
+    Parameters
+    ----------
+    sizes: list of int (optional)
+        the numbers of chains to benchmark.
+    depth: int (optional, default 3)
+        the number of nodes in each chain.
+
+    Returns
+    -------
+    timings: list of 3-uplet
+        the number of nodes and the per-job time in microseconds of the
+        incremental and rescan strategies.
+    """
+    timings = []
+    for nb_of_chains in sizes:
+        result = []
+        for runner in (run_incremental, run_rescan):
+            graph = build_graph(nb_of_chains, depth)
+            tic = timeit.default_timer()
+            nb_of_jobs = runner(graph)
+            toc = timeit.default_timer()
+            result.append(1e6 * (toc - tic) / nb_of_jobs)
+        timings.append((nb_of_chains * depth, result[0], result[1]))
+    return timings
+
+
+if __name__ == "__main__":
+    print("{0:>10} {1:>18} {2:>18}".format(
+        "nodes", "incremental (us)", "rescan (us)"))
+    for nb_of_nodes, incremental, rescan in benchmark():
+        print("{0:>10} {1:>18.2f} {2:>18.2f}".format(
+            nb_of_nodes, incremental, rescan))
@@ -0,0 +1,111 @@
+#! /usr/bin/env python
+##########################################################################
+# CASPER - Copyright (C) AGrigis, 2013
+# Distributed under the terms of the CeCILL-B license, as published by
+# the CEA-CNRS-INRIA. Refer to the LICENSE file or to
+# http://www.cecill.info/licences/Licence_CeCILL-B_V1-en.html
+# for details.
+##########################################################################
+
+""" Measure the volume of data copied between the master and the workers.
+
+The 'array_pipeline' demonstration pipeline creates an array that is
+scaled by two boxes. The pipeline is executed with the arrays copied
+through the queues and with the arrays exchanged through shared files.
+"""
+
+# System import
+import logging
+import pickle
+import timeit
+
+# Casper import
+from casper.pipeline import Pbox
+from casper.pipeline import WorkerPool
+
+
+class CountingQueue(object):
+    """ A queue proxy that counts the pickled bytes sent through a queue.
+    """
+    def __init__(self, queue):
+        """ Initialize the CountingQueue class.
+
+        Parameters
+        ----------
+        queue: multiprocessing.Queue (mandatory)
+            the proxied queue.
+        """
+        self.queue = queue
+        self.nbytes = 0
+
+    def put(self, obj):
+        """ Put an object in the queue.
+        """
+        self.nbytes += len(pickle.dumps(obj, pickle.HIGHEST_PROTOCOL))
+        self.queue.put(obj)
+
+    def get(self, *args, **kwargs):
+        """ Get an object from the queue.
+        """
+        obj = self.queue.get(*args, **kwargs)
+        self.nbytes += len(pickle.dumps(obj, pickle.HIGHEST_PROTOCOL))
+        return obj
+
+
+class CountingPool(WorkerPool):
+    """ A pool that counts the pickled bytes sent through its queues.
+    """
+    def start(self):
+        """ Start the workers and proxy the queues.
+        """
+        super(CountingPool, self).start()
+        self._workers_bbox = [
+            CountingQueue(item) for item in self._workers_bbox]
+        self._workers_returncode = CountingQueue(self._workers_returncode)
+
+    def nbytes(self):
+        """ The number of bytes sent through the queues.
+        """
+        return (sum(item.nbytes for item in self._workers_bbox) +
+                self._workers_returncode.nbytes)
+
+
+def benchmark(sizes=(1 << 10, 1 << 16, 1 << 20, 1 << 22), cpus=2):
+    """ Compare the copied volume and the execution time of both transports.
+
+    Parameters
+    ----------
+    sizes: list of int (optional)
+        the numbers of float64 elements of the created arrays.
+    cpus: int (optional, default 2)
+        the number of workers.
+
+    Returns
+    -------
+    measures: list of 5-uplet
+        the array size in bytes, the copied bytes and the execution time in
+        seconds without and with shared files.
+    """
+    logging.disable(logging.INFO)
+    measures = []
+    pbox = Pbox("casper.demo.array_pipeline.xml")
+    for size in sizes:
+        pbox.inputs.size = size
+        result = [size * 8]
+        for share_arrays in (None, 1):
+            with CountingPool(cpus) as pool:
+                tic = timeit.default_timer()
+                pbox(pool=pool, share_arrays=share_arrays)
+                toc = timeit.default_timer()
+                result.extend([pool.nbytes(), toc - tic])
+        measures.append(tuple(result))
+    logging.disable(logging.NOTSET)
+    return measures
+
+
+if __name__ == "__main__":
+    print("{0:>12} {1:>14} {2:>10} {3:>14} {4:>10}".format(
+        "array (B)", "copied (B)", "time (s)", "shared (B)", "time (s)"))
+    for nbytes, copied, copy_time, shared, shared_time in benchmark():
+        print("{0:>12} {1:>14} {2:>10.3f} {3:>14} {4:>10.3f}".format(
+            nbytes, copied, copy_time, shared, shared_time))
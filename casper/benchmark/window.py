@@ -0,0 +1,150 @@
+#! /usr/bin/env python
+##########################################################################
+# CASPER - Copyright (C) AGrigis, 2013
+# Distributed under the terms of the CeCILL-B license, as published by
+# the CEA-CNRS-INRIA. Refer to the LICENSE file or to
+# http://www.cecill.info/licences/Licence_CeCILL-B_V1-en.html
+# for details.
+##########################################################################
+
+""" Measure the memory used by the master to execute a large iterative box.
+
+The iterations of the 'array_scale' demonstration function are summed
+with all the iterations expanded at once and with a bounded iteration
+window. Each execution is done in a new process so that the peak resident
+memory of the master can be compared.
+"""
+
+# System import
+import os
+import sys
+import json
+import shutil
+import logging
+import resource
+import subprocess
+import tempfile
+import timeit
+
+# Casper import
+from casper.pipeline import Pbox
+
+
+def create_sum_pipeline(directory, chunksize):
+    """ Create a module containing a pipeline that sums scaled arrays.
+
+    Parameters
+    ----------
+    directory: str (mandatory)
+        the directory where the module is created.
+    chunksize: int (mandatory)
+        the number of iterations executed in a single job.
+
+    Returns
+    -------
+    xmldesc: str
+        the pipeline description.
+    """
+    module_name = "casper_benchmark_window"
+    module_dir = os.path.join(directory, module_name)
+    os.mkdir(module_dir)
+    open(os.path.join(module_dir, "__init__.py"), "w").close()
+    with open(os.path.join(module_dir, "pipeline.xml"), "w") as open_file:
+        open_file.write("\n".join([
+            "<pipeline version=\"1.0\">",
+            "    <units>",
+            "        <unit name=\"create\">",
+            "            <module>casper.demo.module.array_create</module>",
+            "        </unit>",
+            "        <unit name=\"scale\">",
+            "            <module>casper.demo.module.array_scale</module>",
+            "            <iterinput name=\"factor\"/>",
+            "            <iteroutput name=\"scaled\" reducer=\"sum\"/>",
+            "            <chunksize>{0}</chunksize>".format(chunksize),
+            "        </unit>",
+            "    </units>",
+            "    <links>",
+            "        <link source=\"size\" destination=\"create.size\"/>",
+            "        <link source=\"factors\" "
+            "destination=\"scale.iterfactor\"/>",
+            "        <link source=\"create.array\" "
+            "destination=\"scale.array\"/>",
+            "        <link source=\"scale.scaled\" destination=\"outp\"/>",
+            "    </links>",
+            "</pipeline>",
+            ""]))
+    sys.path.insert(0, directory)
+    return "{0}.pipeline.xml".format(module_name)
+
+
+def execute(nb_of_iterations, iteration_window, cpus=2, chunksize=32):
+    """ Execute the iterative pipeline in the current process.
+
+    Parameters
+    ----------
+    nb_of_iterations: int (mandatory)
+        the number of iterations.
+    iteration_window: int (mandatory)
+        the iteration window, None to expand all the iterations at once.
+    cpus: int (optional, default 2)
+        the number of workers.
+    chunksize: int (optional, default 32)
+        the number of iterations executed in a single job.
+
+    Returns
+    -------
+    measure: 2-uplet
+        the peak resident memory of the process in kilobytes and the
+        execution time in seconds.
+    """
+    logging.disable(logging.INFO)
+    directory = tempfile.mkdtemp()
+    try:
+        pbox = Pbox(create_sum_pipeline(directory, chunksize))
+    finally:
+        shutil.rmtree(directory)
+    pbox.inputs.size = 10
+    pbox.inputs.factors = [float(index) for index in range(nb_of_iterations)]
+    tic = timeit.default_timer()
+    pbox(cpus=cpus, iteration_window=iteration_window)
+    toc = timeit.default_timer()
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss, toc - tic
+
+
+def benchmark(sizes=(5000, 20000, 50000), iteration_window=256):
+    """ Compare the master memory with and without iteration window.
+
+    Parameters
+    ----------
+    sizes: list of int (optional)
+        the numbers of iterations.
+    iteration_window: int (optional, default 256)
+        the bounded iteration window.
+
+    Returns
+    -------
+    measures: list of 5-uplet
+        the number of iterations, the peak resident memory in kilobytes
+        and the execution time in seconds without and with window.
+    """
+    measures = []
+    with open(os.devnull, "w") as devnull:
+        for size in sizes:
+            result = [size]
+            for window in (None, iteration_window):
+                output = subprocess.check_output([
+                    sys.executable, "-c",
+                    "import json; from casper.benchmark.window import "
+                    "execute; print(json.dumps(execute({0}, {1})))".format(
+                        size, window)], stderr=devnull)
+                result.extend(json.loads(output.decode().splitlines()[-1]))
+            measures.append(tuple(result))
+    return measures
+
+
+if __name__ == "__main__":
+    print("{0:>12} {1:>14} {2:>10} {3:>14} {4:>10}".format(
+        "iterations", "full (kB)", "time (s)", "window (kB)", "time (s)"))
+    for size, full_rss, full_time, window_rss, window_time in benchmark():
+        print("{0:>12} {1:>14} {2:>10.3f} {3:>14} {4:>10.3f}".format(
+            size, full_rss, full_time, window_rss, window_time))
@@ -0,0 +1,112 @@
+#! /usr/bin/env python
+##########################################################################
+# CASPER - Copyright (C) AGrigis, 2013
+# Distributed under the terms of the CeCILL-B license, as published by
+# the CEA-CNRS-INRIA. Refer to the LICENSE file or to
+# http://www.cecill.info/licences/Licence_CeCILL-B_V1-en.html
+# for details.
+##########################################################################
+
+""" Measure the time needed to parse large pipeline descriptions.
+
+Linear pipelines of 'clothing' units are generated and parsed with the
+'etree' and 'minidom' backends of 'xmltodict'. The docstring of the
+'a_function_to_wrap' demonstration function is parsed with both backends
+of 'parse_docstring'.
+"""
+
+# System import
+import timeit
+
+# Casper import
+from casper.demo import module
+from casper.lib.base.xmltodict import xmltodict
+from casper.pipeline.utils import parse_docstring
+
+
+def generate_linear_pipeline(nb_units):
+    """ Generate the description of a linear pipeline.
+
+    Parameters
+    ----------
+    nb_units: int (mandatory)
+        the number of units in the pipeline.
+
+    Returns
+    -------
+    xmlstring: str
+        the pipeline description.
+    """
+    lines = ["<?xml version=\"1.0\" encoding=\"UTF-8\"?>",
+             "<pipeline version=\"1.0\">",
+             "    <docstring>",
+             "        Generated linear pipeline.",
+             "    </docstring>",
+             "    <units>"]
+    for index in range(nb_units):
+        lines.extend([
+            "        <unit name=\"u{0}\">".format(index),
+            "            <module>casper.demo.module.clothing</module>",
+            "            <set name=\"inp\" value=\"'default'\"/>",
+            "        </unit>"])
+    lines.extend(["    </units>", "    <links>",
+                  "        <link source=\"inp\" destination=\"u0.inp\"/>"])
+    for index in range(1, nb_units):
+        lines.append(
+            "        <link source=\"u{0}.outp\" destination=\"u{1}.inp\"/>"
+            "".format(index - 1, index))
+    lines.extend([
+        "        <link source=\"u{0}.outp\" destination=\"outp\"/>".format(
+            nb_units - 1),
+        "    </links>",
+        "    <positions>"])
+    for index in range(nb_units):
+        lines.append(
+            "        <position unit=\"u{0}\" x=\"{1}\" y=\"0\"/>".format(
+                index, 200 * index))
+    lines.extend(["    </positions>", "</pipeline>", ""])
+    return "\n".join(lines)
+
+
+def benchmark(sizes=(100, 1000, 10000), nb_of_docstrings=1000):
+    """ Compare the parsing time of both backends.
+
+    Parameters
+    ----------
+    sizes: list of int (optional)
+        the numbers of units of the generated pipelines.
+    nb_of_docstrings: int (optional, default 1000)
+        the number of parsed docstrings.
+
+    Returns
+    -------
+    measures: list of 3-uplet
+        the parsed description and the time in seconds needed to parse it
+        with the 'etree' and 'minidom' backends.
+    """
+    measures = []
+    for size in sizes:
+        xmlstring = generate_linear_pipeline(size)
+        result = ["{0} units".format(size)]
+        for backend in ("etree", "minidom"):
+            tic = timeit.default_timer()
+            xmltodict(xmlstring, backend)
+            result.append(timeit.default_timer() - tic)
+        measures.append(tuple(result))
+    docstring = module.a_function_to_wrap.__doc__
+    result = ["{0} docstrings".format(nb_of_docstrings)]
+    for backend in ("etree", "minidom"):
+        tic = timeit.default_timer()
+        for index in range(nb_of_docstrings):
+            parse_docstring(docstring, backend)
+        result.append(timeit.default_timer() - tic)
+    measures.append(tuple(result))
+    return measures
+
+
+if __name__ == "__main__":
+    print("{0:>18} {1:>12} {2:>12}".format(
+        "description", "etree (s)", "minidom (s)"))
+    for name, etree_time, minidom_time in benchmark():
+        print("{0:>18} {1:>12.4f} {2:>12.4f}".format(
+            name, etree_time, minidom_time))
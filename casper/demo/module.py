@@ -58,3 +58,29 @@ def clothing_outputs(inp):
         return None
     listoutp = [inp + "0", inp + "1"]
     return listoutp
+
+
+def array_create(size):
+    """ A dummy function that creates a numpy array.
+
+    <unit>
+        <output name="array" type="Object" description="test" />
+        <input name="size" type="Int" description="test" />
+    </unit>
+    """
+    import numpy
+    array = numpy.arange(size, dtype=float)
+    return array
+
+
+def array_scale(array, factor=2.):
+    """ A dummy function that scales a numpy array.
+
+    <unit>
+        <output name="scaled" type="Object" description="test" />
+        <input name="array" type="Object" description="test" />
+        <input name="factor" type="Float" description="test" />
+    </unit>
+    """
+    scaled = array * factor
+    return scaled
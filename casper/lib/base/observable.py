@@ -7,6 +7,14 @@
 # for details.
 ##########################################################################
 
+# System import
+import copy
+import weakref
+
+
+# The allowed signals shared by the observable objects
+_shared_signals = {}
+
 
 class SignalObject(object):
     """ Dummy class for signals.
@@ -14,6 +22,93 @@ class SignalObject(object):
     pass
 
 
+class _WeakMethod(object):
+    """ A weak reference to a bound method for the python versions without
+    'weakref.WeakMethod' (python < 3.4).
+
+    The instance is weakly referenced and the method is bound again to the
+    instance each time the reference is called.
+    """
+    __slots__ = ("instance_ref", "func")
+
+    def __init__(self, method):
+        """ Initialize the _WeakMethod class.
+
+        Parameters
+        ----------
+        method: bound method (mandatory)
+            the referenced method.
+        """
+        self.instance_ref = weakref.ref(method.__self__)
+        self.func = method.__func__
+
+    def __call__(self):
+        """ Return the bound method or None if its instance is dead.
+        """
+        instance = self.instance_ref()
+        if instance is None:
+            return None
+        return self.func.__get__(instance, instance.__class__)
+
+
+WeakMethod = getattr(weakref, "WeakMethod", _WeakMethod)
+
+
+class WeakObserver(object):
+    """ An observer that does not keep its callable alive.
+
+    A bound method is referenced through its instance so that the observer
+    lives as long as the instance. A dead observer is ignored when it is
+    notified and removed from its observable the next time the observers
+    of its signal are notified or modified.
+    """
+    __slots__ = ("ref", "_hash", "__weakref__")
+
+    def __init__(self, observer):
+        """ Initialize the WeakObserver class.
+
+        Parameters
+        ----------
+        observer: callable (mandatory)
+            the referenced observer.
+        """
+        if getattr(observer, "__self__", None) is not None:
+            self.ref = WeakMethod(observer)
+        else:
+            self.ref = weakref.ref(observer)
+        self._hash = hash(observer)
+
+    def __call__(self, signal):
+        """ Call the referenced observer if it is still alive.
+        """
+        observer = self.ref()
+        if observer is not None:
+            observer(signal)
+
+    def __eq__(self, other):
+        """ A weak observer is equal to its referenced observer.
+        """
+        if isinstance(other, WeakObserver):
+            other = other.ref()
+        observer = self.ref()
+        return observer is not None and observer == other
+
+    def __ne__(self, other):
+        return not self.__eq__(other)
+
+    def __hash__(self):
+        return self._hash
+
+    def __deepcopy__(self, memo):
+        """ Reference the copy of the observer: the copied observer is
+        alive as long as it is referenced by the other copied objects.
+        """
+        observer = self.ref()
+        if observer is None:
+            return self
+        return WeakObserver(copy.deepcopy(observer, memo))
+
+
 class Observable(object):
     """ Base class for observable classes.
 
@@ -35,24 +130,24 @@ class Observable(object):
     def __init__(self, signals):
         """ Initilaize the Observable class.
 
+        The observers are stored the first time an observer is added: an
+        object without observers only references the allowed signals, that
+        are shared by all the objects with the same signals.
+
         Parameters
         ----------
         signals: list of string (mandatory)
             the default signals.
         """
         # Define private attributes to store signals and associated observers
-        self._allowed_signals = []
-        self._observers = {}
-
-        # Inititialize the allowed signals
-        for signal in signals:
-            self._allowed_signals.append(signal)
-            self._observers[signal] = []
+        signals = tuple(signals)
+        self._allowed_signals = _shared_signals.setdefault(signals, signals)
+        self._observers = None
 
         # A locked option to avoid multiple observer notifications
         self._locked = False
 
-    def add_observer(self, signal, observer):
+    def add_observer(self, signal, observer, weak=False):
         """ Add an observer to the object.
 
         If the signal do not exist an axception is raised.
@@ -64,8 +159,13 @@ class Observable(object):
             a signal to which we want to add an observer.
         observer: callable (madatory)
             a function that will be call.
+        weak: bool (optional, default False)
+            if True, the object does not keep the observer alive (see
+            'WeakObserver').
         """
         self._is_allowed_signal(signal)
+        if weak:
+            observer = WeakObserver(observer)
         self._add_observer(signal, observer)
 
     def remove_observer(self, signal, observer):
@@ -103,22 +203,37 @@ class Observable(object):
         if self._locked:
             return False
 
+        # Nothing to notify: no signal is created
+        observers = self._get_observers(signal)
+        if not observers:
+            return True
+
         # Lock the signal
         self._locked = True
 
-        # Create the signal with associated kwargs
+        # Create the signal with associated kwargs: the attributes are set
+        # in a single pass
         signal_info = SignalObject()
-        setattr(signal_info, "object", self)
-        setattr(signal_info, "signal", signal)
-        for name, value in kwargs.items():
-            setattr(signal_info, name, value)
+        attributes = signal_info.__dict__
+        attributes["object"] = self
+        attributes["signal"] = signal
+        attributes.update(kwargs)
 
         # Notify observers
-        for observer in self._observers[signal]:
-            observer(signal_info)
-
-        # Unlock the signal
-        self._locked = False
+        purge = False
+        try:
+            for observer in observers:
+                if observer.__class__ is WeakObserver:
+                    observer = observer.ref()
+                    if observer is None:
+                        purge = True
+                        continue
+                observer(signal_info)
+        finally:
+            # Unlock the signal
+            self._locked = False
+        if purge:
+            self._purge_observers(signal)
 
         return True
 
@@ -132,16 +247,35 @@ class Observable(object):
                 "Signal '{0}' is not allowed for type {1}.".format(
                     signal, str(type(self))))
 
+    def _get_observers(self, signal):
+        if self._observers is None:
+            return ()
+        return self._observers.get(signal, ())
+
     def _add_observer(self, signal, observer):
-        if observer not in self._observers[signal]:
-            self._observers[signal].append(observer)
+        if self._observers is None:
+            self._observers = {}
+        self._purge_observers(signal)
+        observers = self._observers.setdefault(signal, [])
+        if observer not in observers:
+            observers.append(observer)
 
     def _remove_observer(self, signal, observer):
-        if observer in self._observers[signal]:
-            index = self._observers[signal].index(observer)
-            del self._observers[signal][index]
+        self._purge_observers(signal)
+        observers = self._get_observers(signal)
+        if observer in observers:
+            index = observers.index(observer)
+            del observers[index]
+
+    def _purge_observers(self, signal):
+        observers = self._get_observers(signal)
+        if observers:
+            self._observers[signal] = [
+                observer for observer in observers
+                if observer.__class__ is not WeakObserver or
+                observer.ref() is not None]
 
     def _get_allowed_signals(self):
-        return self._allowed_signals
+        return list(self._allowed_signals)
 
     allowed_signals = property(_get_allowed_signals)
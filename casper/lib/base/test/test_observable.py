@@ -9,10 +9,14 @@
 
 # System import
 import unittest
+import copy
+import gc
 
 # Casper import
 from casper.lib.base import Observable
 from casper.lib.base import ObservableList
+from casper.lib.base.observable import WeakObserver
+from casper.lib.base.observable import _WeakMethod
 
 
 class TestObservable(unittest.TestCase):
@@ -62,6 +66,88 @@ class TestObservable(unittest.TestCase):
         # Check raises
         self.assertRaises(Exception, self.obs._is_allowed_signal, "bad")
 
+    def test_weak_observer(self):
+        """ Method to test the observers that are not kept alive.
+        """
+        # Define observers
+        signals = []
+
+        class Observer(object):
+            def update(self, signal):
+                signals.append(signal.message)
+
+        def observer(signal):
+            signals.append(signal.message)
+
+        # Test the weak observers are notified while they are alive
+        strong_observer = Observer()
+        weak_observer = Observer()
+        self.obs.add_observer("update", strong_observer.update)
+        self.obs.add_observer("update", weak_observer.update, weak=True)
+        self.obs.add_observer("update", observer, weak=True)
+        self.obs.add_observer("update", weak_observer.update)
+        self.assertEqual(len(self.obs._observers["update"]), 3)
+        self.assertTrue(self.obs.notify_observers("update", message="a"))
+        self.assertEqual(signals, ["a", "a", "a"])
+
+        # Test a dead observer is ignored and removed
+        gc.disable()
+        try:
+            del weak_observer
+            self.assertTrue(self.obs.notify_observers("update", message="b"))
+        finally:
+            gc.enable()
+        self.assertEqual(signals, ["a", "a", "a", "b", "b"])
+        self.assertEqual(len(self.obs._observers["update"]), 2)
+
+        # Test a weak observer can be removed with its callable
+        self.obs.remove_observer("update", observer)
+        self.assertEqual(self.obs._observers["update"],
+                         [strong_observer.update])
+
+        # Test the copied weak observers reference the copied observers
+        observer = Observer()
+        self.obs.add_observer("update", observer.update, weak=True)
+        obs, copied_observer = copy.deepcopy((self.obs, observer))
+        copied_weak_observer = obs._observers["update"][1]
+        self.assertTrue(isinstance(copied_weak_observer, WeakObserver))
+        self.assertTrue(copied_weak_observer.ref().__self__ is
+                        copied_observer)
+
+    def test_weak_method(self):
+        """ Method to test the weak bound method reference used without
+        'weakref.WeakMethod'.
+        """
+        # Define an observer
+        class Observer(object):
+            def update(self, signal):
+                pass
+
+        # Test the method is bound again while its instance is alive
+        observer = Observer()
+        ref = _WeakMethod(observer.update)
+        self.assertEqual(ref(), observer.update)
+        self.assertTrue(ref().__self__ is observer)
+        gc.disable()
+        try:
+            del observer
+            self.assertTrue(ref() is None)
+        finally:
+            gc.enable()
+
+    def test_notification(self):
+        """ Method to test the observable is unlocked when an observer
+        fails.
+        """
+        def observer(signal):
+            raise RuntimeError(signal.message)
+
+        self.assertTrue(self.obs.notify_observers("update", message="a"))
+        self.obs.add_observer("update", observer)
+        self.assertRaises(RuntimeError, self.obs.notify_observers, "update",
+                          message="a")
+        self.assertFalse(self.obs._locked)
+
     def test_list(self):
         """ Method to test if we can notify a list observers.
         """
@@ -59,6 +59,9 @@ class TestGraph(unittest.TestCase):
         """
         static_sort = [node[0] for node in self.graph.topological_sort()]
         self.assertTrue(set(static_sort).issubset(self.sorted_objects))
+        self.assertEqual(len(static_sort), len(self.sorted_objects))
+        self.assertEqual(self.graph.find_node("chaussures").links_from_degree,
+                         3)
 
     def test_dynamic_sort(self):
         """ Method to test the dynamic node sort.
@@ -73,6 +76,43 @@ class TestGraph(unittest.TestCase):
         self.assertEqual(nnil, ["chaussettes", "cravate", "pantalon", "veste"])
         self.graph.remove_node("ceinture")
 
+    def test_ready_queue(self):
+        """ Method to test the incremental ready queue.
+        """
+        ready = sorted([node.name for node in self.graph.pop_ready_nodes()])
+        self.assertEqual(ready, ["chaussettes", "chemise", "slip"])
+        self.assertEqual(self.graph.pop_ready_nodes(), [])
+        self.graph.remove_node("slip")
+        self.assertEqual(self.graph.pop_ready_nodes(), [])
+        self.graph.remove_node("chemise")
+        ready = sorted([node.name for node in self.graph.pop_ready_nodes()])
+        self.assertEqual(ready, ["cravate", "pantalon", "veste"])
+        graph = Graph()
+        graph.add_node(GraphNode("ceinture2", None))
+        graph.add_node(GraphNode("chaussures2", None))
+        graph.add_link("ceinture2", "chaussures2")
+        self.graph.add_graph(graph)
+        self.graph.remove_node("pantalon")
+        ready = [node.name for node in self.graph.pop_ready_nodes()]
+        self.assertEqual(ready, ["ceinture2", "ceinture"])
+        nnil = sorted([node.name for node in self.graph.available_nodes()])
+        self.assertEqual(nnil, ["ceinture", "ceinture2", "chaussettes",
+                                "cravate", "veste"])
+
+    def test_removed_links(self):
+        """ Method to test if the links of the removed nodes are dropped.
+        """
+        self.graph.remove_node("pantalon")
+        self.assertEqual(self.graph._links, [
+            ("chemise", "cravate"), ("chaussettes", "chaussures"),
+            ("ceinture", "chaussures"), ("chemise", "veste")])
+        self.assertFalse(("slip", "pantalon") in self.graph._link_order)
+        self.graph.add_node(GraphNode("pantalon", None))
+        self.graph.add_link("slip", "pantalon")
+        self.assertEqual(self.graph._links[-1], ("slip", "pantalon"))
+        self.assertEqual(self.graph.find_node("pantalon").links_from_degree,
+                         1)
+
     def test_layout(self):
         """ Method to test the layout creation.
         """
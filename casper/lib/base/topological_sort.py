@@ -7,6 +7,8 @@
 # for details.
 ##########################################################################
 
+# System import
+import collections
 import numpy
 
 
@@ -112,12 +114,27 @@ class Graph(object):
     The algorithm is based on the R.E. Tarjanlinear linear
     optimization (O(N+A)).
 
+    The nodes that have no incoming link are tracked incrementally: the
+    in-degree of each node is updated when a node or a link is added or
+    removed, so that the set of available nodes never requires a full scan
+    of the graph. The nodes that become available are also pushed in a
+    ready queue that can be consumed with 'pop_ready_nodes'.
+
     Attributes
     ----------
     _nodes : dict
         the graph nodes {node.name: node}
     _links : list
         graph edges (from_node, to_node)
+    _link_order : dict
+        the graph edges in insertion order for fast membership tests. The
+        edges of a removed node are dropped from this mapping when the node
+        is removed.
+    _available : set
+        the names of the nodes that have no incoming link.
+    _ready : deque
+        the names of the nodes that became available and have not been
+        popped yet.
 
     Methods
     --------
@@ -125,13 +142,17 @@ class Graph(object):
     find_node
     add_link
     topological_sort
+    available_nodes
+    pop_ready_nodes
     """
 
     def __init__(self):
         """ Create a Graph
         """
         self._nodes = {}
-        self._links = []
+        self._link_order = collections.OrderedDict()
+        self._available = set()
+        self._ready = collections.deque()
 
     def add_node(self, node):
         """ Method to add a GraphNode in the Graph.
@@ -147,6 +168,8 @@ class Graph(object):
             raise ValueError("'{0}' is already a GraphNode name.".format(
                 node.name))
         self._nodes[node.name] = node
+        if node.links_from_degree == 0:
+            self._set_available(node.name)
 
     def add_graph(self, graph):
         """ Method to add a Graph in the Graph.
@@ -164,6 +187,10 @@ class Graph(object):
     def remove_node(self, node_name):
         """ Method to remove a GraphNode from the Graph.
 
+        Only the successors of the removed node are visited: their in-degree
+        is decreased and the ones without incoming link are pushed in the
+        ready queue (O(out-degree)).
+
         Parameters
         ----------
         node: string (mandatory)
@@ -175,9 +202,16 @@ class Graph(object):
         node = self._nodes[node_name]
         for to_node in node.links_to:
             to_node.remove_link_from(node)
+            if (to_node.links_from_degree == 0 and
+                    self._nodes.get(to_node.name) is to_node):
+                self._set_available(to_node.name)
         for from_node in node.links_from:
             from_node.remove_link_to(node)
+            self._link_order.pop((from_node.name, node_name), None)
+        for to_node in node.links_to:
+            self._link_order.pop((node_name, to_node.name), None)
         del self._nodes[node_name]
+        self._available.discard(node_name)
 
     def find_node(self, node_name):
         """ Method to find a GraphNode in the Graph.
@@ -207,10 +241,18 @@ class Graph(object):
         if to_node not in self._nodes:
             raise Exception("Node '{0}' is not defined in the Graph.".format(
                 to_node))
-        if (from_node, to_node) not in self._links:
+        if (from_node, to_node) not in self._link_order:
             self._nodes[to_node].add_link_from(self._nodes[from_node])
             self._nodes[from_node].add_link_to(self._nodes[to_node])
-            self._links.append((from_node, to_node))
+            self._link_order[(from_node, to_node)] = None
+            if self._nodes[to_node].links_from_degree > 0:
+                self._available.discard(to_node)
+
+    @property
+    def _links(self):
+        """ The graph edges (from_node, to_node) in insertion order.
+        """
+        return list(self._link_order)
 
     def topological_sort(self):
         """ Perform the topological sort: find an order in which all the
@@ -224,6 +266,9 @@ class Graph(object):
         d) If the node has in-degree 0, add the node to nnil.
         Step 3: Assert that there is no loop in the graph.
 
+        The in-degrees are decreased on a local copy so that the graph is
+        left untouched.
+
         Returns
         -------
         output: list of tuple
@@ -231,6 +276,8 @@ class Graph(object):
             name and the node meta element.
         """
         ordered_nodes = []
+        degrees = dict((name, node.links_from_degree)
+                       for name, node in self._nodes.items())
 
         # Step 1
         nnil = self.available_nodes()
@@ -243,9 +290,9 @@ class Graph(object):
             ordered_nodes.append(c_nnil)
             # -- c
             for node in c_nnil.links_to:
-                node.remove_link_from(c_nnil)
+                degrees[node.name] -= 1
             # -- d
-                if node.links_from_degree == 0:
+                if degrees[node.name] == 0:
                     nnil.append(node)
 
         # Step 3
@@ -257,11 +304,40 @@ class Graph(object):
     def available_nodes(self):
         """ List the nodes that have no incoming link.
         """
-        nnil = []
-        for name, node in self._nodes.items():
-            if node.links_from_degree == 0:
-                nnil.append(node)
-        return nnil
+        return [self._nodes[name] for name in self._available]
+
+    def pop_ready_nodes(self):
+        """ Pop the nodes that became available since the last call.
+
+        The nodes are returned in the order they became available. A node
+        that has been removed or that has received a new incoming link in
+        the meantime is skipped.
+
+        Returns
+        -------
+        ready_nodes: list of GraphNode
+            the newly available nodes.
+        """
+        ready_nodes = []
+        popped = set()
+        while self._ready:
+            name = self._ready.popleft()
+            if name in self._available and name not in popped:
+                ready_nodes.append(self._nodes[name])
+                popped.add(name)
+        return ready_nodes
+
+    def _set_available(self, node_name):
+        """ Flag a node as available and push it in the ready queue.
+
+        Parameters
+        ----------
+        node_name: str (mandatory)
+            the name of the node that has no more incoming link.
+        """
+        if node_name not in self._available:
+            self._available.add(node_name)
+            self._ready.append(node_name)
 
     def adjacency_matrix(self):
         """ Compute the graph adjacency matrix.
@@ -11,12 +11,58 @@
 
 # Xml import
 import xml.dom.minidom
+import xml.etree.ElementTree as ElementTree
 
 
-def xmltodict(xmlstring):
-    doc = xml.dom.minidom.parseString(xmlstring)
-    remove_whitespace_nodes(doc.documentElement)
-    return elementtodict(doc.documentElement)
+def xmltodict(xmlstring, backend="etree"):
+    if backend == "etree":
+        return etreetodict(ElementTree.fromstring(
+            xmlstring, parser=etree_parser()))
+    elif backend == "minidom":
+        doc = xml.dom.minidom.parseString(xmlstring)
+        remove_whitespace_nodes(doc.documentElement)
+        return elementtodict(doc.documentElement)
+    else:
+        raise ValueError(
+            "Unrecognized xml backend '{0}'. Supported backends are "
+            "{1}.".format(backend, ["etree", "minidom"]))
+
+
+def etree_parser():
+    """ Create an ElementTree parser that keeps the comments and processing
+    instructions, so that the first child of an element is the same as
+    in a minidom document.
+    """
+    try:
+        builder = ElementTree.TreeBuilder(
+            insert_comments=True, insert_pis=True)
+    # COMPATIBILITY: options not defined before python 3.8
+    except TypeError:
+        builder = ElementTree.TreeBuilder()
+    return ElementTree.XMLParser(target=builder)
+
+
+def etreetodict(parent, **kwargs):
+    """ Same as 'elementtodict' for an ElementTree element: the whitespace
+    text is skipped without building a DOM.
+    """
+    if parent.text is not None and parent.text.strip():
+        return parent.text
+    elif len(parent) == 0:
+        return kwargs
+
+    d = {}
+    for child in parent:
+        if child.tag in (ElementTree.Comment,
+                         ElementTree.ProcessingInstruction):
+            continue
+        if child.tag not in d:
+            d[child.tag] = []
+        for name, value in kwargs.items():
+            if name not in d:
+                d[name] = [value]
+        d[child.tag].append(etreetodict(child, **child.attrib))
+    return d
 
 
 def elementtodict(parent, **kwargs):
@@ -54,7 +54,7 @@ class UnMemorizedBox(object):
         """
         # Set the box inputs early to get some argument checking
         for name, value in kwargs.items():
-            if name in self.box.inputs.controls:
+            if name in self.box.inputs:
                 setattr(self.box.inputs, name, value)
         input_parameters = self._get_box_arguments()
 
@@ -185,7 +185,7 @@ class MemorizedBox(object):
         """
         # Set the box inputs early to get some argument checking
         for name, value in kwargs.items():
-            if name in self.box.inputs.controls:
+            if name in self.box.inputs:
                 setattr(self.box.inputs, name, value)
 
         # Create the destination folder and a unique id for the current
@@ -226,26 +226,58 @@ class MemorizedBox(object):
 
         # Restore the box results from the cache folder
         else:
-            # Restore the memorized files
-            map_fname = os.path.join(box_dir, "file_mapping.json")
-            with open(map_fname) as json_data:
-                file_mapping = json.load(json_data)
+            result = self._restore_box_result(box_dir, input_parameters)
 
-            # Go through all mapping files
-            for workspace_file, memory_file in file_mapping:
+        return result
 
-                # Determine if the workspace directory is writeable
-                if os.access(os.path.dirname(workspace_file), os.W_OK):
-                    shutil.copy2(memory_file, workspace_file)
-                else:
-                    raise Exception(
-                        "Can't restore file '{0}', access rights are "
-                        "not sufficients.".format(workspace_file))
+    def cached_result(self):
+        """ Restore the box results if the box has already been executed
+        with the current input parameters.
 
-            # Update the box output traits
-            result = self._load_box_result(box_dir, input_parameters)
+        Returns
+        -------
+        result: dict
+            the box cached results, None if the box results are not
+            available in the cache.
+        """
+        box_dir, box_hash, input_parameters = self._get_box_id()
+        if not os.path.isfile(os.path.join(box_dir, "file_mapping.json")):
+            return None
+        return self._restore_box_result(box_dir, input_parameters)
 
-        return result
+    def _restore_box_result(self, box_dir, input_parameters):
+        """ Restore the memorized files and the box results.
+
+        Parameters
+        ----------
+        box_dir: string
+            the directory where the cache has been written.
+        input_parameters: dict
+            the box input parameters.
+
+        Returns
+        -------
+        result: dict
+            the box cached results.
+        """
+        # Restore the memorized files
+        map_fname = os.path.join(box_dir, "file_mapping.json")
+        with open(map_fname) as json_data:
+            file_mapping = json.load(json_data)
+
+        # Go through all mapping files
+        for workspace_file, memory_file in file_mapping:
+
+            # Determine if the workspace directory is writeable
+            if os.access(os.path.dirname(workspace_file), os.W_OK):
+                shutil.copy2(memory_file, workspace_file)
+            else:
+                raise Exception(
+                    "Can't restore file '{0}', access rights are "
+                    "not sufficients.".format(workspace_file))
+
+        # Update the box output traits
+        return self._load_box_result(box_dir, input_parameters)
 
     def _copy_files_to_memory(self, python_object, box_dir, file_mapping):
         """ Copy file items inside the memory.
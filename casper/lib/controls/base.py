@@ -8,19 +8,37 @@
 ##########################################################################
 
 # System import
+import copy
+import weakref
 import warnings
 
 # Casper import
 from casper.lib.base import Observable
 
 
+# The extra parameters shared by the controls: an entry is removed when no
+# control uses it anymore
+_shared_kwargs = weakref.WeakValueDictionary()
+
+
+class SharedKwargs(dict):
+    """ The extra parameters shared by several controls.
+
+    A dictionary that can be weakly referenced.
+    """
+    __slots__ = ("__weakref__", )
+
+
 class Base(Observable):
     """ Define an observable typed parameter.
 
     In order to test the parameter type, a '_is_valid' has to be
     specified. This function returned a boolean and take one parameter.
 
-    Extra parameters are stored as class parameters.
+    Extra parameters are stored in the 'kwargs' dictionary and are
+    accessible as class parameters. The 'kwargs' dictionary is shared by
+    the controls created with the same extra parameters and must not be
+    modified.
 
     A 'None' value is interpreted as an undefined parameter.
 
@@ -42,6 +60,11 @@ class Base(Observable):
     `nohash`: bool
         tells if the control must appear in the finger print of the function.
     """
+    parameters = ("optional", "type", "name", "iterable", "inner", "copy",
+                  "nohash")
+    __slots__ = parameters + (
+        "_value", "kwargs", "_allowed_signals", "_observers", "_locked")
+
     def __init__(self, value=None, *args, **kwargs):
         """ Initialize the 'Base' class.
 
@@ -61,11 +84,13 @@ class Base(Observable):
         self.inner = False
         self.copy = False
         self.nohash = False
-        self.kwargs = kwargs
+        self.kwargs = share_kwargs(kwargs)
 
-        # Store extra parameters
+        # Store the extra parameters that are class parameters, the other
+        # ones are read from 'kwargs'
         for pkey, pvalue in kwargs.items():
-            setattr(self, pkey, pvalue)
+            if pkey in self.parameters:
+                setattr(self, pkey, pvalue)
 
         # Define a 'value' signal
         Observable.__init__(self, ["value"])
@@ -73,6 +98,57 @@ class Base(Observable):
         # Set the initialized parameter value
         self._set_value(value)
 
+    def __getattr__(self, name):
+        """ Get an extra parameter.
+
+        Parameters
+        ----------
+        name: str (mandatory)
+            the extra parameter name.
+        """
+        try:
+            return Base.kwargs.__get__(self)[name]
+        except (AttributeError, KeyError):
+            raise AttributeError(
+                "'{0}' object has no attribute '{1}'.".format(
+                    type(self).__name__, name))
+
+    def __delattr__(self, name):
+        """ Delete an attribute or an extra parameter.
+
+        Parameters
+        ----------
+        name: str (mandatory)
+            the attribute name.
+        """
+        deleted = False
+        if name in self.__dict__:
+            super(Base, self).__delattr__(name)
+            deleted = True
+        if name in self.kwargs:
+            self.kwargs = share_kwargs(dict(
+                (key, value) for key, value in self.kwargs.items()
+                if key != name))
+            deleted = True
+        if not deleted:
+            super(Base, self).__delattr__(name)
+
+    def __deepcopy__(self, memo):
+        """ Copy the control value and observers, the extra parameters and
+        the allowed signals are shared with the copy.
+        """
+        klass = self.__class__
+        copied = klass.__new__(klass)
+        memo[id(self)] = copied
+        for name in slot_names(klass):
+            value = getattr(self, name)
+            if name not in ("kwargs", "_allowed_signals"):
+                value = copy.deepcopy(value, memo)
+            setattr(copied, name, value)
+        if self.__dict__:
+            copied.__dict__.update(copy.deepcopy(self.__dict__, memo))
+        return copied
+
     def _is_valid(self, value):
         """ A method used to check the value type.
 
@@ -118,7 +194,9 @@ class Base(Observable):
         if not self.inner:
             if self._is_valid(value):
                 self._value = value
-                self.notify_observers("value", value=value, **self.kwargs)
+                if self._observers:
+                    self.notify_observers(
+                        "value", value=value, **self.kwargs)
             else:
                 warnings.warn(
                     "Updating box parameter '{0}'. Parameter update "
@@ -128,3 +206,54 @@ class Base(Observable):
                                          type(value)))
 
     value = property(lambda x: x._value, _set_value)
+
+
+def share_kwargs(kwargs):
+    """ Get the shared copy of the extra parameters of a control.
+
+    Parameters
+    ----------
+    kwargs: dict (mandatory)
+        the extra parameters.
+
+    Returns
+    -------
+    shared_kwargs: dict
+        the shared extra parameters, 'kwargs' itself if a parameter value
+        can't be hashed.
+    """
+    try:
+        key = tuple(sorted(kwargs.items()))
+        shared_kwargs = _shared_kwargs.get(key)
+    except TypeError:
+        return kwargs
+    if shared_kwargs is None:
+        shared_kwargs = SharedKwargs(kwargs)
+        _shared_kwargs[key] = shared_kwargs
+    return shared_kwargs
+
+
+def slot_names(klass):
+    """ List the slots of a control class.
+
+    Parameters
+    ----------
+    klass: type (mandatory)
+        the control class.
+
+    Returns
+    -------
+    names: tuple of str
+        the slot names defined by the class and its parents.
+    """
+    names = _slot_names.get(klass)
+    if names is None:
+        names = tuple(
+            name for parent in klass.__mro__
+            for name in parent.__dict__.get("__slots__", ()))
+        _slot_names[klass] = names
+    return names
+
+
+# The slot names of the control classes
+_slot_names = {}
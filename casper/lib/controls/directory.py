@@ -17,6 +17,8 @@ from .base import Base
 class Directory(Base):
     """ Define a directory parameter.
     """
+    __slots__ = ()
+
     def _is_valid(self, value):
         """ A method used to check if the value is a directory.
 
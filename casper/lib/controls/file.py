@@ -17,6 +17,8 @@ from .base import Base
 class File(Base):
     """ Define a file parameter.
     """
+    __slots__ = ()
+
     def _is_valid(self, value):
         """ A method used to check if the value is a file name.
 
@@ -14,6 +14,8 @@ from .base import Base
 class Int(Base):
     """ Define an integer parameter.
     """
+    __slots__ = ()
+
     def _is_valid(self, value):
         """ A method used to check if the value is valid.
 
@@ -14,6 +14,8 @@ from .base import Base
 class List(Base):
     """ Define a list parameter.
     """
+    __slots__ = ("inner_control",)
+
     def __init__(self, value=None, *args, **kwargs):
         """ Initialize the 'List' class.
 
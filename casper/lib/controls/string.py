@@ -17,6 +17,8 @@ from .base import Base
 class String(Base):
     """ Define a string parameter.
     """
+    __slots__ = ()
+
     def _is_valid(self, value):
         """ A method used to check if the value is a string.
 
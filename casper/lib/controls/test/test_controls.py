@@ -9,6 +9,8 @@
 
 # System import
 import os
+import gc
+import copy
 import unittest
 import numpy
 
@@ -22,6 +24,7 @@ from casper.lib.controls import Int
 from casper.lib.controls import Float
 from casper.lib.controls import Object
 from casper.lib.controls import List
+from casper.lib.controls.base import _shared_kwargs
 
 
 class TestControls(unittest.TestCase):
@@ -55,6 +58,49 @@ class TestControls(unittest.TestCase):
         self.assertRaises(NotImplementedError, Base)
         self.assertRaises(ValueError, self.string._update_value, object())
 
+    def test_compact(self):
+        """ Method to test the compact representation of the controls.
+        """
+        # Test the extra parameters are shared and the observers are
+        # created when needed
+        control = Int(desc="an integer", optional=True)
+        self.assertTrue(control.kwargs is
+                        Int(desc="an integer", optional=True).kwargs)
+        self.assertTrue(Int(desc="an integer").kwargs is
+                        Float(desc="an integer").kwargs)
+        self.assertEqual(control.desc, "an integer")
+        self.assertTrue(control.optional)
+        self.assertFalse(hasattr(control, "bad"))
+        self.assertEqual(control._observers, None)
+
+        # Test the copy shares the extra parameters only
+        signals = []
+        control.value = 1
+        control.add_observer("value", signals.append)
+        copied_control = copy.deepcopy(control)
+        self.assertTrue(copied_control.kwargs is control.kwargs)
+        self.assertEqual(copied_control.value, 1)
+        copied_control.value = 2
+        self.assertEqual(control.value, 1)
+        self.assertEqual(len(signals), 1)
+        copied_list = copy.deepcopy(self.list)
+        self.assertEqual(copied_list.value, self.list.value)
+        self.assertFalse(copied_list.inner_control is self.list.inner_control)
+
+        # Test an extra parameter can be deleted
+        delattr(control, "desc")
+        self.assertFalse(hasattr(control, "desc"))
+        self.assertEqual(Int(desc="an integer").desc, "an integer")
+
+        # Test the extra parameters are released with their controls
+        control = Int(desc="a released integer")
+        copied_control = copy.deepcopy(control)
+        key = (("desc", "a released integer"), )
+        self.assertTrue(_shared_kwargs[key] is control.kwargs)
+        del control, copied_control
+        gc.collect()
+        self.assertFalse(key in _shared_kwargs)
+
     def test_directory(self):
         """ Method to test if the directory parameter is correctly defined.
         """
@@ -10,6 +10,8 @@
 from .bbox import Bbox
 from .pbox import Pbox
 from .ibox import Ibox
+from .pool import WorkerPool
+from .shared import SharedArrays
 
 
-__all__ = ["Bbox", "Pbox", "Ibox"]
+__all__ = ["Bbox", "Pbox", "Ibox", "WorkerPool", "SharedArrays"]
@@ -9,11 +9,11 @@
 
 # System import
 import re
-import os
+import ast
+import copy
 import sys
 import inspect
 import timeit
-import copy
 try:
     import importlib
 except:
@@ -24,14 +24,23 @@ from casper.lib.controls import controls
 from .utils import ControlObject
 from .utils import title_for
 from .utils import parse_docstring
+from .utils import capture_environ
+from .compiled import prototypes
 
 
 class Bbox(object):
     """ A building box that may be used to define a processing pipeline.
+
+    The environment stored in the returncode is captured following the
+    'environ_policy' attribute: 'none' (default), 'whitelist', 'diff' or
+    'full'. The 'environ_reference' attribute contains the whitelist
+    variable names or the baseline environment (see 'capture_environ').
     """
     xml_tag = "unit"
+    shared_attributes = ("_prototype", "_defaults", "_func_args", "_plan",
+                         "proto")
 
-    def __init__(self, funcdesc):
+    def __init__(self, funcdesc, compiled=None):
         """ Initialize the Bbox class.
 
         Parameters
@@ -39,40 +48,57 @@ class Bbox(object):
         funcdesc: string (mandatory)
             a python function path relative to the module we want to decorate
             in a building box.
+        compiled: CompiledCache (optional, default None)
+            a cache of parsed descriptions: if specified, the function
+            docstring is parsed only if its module has changed and the
+            function module is not imported until the function is needed.
         """
-        # Load the function we want to decorate in a bbox
-        func = self._load(funcdesc)
-
-        # Define class parameters
+        # Define class parameters: the function we want to decorate in a
+        # bbox is loaded when it is needed
         self.desc = funcdesc
-        self._func = func
+        self._function = None
         self.inputs = ControlObject()
         self.outputs = ControlObject()
         self.active = True
-
-        # Create the bbox name
-        self.id = self._func.__module__ + "." + title_for(self._func.__name__)
-
-        # Get the function to decorate prototype
-        self.proto = parse_docstring(self._func.__doc__)
-
-        # Update the bbox documentation
-        docstring = self._func.__doc__
-        # COMPATIBILITY: option not defined in python 2.6
-        python_version = sys.version_info
-        if python_version[:2] <= (2, 6):
-            res = re.search(r"<{0}>.*</{0}>".format(self.xml_tag), docstring,
-                            flags=re.DOTALL)
-            if res:
-                docstring = docstring.replace(
-                    docstring[res.start():res.end()], "")
-        else:
-            docstring = re.sub(r"<{0}>.*</{0}>".format(self.xml_tag), "",
-                               docstring, flags=re.DOTALL)
-        self.__doc__ += docstring
+        self.environ_policy = "none"
+        self.environ_reference = None
+        self._plan = None
+
+        # Get the function to decorate prototype from the process-wide
+        # registry: the function description is parsed and its controls are
+        # resolved once for all the bboxes of the function
+        source = self._source(funcdesc)
+        prototype = prototypes.find(funcdesc, source)
+        if prototype is None:
+            if compiled is None or source is None:
+                description = self._parse_description()
+            else:
+                description = compiled.get(
+                    funcdesc, source, self._parse_description)
+            prototype = self._build_prototype(description)
+            prototypes.register(funcdesc, source, prototype)
+        elif compiled is not None:
+            compiled.add(funcdesc, source, prototype["description"])
+        self._prototype = prototype
+        self._defaults = prototype["defaults"]
+        self._func_args = prototype["args"]
+
+        # Create the bbox name and update the bbox documentation
+        self.id = prototype["id"]
+        self.proto = prototype["proto"]
+        self.__doc__ += prototype["doc"]
 
         # Create the input and output controls
-        self._set_controls()
+        self._create_controls()
+
+    @property
+    def _func(self):
+        """ The function decorated in this bbox, its module is imported the
+        first time it is accessed.
+        """
+        if self._function is None:
+            self._function = self._load(self.desc)
+        return self._function
 
     def __call__(self, box_name=None, *args, **kwargs):
         """ Execute the Bbox class.
@@ -88,25 +114,33 @@ class Bbox(object):
             the 'inputs', 'outputs', 'stdout', stderr', 'environ' and 'time'
             results obtained after the bbox execution.
         """
-        # Build expression and namespace
-        namespace, expression = self._build_expression()
+        # Get the function parameters and returned values
+        if self._plan is None:
+            self._plan = self._build_execution_plan()
+        input_names, output_names = self._plan
 
         # Execute the function
+        namespace = dict(
+            (control_name, self.inputs[control_name].value)
+            for control_name in input_names)
         tic = timeit.default_timer()
-        exec(expression, namespace)
+        result = self._func(**namespace)
         toc = timeit.default_timer()
 
+        # Unpack the returned values
+        if len(output_names) == 1:
+            namespace[output_names[0]] = result
+        elif len(output_names) > 1:
+            result = tuple(result)
+            if len(result) != len(output_names):
+                raise ValueError(
+                    "Bbox '{0}' function returned {1} values, expect "
+                    "{2}.".format(self.id, len(result), output_names))
+            namespace.update(zip(output_names, result))
+
         # Create a returncode
         box_name = box_name or self.id
-        # COMPATIBILITY: dict in python 2 becomes structure in pyton 3
-        python_version = sys.version_info
-        if python_version[0] < 3:
-            environ = copy.deepcopy(os.environ.__dict__)
-        else:
-            environ = copy.deepcopy(os.environ._data)
-            for key in environ:
-                value = environ.pop(key)
-                environ[key.decode("utf-8")] = value.decode("utf-8")
+        environ = capture_environ(self.environ_policy, self.environ_reference)
         returncode = dict([
             (box_name, dict([
                 ("inputs", {}), ("outputs", {}), ("stdout", None),
@@ -124,10 +158,63 @@ class Bbox(object):
 
         return returncode
 
+    def __deepcopy__(self, memo):
+        """ Copy the bbox: the function prototype is shared with the copy.
+        """
+        box = self.__class__.__new__(self.__class__)
+        memo[id(self)] = box
+        for name, value in self.__dict__.items():
+            if name not in self.shared_attributes:
+                value = copy.deepcopy(value, memo)
+            box.__dict__[name] = value
+        return box
+
     ###########################################################################
     # Public Members
     ###########################################################################
 
+    def copy(self):
+        """ Create a bbox that shares the function and its description with
+        this bbox.
+
+        The function is not reloaded and its prototype is not parsed again:
+        only the controls are created, with the current control names and
+        values.
+
+        Returns
+        -------
+        box: Bbox
+            the new bbox.
+        """
+        box = copy.copy(self)
+        box.inputs = ControlObject()
+        box.outputs = ControlObject()
+        box._create_controls()
+        for control_name in self.inputs.controls:
+            control = box.inputs[control_name]
+            control.name = self.inputs[control_name].name
+            control.value = self.inputs[control_name].value
+        for control_name in self.outputs.controls:
+            if self.outputs[control_name].type != "reference":
+                control = box.outputs[control_name]
+                control.name = self.outputs[control_name].name
+                control.value = self.outputs[control_name].value
+        return box
+
+    def reset_controls(self):
+        """ Restore the initial values of the input and output controls.
+
+        The function default values are restored and the other controls
+        are undefined.
+        """
+        for control_name in self.inputs.controls:
+            setattr(self.inputs, control_name,
+                    self._defaults.get(control_name))
+        for control_name in self.outputs.controls:
+            if self.outputs[control_name].type != "reference":
+                setattr(self.outputs, control_name,
+                        self._defaults.get(control_name))
+
     def update_control_names(self, prefix):
         """ Update the control names.
 
@@ -149,55 +236,121 @@ class Bbox(object):
     # Private Members
     ###########################################################################
 
-    def _build_expression(self):
-        """ Build an expression and namespace in order to execute the function
-        attached to this bbox.
+    def _build_execution_plan(self):
+        """ Get the names of the parameters and returned values of the
+        function attached to this bbox.
+
+        The returned value names are parsed from the last line of the
+        function source code.
+
+        Returns
+        -------
+        input_names: list of str
+            the function parameter names.
+        output_names: list of str
+            the function returned value names.
         """
         # Get the function parameters and retunred values
-        inputs = inspect.getargspec(self._func).args
+        input_names = self._func_args
         code = inspect.getsourcelines(self._func)
         return_pattern = r"return\s*(.*)\n*$"
-        outputs = re.findall(return_pattern, code[0][-1])
-
-        # Build the expression namespace
-        namespace = {"function": self._func}
-
-        # Deal with all function input parameters
-        kwargs = []
-        for control_name in inputs:
-
-            # Check input function parameter has been declared on the bbox
-            if control_name not in self.inputs.controls:
+        output_names = []
+        for returned in re.findall(return_pattern, code[0][-1]):
+            output_names.extend(
+                [name.strip() for name in returned.split(",")])
+
+        # Check input function parameters have been declared on the bbox
+        for control_name in input_names:
+            if control_name not in self.inputs:
                 raise Exception(
                     "Impossible to execute Bbox '{0}': function input "
                     "parameter '{1}' has not been defined in function '<{2}>' "
                     "description.".format(self.id, control_name, self.xml_tag))
-            # Update namespace
-            namespace[control_name] = getattr(self.inputs, control_name).value
-            # Create kwargs
-            kwargs.append("{0}={0}".format(control_name))
 
-        # Deal with all function returned parameters
-        for control_name in outputs:
-
-            # Check returned function parameter has been declared on the bbox
-            if control_name not in self.outputs.controls:
+        # Check returned function parameters have been declared on the bbox
+        for control_name in output_names:
+            if control_name not in self.outputs:
                 raise Exception(
                     "Impossible to execute Bbox '{0}': function returned "
                     "parameter '{1}' has not been defined in function '<{2}>' "
                     "description.".format(self.id, control_name, self.xml_tag))
-            # Update namespace
-            namespace[control_name] = None
 
-        # Build the function expression
-        expression = "function({0})".format(", ".join(kwargs))
+        return list(input_names), output_names
 
-        # If we have some returned values, update the expression
-        if outputs:
-            return_expression = ", ".join(outputs)
-            expression = "{0} = {1}".format(return_expression, expression)
+    def _parse_description(self):
+        """ Parse the function docstring and signature.
 
-        return namespace, expression
+        Returns
+        -------
+        description: dict
+            the bbox 'id', the function prototype ('proto'), the docstring
+            without the prototype ('doc'), the function parameter names
+            ('args') and the representations of their default values
+            ('defaults'), None if a default value can't be restored from its
+            representation.
+        """
+        docstring = self._func.__doc__
+        proto = parse_docstring(docstring)
+        # COMPATIBILITY: option not defined in python 2.6
+        python_version = sys.version_info
+        if python_version[:2] <= (2, 6):
+            res = re.search(r"<{0}>.*</{0}>".format(self.xml_tag), docstring,
+                            flags=re.DOTALL)
+            if res:
+                docstring = docstring.replace(
+                    docstring[res.start():res.end()], "")
+        else:
+            docstring = re.sub(r"<{0}>.*</{0}>".format(self.xml_tag), "",
+                               docstring, flags=re.DOTALL)
+        args = inspect.getargspec(self._func)
+        defaults = dict(zip(reversed(args.args or []),
+                            reversed(args.defaults or [])))
+        for name, value in defaults.items():
+            try:
+                if ast.literal_eval(repr(value)) != value:
+                    raise ValueError
+                defaults[name] = repr(value)
+            except (ValueError, SyntaxError):
+                defaults = None
+                break
+        return {
+            "id": self._func.__module__ + "." + title_for(
+                self._func.__name__),
+            "proto": proto,
+            "doc": docstring,
+            "args": args.args or [],
+            "defaults": defaults}
+
+    def _source(self, funcdesc):
+        """ Find the source file of the function module without importing
+        the module.
+
+        Parameters
+        ----------
+        funcdesc: string (mandatory)
+            a python function path relative to the module we want to decorate
+            in a building box.
+
+        Returns
+        -------
+        source: str
+            the source file of the function module, None if it can't be
+            found.
+        """
+        module_name = ".".join(funcdesc.split(".")[:-1])
+        if module_name in sys.modules:
+            source = getattr(sys.modules[module_name], "__file__", None)
+        else:
+            # COMPATIBILITY: function not defined before python 3.4
+            try:
+                import importlib.util
+                spec = importlib.util.find_spec(module_name)
+            except (ImportError, AttributeError, ValueError):
+                spec = None
+            source = getattr(spec, "origin", None)
+        if source is not None and source.endswith((".pyc", ".pyo")):
+            source = source[:-1]
+        return source
 
     def _load(self, funcdesc):
         """ Load the function from its description.
@@ -229,21 +382,42 @@ class Bbox(object):
 
         return getattr(module, func_name)
 
-    def _set_controls(self):
-        """ Define the bbox input and output parameters. Each parameter is
-        a control defined in 'casper.lib.controls'.
+    def _build_prototype(self, description):
+        """ Resolve the function default values and control types.
 
         Expected control attibutes are: 'type', 'name', 'description', 'from',
         'role'.
+
+        Parameters
+        ----------
+        description: dict
+            the parsed function description (see '_parse_description').
+
+        Returns
+        -------
+        prototype: dict
+            the parsed function 'description', its 'id', 'proto', 'doc' and
+            'args', the function default values ('defaults'), the
+            ('role', 'name', 'class', 'description', 'content') definitions
+            of the controls ('controls') and the input control names shared
+            as outputs ('references').
         """
-        # Get the function default values
-        args = inspect.getargspec(self._func)
-        defaults = dict(zip(reversed(args.args or []),
-                            reversed(args.defaults or [])))
+        # Get the function default values: the function is loaded if they
+        # can't be restored from their representations
+        if description["defaults"] is None:
+            args = inspect.getargspec(self._func)
+            defaults = dict(zip(reversed(args.args or []),
+                                reversed(args.defaults or [])))
+        else:
+            defaults = dict(
+                (name, ast.literal_eval(value))
+                for name, value in description["defaults"].items())
 
         # Go through all controls defined in the function prototype
+        box_id = description["id"]
+        control_defs = []
         shared_output_controls = []
-        for desc in self.proto:
+        for desc in description["proto"]:
 
             # Detect shared output controls
             if "from" in desc and desc["role"] == "output":
@@ -254,50 +428,65 @@ class Bbox(object):
             control_type = desc.get("type", None)
             if control_type is None:
                 raise Exception("Impossible to warp Bbox '{0}': control type "
-                                "undefined.".format(self.id))
+                                "undefined.".format(box_id))
             control_desc = desc.get("description", "")
             control_name = desc.get("name", None)
             if control_name is None:
                 raise Exception("Impossible to warp Bbox '{0}': control name "
-                                "undefined.".format(self.id))
+                                "undefined.".format(box_id))
             control_content = desc.get("content", None)
 
             # Check if the control type is valid
-            if control_type in controls:
-
-                # Create the control
-                control = controls[control_type](
-                    desc=control_desc, content=control_content)
-                control.name = control_name
-                if control_name in defaults:
-                    control.optional = True
-                    control.value = defaults[control_name]
-
-                # Split output controls
-                if desc["role"] == "output":
-                    control.type = "output"
-                    setattr(self.outputs, control_name, control)
-
-                # And input controls
-                else:
-                    control.type = "input"
-                    setattr(self.inputs, control_name, control)
-
-            # Raise an exception otherwise
-            else:
+            if control_type not in controls:
                 raise Exception(
                     "Impossible to warp Bbox '{0}': unknown control type "
-                    "'{1}', expect one in {2}.".format(self.id, control_type,
+                    "'{1}', expect one in {2}.".format(box_id, control_type,
                                                        controls.keys()))
+            role = "output" if desc["role"] == "output" else "input"
+            control_defs.append((role, control_name, controls[control_type],
+                                 control_desc, control_content))
 
-        # Deal with shared output controls
+        # Check the shared output controls
+        input_names = [item[1] for item in control_defs if item[0] == "input"]
         for input_control_name in shared_output_controls:
-            if input_control_name in self.inputs.controls:
-                control = self.inputs[input_control_name]
-                control.type = "reference"
-                setattr(self.outputs, input_control_name, control)
-            else:
+            if input_control_name not in input_names:
                 raise Exception(
                     "Impossible to warp Bbox '{0}': unknown input control "
                     "'{1}' detected in shared output creation.".format(
-                        self.id, input_control_name))
+                        box_id, input_control_name))
+
+        return {
+            "description": description,
+            "id": box_id,
+            "proto": description["proto"],
+            "doc": description["doc"],
+            "args": description["args"],
+            "defaults": defaults,
+            "controls": control_defs,
+            "references": shared_output_controls}
+
+    def _create_controls(self):
+        """ Create the bbox input and output controls from the function
+        prototype and default values.
+        """
+        # Create the controls from their resolved definitions
+        defaults = self._defaults
+        for control_def in self._prototype["controls"]:
+            (role, control_name, control_class, control_desc,
+             control_content) = control_def
+            control = control_class(desc=control_desc, content=control_content)
+            control.name = control_name
+            if control_name in defaults:
+                control.optional = True
+                control.value = defaults[control_name]
+            control.type = role
+            if role == "output":
+                setattr(self.outputs, control_name, control)
+            else:
+                setattr(self.inputs, control_name, control)
+
+        # Deal with shared output controls
+        for input_control_name in self._prototype["references"]:
+            control = self.inputs[input_control_name]
+            control.type = "reference"
+            setattr(self.outputs, input_control_name, control)
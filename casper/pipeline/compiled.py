@@ -0,0 +1,247 @@
+#! /usr/bin/env python
+##########################################################################
+# CASPER - Copyright (C) AGrigis, 2013
+# Distributed under the terms of the CeCILL-B license, as published by
+# the CEA-CNRS-INRIA. Refer to the LICENSE file or to
+# http://www.cecill.info/licences/Licence_CeCILL-B_V1-en.html
+# for details.
+##########################################################################
+
+# System import
+import os
+import json
+import hashlib
+import tempfile
+
+
+class CompiledCache(object):
+    """ An on-disk cache of the parsed descriptions of a pipeline.
+
+    The xml descriptions of the pipelines and the docstring descriptions of
+    the units are stored in a single json file per top level pipeline. Each
+    description is keyed by the modification time and size of its source
+    file: a description whose source file has changed is parsed again. A
+    cache file written with another 'version' of the descriptions is
+    ignored.
+
+    Attributes
+    ----------
+    `path`: str
+        the json file containing the cached descriptions, None if the
+        descriptions are not stored on disk.
+    `hits`, `misses`: int
+        the cache statistics.
+    """
+    version = 2
+
+    def __init__(self, xmldesc, cachedir=None):
+        """ Initialize the CompiledCache class.
+
+        Parameters
+        ----------
+        xmldesc: str (mandatory)
+            the top level pipeline description.
+        cachedir: str (optional, default None)
+            the directory containing the cache files. If None the
+            descriptions are only shared between the boxes of the pipeline.
+        """
+        self.path = None
+        self.hits = 0
+        self.misses = 0
+        self._descriptions = {}
+        self._signatures = {}
+        self._modified = False
+        if cachedir is not None:
+            if not os.path.isdir(cachedir):
+                os.makedirs(cachedir)
+            self.path = os.path.join(cachedir, "{0}.json".format(
+                hashlib.md5(xmldesc.encode("utf-8")).hexdigest()))
+            if os.path.isfile(self.path):
+                try:
+                    with open(self.path) as open_file:
+                        content = json.load(open_file)
+                except ValueError:
+                    content = {}
+                if (isinstance(content, dict) and
+                        content.get("version") == self.version):
+                    self._descriptions = content["descriptions"]
+
+    def get(self, key, source, parser, *args):
+        """ Get a description from the cache or parse it.
+
+        Parameters
+        ----------
+        key: str (mandatory)
+            the description identifier.
+        source: str (mandatory)
+            the file the description is parsed from.
+        parser: callable (mandatory)
+            the function that parses the description.
+        args: list (optional)
+            the parser parameters.
+
+        Returns
+        -------
+        desc: object
+            the json serializable parsed description. A description whose
+            source file does not exist is parsed without being cached.
+        """
+        signature = self._signature(source)
+        if signature is None:
+            return parser(*args)
+        cached = self._descriptions.get(key)
+        if (cached is not None and cached["source"] == source and
+                cached["signature"] == signature):
+            self.hits += 1
+            return cached["desc"]
+        self.misses += 1
+        desc = parser(*args)
+        self._descriptions[key] = {
+            "source": source, "signature": signature, "desc": desc}
+        self._modified = True
+        return desc
+
+    def add(self, key, source, desc):
+        """ Store a description parsed elsewhere in the cache file.
+
+        Parameters
+        ----------
+        key: str (mandatory)
+            the description identifier.
+        source: str (mandatory)
+            the file the description is parsed from.
+        desc: object (mandatory)
+            the json serializable parsed description.
+        """
+        if self.path is not None:
+            self.get(key, source, lambda: desc)
+
+    def save(self):
+        """ Write the descriptions parsed since the cache was loaded.
+
+        The cache file is replaced atomically so that concurrent pipeline
+        creations always read a complete file.
+        """
+        if self.path is None or not self._modified:
+            return
+        fd, tmpfile = tempfile.mkstemp(
+            dir=os.path.dirname(self.path), suffix=".json")
+        with os.fdopen(fd, "w") as open_file:
+            json.dump({"version": self.version,
+                       "descriptions": self._descriptions}, open_file)
+        os.rename(tmpfile, self.path)
+        self._modified = False
+
+    def _signature(self, source):
+        """ Get the modification time and size of a source file.
+
+        Parameters
+        ----------
+        source: str (mandatory)
+            the source file.
+
+        Returns
+        -------
+        signature: list
+            the source file modification time and size, None if the file
+            does not exist.
+        """
+        if source not in self._signatures:
+            self._signatures[source] = file_signature(source)
+        return self._signatures[source]
+
+
+class PrototypeRegistry(object):
+    """ A process-wide registry of the unit prototypes.
+
+    A prototype is registered with the function path and the source file of
+    its module, and is found again as long as the modification time and
+    size of the source file do not change.
+
+    Attributes
+    ----------
+    `hits`, `misses`: int
+        the registry statistics.
+    """
+    def __init__(self):
+        """ Initialize the PrototypeRegistry class.
+        """
+        self.hits = 0
+        self.misses = 0
+        self._prototypes = {}
+
+    def __len__(self):
+        """ The number of registered prototypes.
+        """
+        return len(self._prototypes)
+
+    def find(self, funcdesc, source):
+        """ Find a registered prototype.
+
+        Parameters
+        ----------
+        funcdesc: str (mandatory)
+            the function path.
+        source: str (mandatory)
+            the source file of the function module.
+
+        Returns
+        -------
+        prototype: object
+            the registered prototype, None if the function has not been
+            registered or if its source file has changed.
+        """
+        registered = self._prototypes.get(funcdesc)
+        signature = file_signature(source)
+        if (registered is not None and signature is not None and
+                registered[:2] == (source, signature)):
+            self.hits += 1
+            return registered[2]
+        self.misses += 1
+        return None
+
+    def register(self, funcdesc, source, prototype):
+        """ Register a prototype.
+
+        Parameters
+        ----------
+        funcdesc: str (mandatory)
+            the function path.
+        source: str (mandatory)
+            the source file of the function module. A prototype without
+            source file is not registered.
+        prototype: object (mandatory)
+            the prototype.
+        """
+        signature = file_signature(source)
+        if signature is not None:
+            self._prototypes[funcdesc] = (source, signature, prototype)
+
+    def clear(self):
+        """ Remove all the registered prototypes.
+        """
+        self._prototypes.clear()
+
+
+def file_signature(source):
+    """ Get the modification time and size of a file.
+
+    Parameters
+    ----------
+    source: str (mandatory)
+        the file path.
+
+    Returns
+    -------
+    signature: list
+        the file modification time and size, None if the file does not
+        exist.
+    """
+    if source is None or not os.path.isfile(source):
+        return None
+    stat = os.stat(source)
+    return [stat.st_mtime, stat.st_size]
+
+
+# The prototypes of the units created in this process
+prototypes = PrototypeRegistry()
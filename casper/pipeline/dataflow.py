@@ -0,0 +1,195 @@
+#! /usr/bin/env python
+##########################################################################
+# CASPER - Copyright (C) AGrigis, 2013
+# Distributed under the terms of the CeCILL-B license, as published by
+# the CEA-CNRS-INRIA. Refer to the LICENSE file or to
+# http://www.cecill.info/licences/Licence_CeCILL-B_V1-en.html
+# for details.
+##########################################################################
+
+# System import
+import heapq
+import warnings
+
+# Casper import
+from casper.lib.base.observable import SignalObject
+
+
+class Dataflow(object):
+    """ A table of the control links of a pipeline that applies value
+    updates in batch.
+
+    The links are also registered as observers of their source controls so
+    that a single control set propagates as before. A batch update only goes
+    through the controls reached from the updated controls, in the link
+    order, and sets each reached control a single time: a destination
+    reached by several updated sources is validated once, with the value of
+    the last of these sources, and no signal is created for the links. A
+    destination with the same type, content and choices as its source
+    accepts the validated source value without validating it again. The
+    observers that are not links of the table are notified once with the
+    final control value.
+
+    Attributes
+    ----------
+    `nb_of_links`: int
+        the number of links in the table.
+    """
+    def __init__(self):
+        """ Initialize the Dataflow class.
+        """
+        self.nb_of_links = 0
+        self._controls = {}
+        self._destinations = {}
+        self._link_observers = {}
+        self._trusted_links = set()
+        self._order = None
+        self._ranks = None
+
+    def add_link(self, src_control, dest_control):
+        """ Link two controls.
+
+        Parameters
+        ----------
+        src_control, dest_control: Base (mandatory)
+            the source and destination controls.
+        """
+        destinations = self._destinations.setdefault(src_control, [])
+        if dest_control in destinations:
+            return
+        for control in (src_control, dest_control):
+            self._controls.setdefault(control, len(self._controls))
+        destinations.append(dest_control)
+        self._link_observers.setdefault(src_control, set()).add(
+            dest_control._update_value)
+        if (type(src_control) is type(dest_control) and
+                getattr(src_control, "content", None) ==
+                getattr(dest_control, "content", None) and
+                getattr(src_control, "choices", None) ==
+                getattr(dest_control, "choices", None)):
+            self._trusted_links.add((src_control, dest_control))
+        src_control.add_observer("value", dest_control._update_value)
+        self.nb_of_links += 1
+        self._order = None
+        self._ranks = None
+
+    def merge(self, dataflow):
+        """ Add the links of another table in this table.
+
+        The links are already registered as observers: only the table is
+        updated.
+
+        Parameters
+        ----------
+        dataflow: Dataflow (mandatory)
+            the table to merge.
+        """
+        for src_control, destinations in dataflow._destinations.items():
+            own_destinations = self._destinations.setdefault(src_control, [])
+            for dest_control in destinations:
+                if dest_control not in own_destinations:
+                    own_destinations.append(dest_control)
+                    self.nb_of_links += 1
+            self._link_observers.setdefault(src_control, set()).update(
+                dataflow._link_observers[src_control])
+        for control in sorted(dataflow._controls,
+                              key=dataflow._controls.get):
+            self._controls.setdefault(control, len(self._controls))
+        self._trusted_links.update(dataflow._trusted_links)
+        self._order = None
+        self._ranks = None
+
+    def update(self, updates):
+        """ Set control values in a single pass.
+
+        Parameters
+        ----------
+        updates: list of 2-uplet (mandatory)
+            the (control, value) pairs to set. The controls that are not in
+            the table are set through their observers.
+        """
+        # Set the controls that are not linked in the table
+        if self._order is None:
+            self._order = self._sort()
+            self._ranks = dict(
+                (control, rank) for rank, control in enumerate(self._order))
+        pending = {}
+        ranks = []
+        for control, value in updates:
+            if control in self._controls:
+                if control not in pending:
+                    ranks.append(self._ranks[control])
+                pending[control] = (value, None)
+            else:
+                control.value = value
+        if not pending:
+            return
+
+        # Go through the reached controls in the link order: a control is
+        # set once its sources have been set
+        heapq.heapify(ranks)
+        while ranks:
+            control = self._order[heapq.heappop(ranks)]
+            value, src_control = pending.pop(control)
+            if control.inner:
+                continue
+            if ((src_control, control) not in self._trusted_links and
+                    not control._is_valid(value)):
+                warnings.warn(
+                    "Updating box parameter '{0}'. Parameter update "
+                    "error {1}: old value '{2}'({3}), new value "
+                    "'{4}'({5}).".format(control.name, type(control),
+                                         control._value,
+                                         type(control._value), value,
+                                         type(value)))
+                continue
+            control._value = value
+            for dest_control in self._destinations.get(control, []):
+                if dest_control not in pending:
+                    heapq.heappush(ranks, self._ranks[dest_control])
+                pending[dest_control] = (value, control)
+
+            # Notify the observers that are not links of the table
+            link_observers = self._link_observers.get(control, ())
+            observers = [
+                observer for observer in control._get_observers("value")
+                if observer not in link_observers]
+            if observers and not control._locked:
+                control._locked = True
+                signal = SignalObject()
+                signal.object = control
+                signal.signal = "value"
+                signal.value = value
+                for name, item in control.kwargs.items():
+                    setattr(signal, name, item)
+                try:
+                    for observer in observers:
+                        observer(signal)
+                finally:
+                    control._locked = False
+
+    def _sort(self):
+        """ Sort the linked controls so that a control comes after all its
+        sources.
+
+        Returns
+        -------
+        order: list of Base
+            the sorted controls.
+        """
+        degrees = dict((control, 0) for control in self._controls)
+        for destinations in self._destinations.values():
+            for dest_control in destinations:
+                degrees[dest_control] += 1
+        order = [control for control in sorted(
+            self._controls, key=self._controls.get) if degrees[control] == 0]
+        index = 0
+        while index < len(order):
+            for dest_control in self._destinations.get(order[index], []):
+                degrees[dest_control] -= 1
+                if degrees[dest_control] == 0:
+                    order.append(dest_control)
+            index += 1
+        if len(order) != len(self._controls):
+            raise ValueError("The control links contain a cycle.")
+        return order
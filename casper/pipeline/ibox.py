@@ -8,24 +8,248 @@
 ##########################################################################
 
 # System import
-import numpy
 import copy
 import sys
+import weakref
 
 # Casper import
 from casper.lib.controls import controls
 from .utils import ControlObject
+from .reducers import reducers as reducer_types
 from casper.lib.base import Graph
 from casper.lib.base import GraphNode
 
 
+class IterationStream(object):
+    """ Forward the values of an iteration output to an input of another
+    iteration.
+
+    The destination iteration is weakly referenced and is not built: the
+    value is stored in its input values until its box copy is created.
+    """
+    __slots__ = ("iteration", "control_name")
+
+    def __init__(self, iteration, control_name):
+        """ Initialize the IterationStream class.
+
+        Parameters
+        ----------
+        iteration: BboxIteration (mandatory)
+            the destination iteration.
+        control_name: str (mandatory)
+            the destination input control name.
+        """
+        self.iteration = weakref.ref(iteration)
+        self.control_name = control_name
+
+    def update(self, signal):
+        """ Forward the new value of the source output.
+        """
+        iteration = self.iteration()
+        if iteration is not None:
+            iteration.set_input(self.control_name, signal.value)
+
+
+class BboxIteration(object):
+    """ A lightweight iteration of a building box.
+
+    The iteration shares the iterated bbox and only stores its input
+    values. The bbox copy that executes the iteration is created on the
+    first access to one of its attributes, ie. when the iteration is
+    dispatched.
+    """
+    def __init__(self, bbox, values, defaults=None):
+        """ Initialize the BboxIteration class.
+
+        Parameters
+        ----------
+        bbox: Bbox (mandatory)
+            the iterated bbox.
+        values: dict (mandatory)
+            the iteration input values.
+        defaults: dict (optional, default None)
+            the input values shared by all the iterations.
+        """
+        self.bbox = bbox
+        self.values = values
+        self.defaults = defaults or {}
+        self.desc = bbox.desc
+        self.id = bbox.id
+        self._box = None
+        self._streams = None
+
+    def __getattr__(self, name):
+        """ Get the attributes of the box copy.
+        """
+        if name.startswith("__") or name in (
+                "bbox", "values", "defaults", "_box", "_streams"):
+            raise AttributeError(name)
+        return getattr(self.build(), name)
+
+    def __call__(self, *args, **kwargs):
+        """ Execute the box copy.
+        """
+        return self.build()(*args, **kwargs)
+
+    def build(self):
+        """ Create the bbox copy that executes the iteration.
+
+        Returns
+        -------
+        box: Bbox
+            the parametrized bbox copy.
+        """
+        if self._box is None:
+            box = self.bbox.copy()
+            with box.inputs.batch():
+                for values in (self.defaults, self.values):
+                    for control_name, value in values.items():
+                        setattr(box.inputs, control_name, value)
+            self._box = box
+            self._link_streams()
+        return self._box
+
+    def set_input(self, control_name, value):
+        """ Set an input value of the iteration without creating the box
+        copy.
+
+        Parameters
+        ----------
+        control_name: str (mandatory)
+            the input control name.
+        value: object (mandatory)
+            the new input value.
+        """
+        if self._box is None:
+            self.values[control_name] = value
+        else:
+            setattr(self._box.inputs, control_name, value)
+
+    def stream(self, control_name, iteration, iteration_control_name):
+        """ Forward an output of the iteration to an input of another
+        iteration.
+
+        The output control is observed once the box copy is created, so
+        that neither iteration is built when the stream is registered.
+
+        Parameters
+        ----------
+        control_name: str (mandatory)
+            the output control name.
+        iteration: BboxIteration (mandatory)
+            the destination iteration.
+        iteration_control_name: str (mandatory)
+            the destination input control name.
+        """
+        if self._streams is None:
+            self._streams = []
+        self._streams.append(
+            (control_name, IterationStream(iteration, iteration_control_name)))
+        if self._box is not None:
+            self._link_streams(self._streams[-1:])
+
+    def _link_streams(self, streams=None):
+        """ Observe the streamed outputs of the box copy.
+
+        Parameters
+        ----------
+        streams: list of 2-uplet (optional, default None)
+            the output control names and the streams to link, by default
+            all the registered streams.
+        """
+        for control_name, stream in streams or self._streams or []:
+            getattr(self._box.outputs, control_name).add_observer(
+                "value", stream.update)
+
+
+class PboxIteration(BboxIteration):
+    """ A lightweight iteration of a pipeline box.
+
+    The pbox copy that executes the iteration is created on the first
+    access to one of its attributes or to one of its inner boxes (see
+    'InnerBox').
+    """
+    def build(self):
+        """ Create the pbox copy that executes the iteration.
+
+        Returns
+        -------
+        box: Pbox
+            the parametrized pbox copy.
+        """
+        if self._box is None:
+            # COMPATIBILITY: correctly copy bound instance methods after
+            # python 2.7
+            if sys.version_info[:2] <= (2, 6):
+                box = type(self.bbox)(self.bbox.desc)
+            else:
+                box = copy.deepcopy(self.bbox)
+            with box.inputs.batch():
+                for control_name, value in self.values.items():
+                    setattr(box.inputs, control_name, value)
+            self._box = box
+            self._link_streams()
+        return self._box
+
+    def find_box(self, box_name):
+        """ Find an inner box of the pbox copy.
+
+        Parameters
+        ----------
+        box_name: str (mandatory)
+            the flattened inner box name, the names of the nested pboxes
+            being separated by dots.
+
+        Returns
+        -------
+        box: Bbox or Ibox
+            the inner box of the pbox copy.
+        """
+        box = self.build()
+        for name in box_name.split("."):
+            box = box._boxes[name]
+        return box
+
+
+class InnerBox(object):
+    """ A reference to an inner box of a pbox iteration, resolved when one
+    of its attributes is accessed.
+    """
+    def __init__(self, iteration, box_name):
+        """ Initialize the InnerBox class.
+
+        Parameters
+        ----------
+        iteration: PboxIteration (mandatory)
+            the pbox iteration.
+        box_name: str (mandatory)
+            the flattened inner box name.
+        """
+        self.iteration = iteration
+        self.box_name = box_name
+
+    def __getattr__(self, name):
+        """ Get the attributes of the inner box.
+        """
+        if name.startswith("__") or name in ("iteration", "box_name"):
+            raise AttributeError(name)
+        return getattr(self.iteration.find_box(self.box_name), name)
+
+    def __call__(self, *args, **kwargs):
+        """ Execute the inner box.
+        """
+        return self.iteration.find_box(self.box_name)(*args, **kwargs)
+
+
 class Ibox(object):
     """ An iterative box that may be used to iterate over a building box.
     """
     iterprefix = "iter"
     itersep = "&"
+    itermodes = ["zip", "product"]
 
-    def __init__(self, box, iterinputs=None, iteroutputs=None):
+    def __init__(self, box, iterinputs=None, iteroutputs=None, chunksize=1,
+                 reducers=None, itermode="zip"):
         """ Initialize the Ibox class.
 
         Parameters
@@ -36,14 +260,68 @@ class Ibox(object):
             the list of iterative input controls.
         iteroutputs: list of str (optional, default None)
             the list of iterative output controls.
+        chunksize: int or str (optional, default 1)
+            the number of iterations of a building box executed in a single
+            worker job, or 'auto' to choose it from the measured iteration
+            durations. The iterations of a pipeline box are not chunked.
+        reducers: dict (optional, default None)
+            the reducers of the output controls that are folded in a single
+            value as the iterations complete (see
+            'casper.pipeline.reducers'). A reduced output keeps its name in
+            the ibox and is not iterative.
+        itermode: str (optional, default 'zip')
+            the iteration mode: 'zip' iterates over the elements of the
+            iterative inputs with the same index, 'product' iterates over
+            all the combinations of elements. The combinations are
+            generated from the iteration indices when the iterations are
+            expanded.
         """
+        # Check the chunk size
+        if chunksize != "auto" and (
+                not isinstance(chunksize, int) or chunksize < 1):
+            raise ValueError(
+                "Impossible to build Ibox '{0}': the chunk size must be a "
+                "positive integer or 'auto', got '{1}'.".format(
+                    box.id, chunksize))
+
+        # Check the iteration mode
+        if itermode not in self.itermodes:
+            raise ValueError(
+                "Impossible to build Ibox '{0}': '{1}' is not a valid "
+                "iteration mode. Allowed modes are {2}.".format(
+                    box.id, itermode, self.itermodes))
+
+        # Check the reducers
+        reducers = reducers or {}
+        for control_name, reducer in reducers.items():
+            if reducer not in reducer_types or reducer == "list":
+                raise ValueError(
+                    "Impossible to build Ibox '{0}': '{1}' is not a valid "
+                    "reducer for output '{2}'. Allowed reducers are "
+                    "{3}.".format(box.id, reducer, control_name, sorted(
+                        name for name in reducer_types if name != "list")))
+            if control_name in (iteroutputs or []):
+                raise ValueError(
+                    "Impossible to build Ibox '{0}': the '{1}' output can't "
+                    "be both iterative and reduced.".format(
+                        box.id, control_name))
+
         # Define class parameters
         self.iterinputs = iterinputs or []
         self.iteroutputs = iteroutputs or []
+        self.reducers = reducers
+        self.chunksize = chunksize
+        self.itermode = itermode
+        self._reductions = None
+        self._templates = {}
         self.ispbox = False
         self.iterbox = box
+        self.iterswitches = []
         if self.iterbox.__class__.__name__ == "Pbox":
             self.ispbox = True
+            self.iterswitches = [
+                control_name for control_name in self.iterinputs
+                if control_name in self.iterbox._switches]
         self.inputs = ControlObject()
         self.outputs = ControlObject()
         self.active = True
@@ -71,11 +349,10 @@ class Ibox(object):
             results obtained after the bbox execution.
         """
         # Parametrize the iterative bbox input parameters
-        for control_name in self.iterinputs:
-            itercontrol_name = "iter{0}".format(control_name)
-            control_value = getattr(self.inputs, itercontrol_name).value
-            setattr(
-                self.iterbox.inputs, control_name, control_value[iterindex])
+        values = self.iteration_values(iterindex)
+        with self.iterbox.inputs.batch():
+            for control_name, value in values.items():
+                setattr(self.iterbox.inputs, control_name, value)
 
         # Execute the bbox
         box_name += str(iterindex)
@@ -96,83 +373,188 @@ class Ibox(object):
         iterboxes: list of box (mandatory)
             the executed iterative boxes used to update the ibox outputs.
         """
-        # Update all the ibox outputs
-        for control_name in self.outputs.controls:
+        self.start_reduction(len(iterboxes))
+        for iteration, box in enumerate(iterboxes):
+            self.reduce_iteration(iteration, box)
+        self.finish_reduction()
+
+    def start_reduction(self, nb_of_iterations):
+        """ Prepare the folding of the iteration outputs.
 
-            # Get the non iterative control name and the iterative boxes
-            # outputs
-            control_name = control_name.replace(self.iterprefix, "")
-            itervalue = [
-                getattr(box.outputs, control_name).value for box in iterboxes]
+        The iterative outputs are stored in lists, the reduced outputs are
+        folded with their reducer and the other standard outputs are set
+        only if all the iterations return the same value.
 
-            # Update the ibox outputs: a standard ibox control is set only if
-            # all the iterative jobs have returned the same value
+        Parameters
+        ----------
+        nb_of_iterations: int (mandatory)
+            the number of iterations.
+        """
+        self._reductions = {}
+        for control_name in self.iterbox.outputs.controls:
             if control_name in self.iteroutputs:
-                itercontrol_name = self.iterprefix + control_name
-                setattr(self.outputs, itercontrol_name, itervalue)
+                reducer = "list"
             else:
-                if all(value == itervalue[0] for value in itervalue):
-                    setattr(self.outputs, control_name, itervalue[0])
-                else:
-                    raise ValueError(
-                        "The '{0}' standard ibox output can't have different "
-                        "values {1}.".format(control_name, itervalue))
+                reducer = self.reducers.get(control_name, "first_equal")
+            self._reductions[control_name] = reducer_types[reducer](
+                nb_of_iterations, control_name)
 
-    def itergraphs(self, prefix=""):
-        """ Create a list of iterative pipeline's graph representations.
+    def reduce_iteration(self, iteration, iterbox):
+        """ Fold the outputs of a completed iteration.
 
         Parameters
         ----------
-        prefix: str (optional, default '')
-            a prefix for the box names.
+        iteration: int (mandatory)
+            the iteration index.
+        iterbox: box (mandatory)
+            the executed iterative box.
+        """
+        for control_name, reducer in self._reductions.items():
+            reducer.add(
+                iteration, getattr(iterbox.outputs, control_name).value)
+
+    def finish_reduction(self):
+        """ Update the ibox outputs with the folded values.
+        """
+        for control_name, reducer in self._reductions.items():
+            if control_name in self.iteroutputs:
+                setattr(self.outputs, self.iterprefix + control_name,
+                        reducer.result())
+            else:
+                setattr(self.outputs, control_name, reducer.result())
+        self._reductions = None
+        self._templates = {}
+
+    def get_nb_of_iterations(self):
+        """ Get the number of iterations defined by the iterative inputs.
+
+        In 'zip' mode the iterative inputs must have the same number of
+        elements, in 'product' mode the number of iterations is the product
+        of the numbers of elements.
 
         Returns
         -------
-        itergraphs: dictionary
-            the iterative pipeline's graph representations. Each value is
-            a 2-uplet containing a graph and the corresponding bbox or pbox.
+        nb_of_iterations: int
+            the number of iterations, None if an iterative input is not set
+            or if the zipped iterative inputs have different lengths.
         """
-        # Update the iterative pipeline only if all the input terative
-        # controls have the same number of elements
         nb_of_elements = []
         for control_name in self.iterinputs:
             itercontrol_name = self.iterprefix + control_name
             itervalue = getattr(self.inputs, itercontrol_name).value
             if itervalue is None:
-                return {}
+                return None
             nb_of_elements.append(len(itervalue))
-        nb_of_elements = numpy.asarray(nb_of_elements)
-        nb_of_inputs = nb_of_elements.max()
-        is_valid = (nb_of_elements == nb_of_inputs).all()
+        if self.itermode == "product":
+            nb_of_iterations = 1
+            for nb_of_element in nb_of_elements:
+                nb_of_iterations *= nb_of_element
+            return nb_of_iterations
+        if len(set(nb_of_elements)) > 1:
+            return None
+        return max(nb_of_elements or [0])
+
+    def iteration_values(self, iteration):
+        """ Get the iterative input values of an iteration.
+
+        The values are computed from the iteration index so that the
+        iterations never have to be enumerated: in 'product' mode the last
+        iterative input varies the fastest.
 
-        # Update the iterative graphs
-        itergraphs = {}
-        if is_valid:
+        Parameters
+        ----------
+        iteration: int (mandatory)
+            the iteration index.
 
-            # Create the requested number of graphs
-            for iteritem in range(nb_of_inputs):
+        Returns
+        -------
+        values: dict
+            the iterative input values indexed by control names.
+        """
+        values = {}
+        index = iteration
+        for control_name in reversed(self.iterinputs):
+            itercontrol_name = self.iterprefix + control_name
+            itervalue = getattr(self.inputs, itercontrol_name).value
+            if self.itermode == "product":
+                index, position = divmod(index, len(itervalue))
+            else:
+                position = iteration
+            values[control_name] = itervalue[position]
+        return values
 
-                # Copy and parametrize the iterative box
-                # COMPATIBILITY: correctly copy bound instance methods after
-                # python 2.7
-                python_version = sys.version_info
-                if python_version[:2] <= (2, 6):
-                    iterbox = type(self.iterbox)(self.iterbox.desc)
-                else:
-                    iterbox = copy.deepcopy(self.iterbox)
-                for control_name in self.iterinputs:
-                    itercontrol_name = self.iterprefix + control_name
-                    itercontrol = getattr(self.inputs, itercontrol_name)
-                    setattr(iterbox.inputs, control_name,
-                            itercontrol.value[iteritem])
+    def itergraphs(self, prefix="", nb_of_iterations=None, iterations=None):
+        """ Create a list of iterative pipeline's graph representations.
+
+        Parameters
+        ----------
+        prefix: str (optional, default '')
+            a prefix for the box names.
+        nb_of_iterations: int (optional, default None)
+            if specified, the number of iterations: the iterative input
+            values are not required and are left to the caller, for
+            instance to stream the iterations of an upstream ibox.
+        iterations: list of int (optional, default None)
+            if specified, only the graphs of these iterations are created.
+            The compiled graph templates of an iterated pbox are then kept
+            until the reduction of the ibox outputs is finished so that the
+            next iterations can be created from them.
+
+        Returns
+        -------
+        itergraphs: dictionary
+            the iterative pipeline's graph representations. Each value is
+            a 2-uplet containing a graph and the corresponding bbox or pbox.
+        """
+        # Update the iterative pipeline only if the iterative input values
+        # define the iterations
+        if nb_of_iterations is None:
+            nb_of_inputs = self.get_nb_of_iterations()
+            is_valid = nb_of_inputs is not None
+        else:
+            nb_of_inputs = nb_of_iterations
+            is_valid = True
 
+        # Update the iterative graphs: the iterations of a bbox share the
+        # current values of the non iterative inputs
+        itergraphs = {}
+        if is_valid:
+            defaults = {}
+            for control_name in self.iterbox.inputs.controls:
+                if control_name not in self.iterinputs:
+                    defaults[control_name] = getattr(
+                        self.iterbox.inputs, control_name).value
+
+            # Compile the graph of an iterated pbox once for each set of
+            # iterative switch values: the graph of each iteration is a
+            # relabelled copy of the template of its switch values
+            templates = {}
+            if iterations is not None:
+                templates = self._templates
+
+            # Create the requested graphs: a box iteration is copied when it
+            # is executed
+            if iterations is None:
+                iterations = range(nb_of_inputs)
+            for iteritem in iterations:
+                values = {}
+                if nb_of_iterations is None:
+                    values = self.iteration_values(iteritem)
                 node_name = "{0}{1}{2}".format(prefix, self.itersep, iteritem)
                 # Iterate on a pbox
                 if self.ispbox:
-                    itergraph, _, _ = self.iterbox._create_graph(
-                        iterbox, prefix=node_name + ".", filter_inactive=True)
+                    iterbox = PboxIteration(self.iterbox, values)
+                    switch_values = tuple(
+                        values.get(control_name)
+                        for control_name in self.iterswitches)
+                    if switch_values not in templates:
+                        templates[switch_values] = self._graph_template(
+                            iterbox)
+                    itergraph = self._expand_template(
+                        templates[switch_values], iterbox, node_name + ".")
                 # Iterate on a bbox
                 else:
+                    iterbox = BboxIteration(self.iterbox, values, defaults)
                     itergraph = Graph()
                     itergraph.add_node(GraphNode(node_name, iterbox))
                 itergraphs[node_name] = (itergraph, iterbox)
@@ -183,6 +565,63 @@ class Ibox(object):
     # Private Members
     ###########################################################################
 
+    def _graph_template(self, iterbox):
+        """ Compile the graph of the iterated pbox.
+
+        The boxes deactivated by the switches are filtered: when a switch is
+        iterative the graph is compiled from the pbox copy of the iteration.
+
+        Parameters
+        ----------
+        iterbox: PboxIteration
+            the pbox iteration.
+
+        Returns
+        -------
+        template: 2-uplet
+            the flattened inner box names associated to a flag set if the
+            box is an ibox, and the links between these boxes.
+        """
+        box = self.iterbox
+        if self.iterswitches and iterbox.values:
+            box = iterbox.build()
+        graph, _, _ = self.iterbox._create_graph(box, filter_inactive=True)
+        nodes = [(node_name, isinstance(node.meta, Ibox))
+                 for node_name, node in graph._nodes.items()]
+        return nodes, list(graph._links)
+
+    def _expand_template(self, template, iterbox, prefix):
+        """ Create the graph of a pbox iteration from the compiled template.
+
+        The inner iboxes are resolved immediately so that they can be
+        expanded, the other boxes are resolved when they are executed.
+
+        Parameters
+        ----------
+        template: 2-uplet
+            the compiled graph (see '_graph_template').
+        iterbox: PboxIteration
+            the pbox iteration.
+        prefix: str
+            a prefix for the box names.
+
+        Returns
+        -------
+        graph: Graph
+            the graph of the pbox iteration.
+        """
+        nodes, links = template
+        graph = Graph()
+        for box_name, is_ibox in nodes:
+            if is_ibox:
+                box = iterbox.find_box(box_name)
+            else:
+                box = InnerBox(iterbox, box_name)
+            graph.add_node(GraphNode(prefix + box_name, box))
+        for src_box_name, dest_box_name in links:
+            graph.add_link(prefix + src_box_name, prefix + dest_box_name)
+        return graph
+
     def _set_controls(self):
         """ Define the ibox input and output parameters.
 
@@ -194,7 +633,7 @@ class Ibox(object):
         for control_name in self.iterinputs:
 
             # Check that the iterative control is defined in the building box
-            if control_name not in self.iterbox.inputs.controls:
+            if control_name not in self.iterbox.inputs:
                 raise ValueError(
                     "Impossible to build Ibox '{0}': '{1}' input iterative "
                     "control type is not defined in iterative building box. "
@@ -207,13 +646,16 @@ class Ibox(object):
             if hasattr(control, "content") and control.iterable:
                 itercontent += "_{0}".format(control.content)
             itercontrol = controls["List"](content=itercontent)
+            if hasattr(control, "choices"):
+                itercontrol.inner_control = controls[itercontent](
+                    inner=True, choices=control.choices)
             setattr(self.inputs, "iter{0}".format(control_name), itercontrol)
 
         # Build output iterative controls
         for control_name in self.iteroutputs:
 
             # Check that the iterative control is defined in the building box
-            if control_name not in self.iterbox.outputs.controls:
+            if control_name not in self.iterbox.outputs:
                 raise ValueError(
                     "Impossible to build Ibox '{0}': '{1}' outputs iterative "
                     "control type is not defined in iterative building box. "
@@ -233,7 +675,23 @@ class Ibox(object):
             if control_name not in self.iterinputs:
                 control = getattr(self.iterbox.inputs, control_name)
                 setattr(self.inputs, control_name, control)
+
+        # The reduced outputs get their own control: the mean and the
+        # stacked values may not have the iterative box control type
+        for control_name in self.reducers:
+            if control_name not in self.iterbox.outputs:
+                raise ValueError(
+                    "Impossible to build Ibox '{0}': '{1}' reduced output "
+                    "is not defined in iterative building box. Allowed "
+                    "outputs are {2}.".format(
+                        self.id, control_name,
+                        self.iterbox.outputs.controls))
         for control_name in self.iterbox.outputs.controls:
             if control_name not in self.iteroutputs:
                 control = getattr(self.iterbox.outputs, control_name)
+                reducer = self.reducers.get(control_name, "first_equal")
+                if reducer in ("mean", "stack"):
+                    control = controls["Object"]()
+                elif reducer != "first_equal":
+                    control = type(control)(**control.kwargs)
                 setattr(self.outputs, control_name, control)
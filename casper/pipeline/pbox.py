@@ -10,7 +10,12 @@
 # System import
 import sys
 import os
+import copy
+import re
 import json
+import heapq
+import math
+import collections
 try:
     import importlib
 except:
@@ -23,9 +28,15 @@ import casper
 from casper.lib.base import Graph
 from casper.lib.base import GraphNode
 from casper.lib.controls import controls
+from casper.lib.cache import Memory
 from .bbox import Bbox
 from .ibox import Ibox
+from .compiled import CompiledCache
+from .dataflow import Dataflow
+from .pool import WorkerPool
+from .shared import SharedArrays
 from .utils import ControlObject
+from .utils import capture_environ
 from .utils import load_xml_description
 from .utils import title_for
 from .utils import workerfunction
@@ -39,25 +50,25 @@ multiprocessing.log_to_stderr(logging.CRITICAL)
 logger = logging.getLogger(__name__)
 
 
-FLAG_ALL_DONE = b"WORK_FINISHED"
-FLAG_WORKER_FINISHED_PROCESSING = b"WORKER_FINISHED_PROCESSING"
-
-
 class Pbox(object):
     """ A pipeline box that defines organized processing steps.
     """
     xml_tag = "pipeline"
     box_tag = "units"
     box_names = ["unit", "switch"]
-    unit_attributes = ["name", "module", "set", "iterinput", "iteroutput"]
+    unit_attributes = ["name", "module", "set", "iterinput", "iteroutput",
+                       "chunksize", "itermode"]
     unit_set = ["name", "value"]
-    unit_iter = ["name"]
+    unit_iter = ["name", "chunksize", "reducer"]
     switch_attributes = ["name", "path"]
     switch_path = ["name", "unit"]
     link_tag = "links"
     link_attributes = ["source", "destination"]
+    schedules = ["fifo", "critical_path"]
+    chunk_duration = 0.1
+    shared_attributes = ("proto",)
 
-    def __init__(self, xmldesc):
+    def __init__(self, xmldesc, compiled_cachedir=None, compiled=None):
         """ Initilaize the Pbox class.
 
         Parameters
@@ -65,6 +76,13 @@ class Pbox(object):
         xmldesc: string (mandatory)
             the path to a xml pipeline description. The path is relative
             to the module.
+        compiled_cachedir: string (optional, default None)
+            if specified, the parsed xml descriptions of the pipeline and of
+            its inner pipelines and the parsed unit docstrings are stored
+            in this directory: the next creations of the pipeline only parse
+            the descriptions whose source file has changed.
+        compiled: CompiledCache (optional, default None)
+            the cache of parsed descriptions shared with a parent pipeline.
         """
         # Define class parameters
         self.desc = xmldesc
@@ -72,29 +90,123 @@ class Pbox(object):
         self._boxes = {}
         self._links = []
         self._switches = {}
-        self.inputs = ControlObject()
-        self.outputs = ControlObject()
+        self._dataflow = Dataflow()
+        self.inputs = ControlObject(self._dataflow)
+        self.outputs = ControlObject(self._dataflow)
         self.active = True
         self.workers = []
+        self.pool = None
+        self.durations = {}
+        self.environ_baseline = None
+        self.shared = None
+        self._execution_pool = None
 
         # Create the bbox name
         self.id = module_name + "." + title_for(xmlfile_name.split(".")[0])
 
         # Get the function to decorate prototype
-        self.proto = load_xml_description(self._xmlfile)
+        self._compiled = compiled
+        if compiled is None:
+            self._compiled = CompiledCache(xmldesc, compiled_cachedir)
+        self.proto = self._compiled.get(
+            self._xmlfile, self._xmlfile, load_xml_description,
+            self._xmlfile)
 
         # Create the input and output controls
         self._create_pipeline()
 
+        # Store the descriptions parsed by the top level pipeline
+        if compiled is None:
+            self._compiled.save()
+        self._compiled = None
+
     @workerfunction
-    def __call__(self, cpus=1):
+    def __call__(self, cpus=1, schedule="fifo", default_duration=1.,
+                 pool=None, environ="none", environ_variables=None,
+                 cachedir=None, share_arrays=None, streaming=False,
+                 iteration_window=None):
         """ Execute a pbox.
 
         Parameters
         ----------
         cpus: int (optional, default 1)
-            the number of cpus to use.
+            the number of cpus to use. Ignored if a pool is used.
+        schedule: str (optional, default 'fifo')
+            the strategy used to dispatch the ready boxes: 'fifo' executes
+            the boxes in the order they become available, 'critical_path'
+            executes first the boxes with the longest remaining downstream
+            path. The path lengths are estimated from the box durations
+            recorded in 'durations'.
+        default_duration: float (optional, default 1.)
+            the duration estimate of a box that has never been executed.
+        pool: WorkerPool (optional, default None)
+            the workers used to execute the boxes. If not specified, the
+            pool attached to the pbox 'pool' attribute is used. Otherwise
+            a pool is created for this execution only.
+        environ: str (optional, default 'none')
+            the environment captured in the box returncodes: 'none',
+            'whitelist' to capture the 'environ_variables', 'diff' to
+            capture the changes from the environment recorded once in
+            'environ_baseline' at the beginning of the execution, or 'full'.
+        environ_variables: list of str (optional, default None)
+            the environment variables captured with the 'whitelist' policy.
+        cachedir: string (optional, default None)
+            the directory in which the smart-caching will work. If None no
+            caching is done. A box already executed with the same inputs is
+            restored from the cache without being sent to the workers.
+        share_arrays: int (optional, default None)
+            if specified, the numpy arrays of at least 'share_arrays' bytes
+            are exchanged with the workers through memory-mapped files,
+            in '/dev/shm' if available, instead of being copied through the
+            queues. A shared file is removed as soon as no downstream box
+            needs it. The shared input arrays of the boxes are read-only and
+            a box is preferably executed by the worker that produced them.
+            If None all the values are copied.
+        streaming: bool (optional, default False)
+            if True, an iterative box fed only by the iterative outputs of
+            an upstream iterative box is expanded with it: its iteration
+            'i' is ready as soon as the upstream iteration 'i' is done,
+            without waiting for the other upstream iterations.
+        iteration_window: int (optional, default None)
+            if specified, at most 'iteration_window' iterations of each
+            iterative box are expanded in the execution graph and not yet
+            completed at a time: the next iterations are expanded as the
+            previous ones complete, so that the memory used by the master
+            does not depend on the number of iterations. If None all the
+            iterations are expanded at once.
+
+        Returns
+        -------
+        returncode: dict
+            the box returncodes indexed by process names. With an
+            'iteration_window', or for an iterative box with reducers, only
+            the returncodes of the failed iterations are returned, the
+            values of the other iterations being folded in the ibox outputs.
         """
+        # Check the scheduling strategy
+        if schedule not in self.schedules:
+            raise ValueError(
+                "Unrecognized schedule '{0}'. Supported schedules are "
+                "{1}.".format(schedule, self.schedules))
+        if iteration_window is not None and iteration_window < 1:
+            raise ValueError(
+                "The iteration window must be a positive integer, got "
+                "'{0}'.".format(iteration_window))
+
+        # Define the environment capture policy: the pool sends the baseline
+        # once to each worker
+        if environ == "diff":
+            self.environ_baseline = capture_environ("full")
+            environ = (environ, self.environ_baseline)
+        elif environ == "whitelist":
+            environ = (environ, list(environ_variables or []))
+        elif environ in ("none", "full"):
+            environ = (environ, None)
+        else:
+            raise ValueError(
+                "Unrecognized environment capture policy '{0}'.".format(
+                    environ))
+
         # Information
         logger.info("Using 'casper' version '{0}'.".format(casper.__version__))
         exit_rules = [
@@ -103,139 +215,220 @@ class Pbox(object):
             "    > 0 - the process had an error, and exited with that code.",
             "    < 0 - the process was killed with a signal of -1 * exitcode."]
         logger.info("\n".join(exit_rules))
+        if environ[0] == "diff":
+            logger.info("Environment baseline = {0}".format(environ[1]))
         logger.info("-" * 10)
 
         # Create an execution graph
         exec_graph, _, _ = self._create_graph(self, filter_inactive=True)
-
-        # Get the machine available cpus
-        nb_cpus = multiprocessing.cpu_count() - 1
-        nb_cpus = nb_cpus or 1
-        if max(cpus, nb_cpus) == cpus:
-            cpus = nb_cpus
-
-        # The worker function of a bbox, invoked in a Process
-        def bbox_worker(workers_bbox, workers_returncode, cachedir=None):
-            """ The worker.
-
-            Parameters
-            ----------
-            workers_bbox, workers_returncode: multiprocessing.Queue
-                the input and output queues.
-            cachedir: string
-                the directory in which the smart-caching will work.
-            """
-            from casper.lib.cache import Memory
-            import traceback
-
-            mem = Memory(cachedir)
-            while True:
-                inputs = workers_bbox.get()
-                if inputs == FLAG_ALL_DONE:
-                    workers_returncode.put(FLAG_WORKER_FINISHED_PROCESSING)
-                    break
-                try:
-                    process_name, box_funcdesc, bbox_inputs = inputs
-                    bbox = mem.cache(Bbox(box_funcdesc))
-                    for control_name, value in bbox_inputs.items():
-                        setattr(bbox.inputs, control_name, value)
-                    bbox_returncode = bbox(process_name)
-                    bbox_returncode[process_name]["exitcode"] = 0
-                except:
-                    bbox_returncode = {process_name: {}}
-                    bbox_returncode[process_name]["inputs"] = {}
-                    bbox_returncode[process_name]["outputs"] = {}
-                    bbox_returncode[process_name]["exitcode"] = (
-                        "1 - {0}'".format(traceback.format_exc()))
-                workers_returncode.put(bbox_returncode)
-
-        # Create the workers
-        workers_bbox = multiprocessing.Queue()
-        workers_returncode = multiprocessing.Queue()
-        for index in range(cpus):
-            process = multiprocessing.Process(
-                target=bbox_worker, args=(workers_bbox, workers_returncode))
-            process.deamon = True
-            process.start()
-            self.workers.append(process)
+        links = None
+        if streaming:
+            links = self._box_links(self)
+
+        # Get the workers: a pool that is not attached to the pbox is
+        # stopped at the end of the execution
+        pool = pool or self.pool
+        is_temporary_pool = pool is None
+        if is_temporary_pool:
+            nb_cpus = multiprocessing.cpu_count() - 1
+            nb_cpus = nb_cpus or 1
+            if max(cpus, nb_cpus) == cpus:
+                cpus = nb_cpus
+            pool = WorkerPool(cpus)
+        else:
+            pool.check()
+            cpus = pool.cpus
+        self.workers = pool.workers
+        self._execution_pool = (pool, is_temporary_pool)
+
+        # Define the smart-caching used to skip the boxes already executed
+        memory = Memory(cachedir)
+        if cachedir is not None:
+            cachedir = os.path.dirname(memory.cachedir)
+
+        # Define the shared arrays: 'holders' contains the boxes that still
+        # need each shared file and 'needs' the shared files needed by each
+        # box
+        shared = None
+        if share_arrays is not None:
+            shared = SharedArrays(min_nbytes=share_arrays)
+        self.shared = shared
+        holders = {}
+        needs = {}
 
         # Execute the boxes respecting the graph order
-        # Use a FIFO strategy to deal with multiple boxes
+        # The ready boxes are stored in a priority queue and dispatched when
+        # a worker is free: with a FIFO strategy all the boxes have the same
+        # priority and are executed in the order they become available.
+        # The ready iterations of a chunked ibox are grouped in a single job
         iter_map = {}
         box_map = {}
-        self._update_graph(exec_graph, iter_map, box_map)
-        toexec_box_names = self._available_boxes(exec_graph)
+        windows = {}
+        priorities = {}
+        toexec_box_names = []
         inexec_box_names = {}
+        inexec_jobs = {}
         returncode = {}
+        cached_returncodes = collections.deque()
         global_counter = 1
-        workers_finished = 0
-        while True:
-
-            # Add nnil boxes to the input queue
-            if toexec_box_names is not None:
-                for box_name in toexec_box_names:
+        new_box_names = self._update_graph(
+            exec_graph, iter_map, box_map, links=links, windows=windows,
+            window=iteration_window)
+        while new_box_names or toexec_box_names or inexec_box_names:
+
+            # Update nnil boxes list: only the boxes released by the
+            # completed jobs are considered
+            for chunk in self._chunk_boxes(exec_graph, new_box_names, cpus):
+                priority = 0.
+                if schedule == "critical_path":
+                    priority = max([
+                        self._box_priority(exec_graph, box_name, priorities,
+                                           default_duration)
+                        for box_name in chunk])
+                heapq.heappush(
+                    toexec_box_names, (-priority, global_counter, chunk))
+                global_counter += 1
+
+            # Add nnil boxes to the input queue while some workers are free
+            # A box found in the cache is completed without a worker
+            while toexec_box_names and len(inexec_jobs) < cpus:
+                _, job_id, chunk = heapq.heappop(toexec_box_names)
+                inexec_jobs[job_id] = len(chunk)
+                process_names = []
+                chunk_inputs = []
+                for box_name in chunk:
                     process_name = "{0}-{1}".format(global_counter, box_name)
-                    inexec_box_names[box_name] = process_name
+                    inexec_box_names[box_name] = job_id
                     box = exec_graph.find_node(box_name).meta
                     global_counter += 1
+                    if cachedir is not None:
+                        cached_returncode = self._cached_returncode(
+                            memory, box, process_name)
+                        if cached_returncode is not None:
+                            cached_returncodes.append(cached_returncode)
+                            continue
                     box_inputs = {}
                     for control_name in box.inputs.controls:
                         box_inputs[control_name] = getattr(
                             box.inputs, control_name).value
-                    workers_bbox.put((process_name, box.desc, box_inputs))
+                    process_names.append(process_name)
+                    chunk_inputs.append(box_inputs)
+                if process_names:
+                    pool.submit_chunk(process_names, box.desc, chunk_inputs,
+                                      environ, cachedir, shared)
 
             # Collect the box returncodes
-            wave_returncode = workers_returncode.get()
-            if wave_returncode == FLAG_WORKER_FINISHED_PROCESSING:
-                workers_finished += 1
-                if workers_finished == cpus:
-                    break
-                continue
+            if cached_returncodes:
+                wave_returncode = cached_returncodes.popleft()
+            else:
+                wave_returncode = pool.get()
             returncode.update(wave_returncode)
+            self.update_durations(wave_returncode)
 
             # Update the called box outputs and the graph
-            process_name = list(wave_returncode.keys())[0]
-            (identifier, box_name, box_exec_name,
-             box_iter_name, iteration) = Pbox.split_name(process_name)
-            if box_iter_name is not None:
-                ibox = exec_graph.find_node(box_iter_name).meta
-            box = exec_graph.find_node(box_name).meta
-            exec_graph.remove_node(box_name)
-            for name, value in wave_returncode[process_name][
-                    "outputs"].items():
-                setattr(box.outputs, name, value)
-
-            # Update the iterative mapping, update the graph and ibox
-            # if an iterative job is done
-            if box_iter_name in iter_map:
-                position = iter_map[box_iter_name].index(box_name)
-                iter_map[box_iter_name].pop(position)
-                if len(iter_map[box_iter_name]) == 0:
+            for process_name in sorted(
+                    wave_returncode, key=lambda name: int(name.split("-")[0])):
+                (identifier, box_name, box_exec_name,
+                 box_iter_name, iteration) = Pbox.split_name(process_name)
+                box = exec_graph.find_node(box_name).meta
+                if shared is not None:
+                    handles = shared.handles(
+                        wave_returncode[process_name]["outputs"])
+                    for key in ("inputs", "outputs"):
+                        wave_returncode[process_name][key] = shared.attach(
+                            wave_returncode[process_name][key])
+                    self._release_arrays(
+                        exec_graph, shared, holders, needs, box_name,
+                        box_iter_name, handles)
+                exec_graph.remove_node(box_name)
+                priorities.pop(box_name, None)
+                self.update_controls([
+                    (box.outputs[name], value) for name, value in
+                    wave_returncode[process_name]["outputs"].items()])
+
+                # Update the iterative mapping, update the graph and ibox
+                # if an iterative job is done: the outputs of a completed
+                # iteration are folded in the ibox outputs, the iteration
+                # box is released and the next iterations are expanded
+                folded = False
+                if box_iter_name in iter_map:
                     ibox = exec_graph.find_node(box_iter_name).meta
-                    ibox.update_iteroutputs(box_map.pop(box_iter_name))
-                    iter_map.pop(box_iter_name)
-                    exec_graph.remove_node(box_iter_name)
-
-            # Information
-            for key, value in wave_returncode[process_name].items():
-                logger.info("{0}.{1} = {2}".format(
-                    process_name, key, value))
-            logger.info("-" * 10)
-
-            # Update nnil boxes list
-            if toexec_box_names is not None:
-                self._update_graph(exec_graph, iter_map, box_map)
-                new_toexec_box_names = set(self._available_boxes(exec_graph))
-                inexec_box_names.pop(box_name)
-                toexec_box_names = new_toexec_box_names - set(inexec_box_names)
-
-                # Stop iteration: no more job
-                if len(exec_graph._nodes) == 0:
-                    toexec_box_names = None
-
-                    # Add poison pills to stop the remote workers
-                    for index in range(cpus):
-                        workers_bbox.put(FLAG_ALL_DONE)
+                    folded = iteration_window is not None or bool(
+                        ibox.reducers)
+                    remaining = iter_map[box_iter_name]
+                    remaining[iteration] -= 1
+                    if remaining[iteration] == 0:
+                        del remaining[iteration]
+                        ibox.reduce_iteration(
+                            iteration, box_map[box_iter_name].pop(iteration))
+                        self._expand_iterations(
+                            exec_graph, windows[box_iter_name]["driver"],
+                            iter_map, box_map, links, windows,
+                            iteration_window)
+                    if (len(remaining) == 0 and
+                            windows[box_iter_name]["next"] ==
+                            windows[box_iter_name]["total"]):
+                        ibox.finish_reduction()
+                        box_map.pop(box_iter_name)
+                        iter_map.pop(box_iter_name)
+                        windows.pop(box_iter_name)
+                        if shared is not None:
+                            self._release_arrays(
+                                exec_graph, shared, holders, needs,
+                                box_iter_name, None, [])
+                        exec_graph.remove_node(box_iter_name)
+                        priorities.pop(box_iter_name, None)
+
+                # Information: the values are only formatted if they are
+                # logged
+                if logger.isEnabledFor(logging.INFO):
+                    for key, value in wave_returncode[process_name].items():
+                        logger.info("{0}.{1} = {2}".format(
+                            process_name, key, value))
+                    logger.info("-" * 10)
+
+                # With reducers or an iteration window, the returncode of a
+                # successful iteration is not kept: its values are folded in
+                # the ibox outputs
+                if (folded and
+                        wave_returncode[process_name].get("exitcode") == 0):
+                    returncode.pop(process_name)
+
+                # Release the worker slot when all the chunk is done
+                job_id = inexec_box_names.pop(box_name)
+                inexec_jobs[job_id] -= 1
+                if inexec_jobs[job_id] == 0:
+                    del inexec_jobs[job_id]
+            new_box_names = self._update_graph(
+                exec_graph, iter_map, box_map, links=links, windows=windows,
+                window=iteration_window)
+
+        # Stop the remote workers and remove the shared files: the arrays
+        # attached to the box controls remain valid
+        self._execution_pool = None
+        if is_temporary_pool:
+            pool.shutdown()
+        if shared is not None:
+            shared.close()
+            self.shared = None
+        if len(exec_graph._nodes) != 0:
+            raise ValueError(
+                "Boxes {0} of '{1}' can't be executed.".format(
+                    sorted(exec_graph._nodes.keys()), self.id))
+
+        return returncode
+
+    def __deepcopy__(self, memo):
+        """ Copy the pbox: the parsed pipeline description is shared with
+        the copy.
+        """
+        box = self.__class__.__new__(self.__class__)
+        memo[id(self)] = box
+        for name, value in self.__dict__.items():
+            if name not in self.shared_attributes:
+                value = copy.deepcopy(value, memo)
+            box.__dict__[name] = value
+        return box
 
     ###########################################################################
     # Public Members
@@ -272,31 +465,255 @@ class Pbox(object):
             iteration = None
         return identifier, box_name, box_exec_name, box_iter_name, iteration
 
+    def update_durations(self, returncode):
+        """ Update the box duration estimates from an execution returncode.
+
+        The estimates are the mean of the recorded execution times. All the
+        iterations of an iterative box share the same estimate.
+
+        Parameters
+        ----------
+        returncode: dict (mandatory)
+            the box returncodes indexed by process names with a 'time'
+            item.
+        """
+        for process_name, box_returncode in returncode.items():
+            if "time" not in box_returncode:
+                continue
+            _, box_name, _, _, _ = Pbox.split_name(process_name)
+            duration_name = self._duration_name(box_name)
+            mean, count = self.durations.get(duration_name, (0., 0))
+            count += 1
+            mean += (box_returncode["time"] - mean) / count
+            self.durations[duration_name] = (mean, count)
+
+    def update_controls(self, updates):
+        """ Set the values of several controls in a single pass through the
+        pipeline links (see 'Dataflow.update').
+
+        Parameters
+        ----------
+        updates: list of 2-uplet (mandatory)
+            the (control, value) pairs to set.
+        """
+        self._dataflow.update(updates)
+
     ###########################################################################
     # Private Members
     ###########################################################################
 
-    def _available_boxes(self, graph):
-        """ List the boxes that have no incoming link.
+    def _cached_returncode(self, memory, box, process_name):
+        """ Get the returncode of a box from the smart-caching.
+
+        Parameters
+        ----------
+        memory: Memory
+            the smart-caching memory.
+        box: Bbox
+            a box ready for execution.
+        process_name: str
+            the name used to store the box returncode.
+
+        Returns
+        -------
+        returncode: dict
+            the cached box returncode, None if the box has not been executed
+            with the current inputs.
+        """
+        result = memory.cache(box, verbose=0).cached_result()
+        if result is None:
+            return None
+        box_returncode = list(result.values())[0]
+        box_returncode["exitcode"] = 0
+        box_returncode["cached"] = True
+        return {process_name: box_returncode}
+
+    def _release_arrays(self, graph, shared, holders, needs, box_name,
+                        box_iter_name, handles):
+        """ Release the shared files that no downstream box needs.
+
+        The shared files needed by a completed box are transferred to its
+        successors if the box forwards them, otherwise they are removed
+        when no other box needs them. An iterative box forwards all the
+        shared files needed by its iterations, and the iterations forward
+        their outputs to their iterative box.
+
+        Parameters
+        ----------
+        graph: Graph
+            the execution graph containing the completed box.
+        shared: SharedArrays
+            the shared arrays.
+        holders: dict
+            the box names that still need each shared file.
+        needs: dict
+            the shared files still needed by each box name.
+        box_name: str
+            the completed box name in the execution graph.
+        box_iter_name: str
+            the iterative box name of an iteration, None otherwise.
+        handles: list of ArrayHandle
+            the shared arrays returned by the completed box.
+        """
+        # Get the forwarded shared files and the boxes that will need them
+        paths = set(handle.path for handle in handles)
+        if isinstance(graph.find_node(box_name).meta, Ibox):
+            paths.update(needs.get(box_name, []))
+        successors = [node.name for node in graph.find_node(
+            box_name).links_to]
+        if box_iter_name is not None:
+            successors.append(box_iter_name)
+        for path in paths:
+            for name in successors:
+                holders.setdefault(path, set()).add(name)
+                needs.setdefault(name, set()).add(path)
+
+        # Release the shared files that are not needed anymore
+        for path in needs.pop(box_name, set()) | paths:
+            if path in holders:
+                holders[path].discard(box_name)
+                if holders[path]:
+                    continue
+                del holders[path]
+            shared.release(path)
+
+    def _chunk_boxes(self, graph, box_names, cpus):
+        """ Group the ready iterations of the chunked iboxes.
+
+        Parameters
+        ----------
+        graph: Graph
+            the execution graph.
+        box_names: list of str
+            the ready box names.
+        cpus: int
+            the number of workers.
+
+        Returns
+        -------
+        chunks: list of list of str
+            the box names executed by each job, in the order they became
+            ready.
+        """
+        # Group the iterations by ibox
+        groups = []
+        iterations = {}
+        for box_name in box_names:
+            ibox_name = None
+            if Ibox.itersep in box_name:
+                ibox_name, iteration = box_name.rsplit(Ibox.itersep, 1)
+                ibox_node = graph.find_node(ibox_name)
+                if (not iteration.isdigit() or ibox_node is None or
+                        ibox_node.meta.chunksize == 1):
+                    ibox_name = None
+            if ibox_name is None:
+                groups.append((None, [box_name]))
+            elif ibox_name not in iterations:
+                iterations[ibox_name] = [box_name]
+                groups.append((ibox_name, iterations[ibox_name]))
+            else:
+                iterations[ibox_name].append(box_name)
+
+        # Split the iterations in chunks
+        chunks = []
+        for ibox_name, group in groups:
+            chunksize = 1
+            if ibox_name is not None:
+                chunksize = graph.find_node(ibox_name).meta.chunksize
+            if chunksize == "auto":
+                duration = self.durations.get(self._duration_name(group[0]))
+                if duration is None or duration[0] <= 0:
+                    chunksize = 1
+                else:
+                    chunksize = min(
+                        int(math.ceil(self.chunk_duration / duration[0])),
+                        int(math.ceil(len(group) / float(cpus))))
+            for index in range(0, len(group), chunksize):
+                chunks.append(group[index: index + chunksize])
+
+        return chunks
+
+    def _duration_name(self, box_name):
+        """ Get the name used to store the duration estimate of a box.
+
+        Parameters
+        ----------
+        box_name: str
+            the box name in the execution graph.
+
+        Returns
+        -------
+        duration_name: str
+            the box name without iteration indices.
+        """
+        return re.sub(re.escape(Ibox.itersep) + r"\d+", "", box_name)
+
+    def _box_priority(self, graph, box_name, priorities, default_duration):
+        """ Compute the length of the longest downstream path of a box.
+
+        The path length is the sum of the box duration estimates. The last
+        boxes of an iteration are followed by the boxes downstream the
+        associated iterative box.
 
         Parameters
         ----------
         graph: Graph
-            a graph.
+            the execution graph.
+        box_name: str
+            the box name.
+        priorities: dict
+            the already computed path lengths, updated in place.
+        default_duration: float
+            the duration estimate of a box that has never been executed.
 
         Returns
         -------
-        avalible_boxes: list of str
-            a list of boxes ready for execution.
+        priority: float
+            the estimated time needed to execute the box and all its
+            successors.
         """
-        return sorted([node.name for node in graph.available_nodes()
-                      if not isinstance(node.meta, Ibox)])
+        # Depth first traversal without recursion: a node is evaluated once
+        # all its successors are evaluated
+        stack = [box_name]
+        while stack:
+            node = graph.find_node(stack[-1])
+            if node.name in priorities:
+                stack.pop()
+                continue
+            successors = [to_node.name for to_node in node.links_to]
+            if not successors and Ibox.itersep in node.name:
+                box_iter_name = node.name.split(".")[0].split(Ibox.itersep)[0]
+                if graph.find_node(box_iter_name) is not None:
+                    successors = [box_iter_name]
+            missing = [name for name in successors if name not in priorities]
+            if missing:
+                stack.extend(missing)
+                continue
+            stack.pop()
+            if isinstance(node.meta, Ibox):
+                duration = 0.
+            else:
+                duration = self.durations.get(
+                    self._duration_name(node.name), (default_duration, 0))[0]
+            priorities[node.name] = duration + max(
+                [priorities[name] for name in successors] or [0.])
+
+        return priorities[box_name]
 
-    def _update_graph(self, graph, iter_map, box_map, prefix=""):
+    def _update_graph(self, graph, iter_map, box_map, prefix="", links=None,
+                      windows=None, window=None):
         """ Dynamically update the graph representtion of the pipeline.
 
+        Consume the graph ready queue: the iterative boxes that became
+        available are expanded and the other boxes are returned for
+        execution.
+
+        If the box links are specified, the downstream iterative boxes that
+        can stream the iterations of an expanded iterative box are expanded
+        at the same time (see '_stream_iterations').
+
         Update the 'iter_map' dictionary with the built iterative
-        processings.
+        processings and start the reduction of the ibox outputs.
         An iterative processing is added as an independant graph in the main
         graph.
 
@@ -306,39 +723,325 @@ class Pbox(object):
             the updated graph representation.
         iter_map: dict
             the dictionary containing a mapping between all the ibox names
-            and executed box names and associated ibox.
+            and the number of boxes still to execute in each expanded
+            iteration.
         box_map: dict
             the dictionary containing a mapping between all the ibox names
-            and associated bbox or pbox.
+            and the expanded bbox or pbox iterations indexed by iteration
+            number. An iteration is removed once it has been folded in the
+            ibox outputs.
         prefix: str (optional, default '')
             a prefix for the box names.
-        """
-        # Go through nnil nodes
-        for node in graph.available_nodes():
+        links: dict (optional, default None)
+            the box links used to stream the iterations (see '_box_links').
+        windows: dict (optional, default None)
+            the expansion state of the iboxes (see '_expand_iterations').
+        window: int (optional, default None)
+            the maximum number of expanded and not completed iterations of
+            an ibox, None to expand all the iterations at once.
 
-            # Deal with ibox only
-            box_name = node.name
-            if isinstance(node.meta, Ibox) and box_name not in iter_map:
-
-                # Construct the itarative graphs
-                itergraphs = node.meta.itergraphs(box_name)
-                if itergraphs == {}:
+        Returns
+        -------
+        toexec_box_names: list of str
+            the boxes that became ready for execution, sorted by name so
+            that the dispatch order does not depend on the graph insertion
+            order.
+        """
+        # Go through the newly available nodes: the expanded iterative graphs
+        # push their own nodes in the ready queue
+        if windows is None:
+            windows = {}
+        toexec_box_names = []
+        ready_nodes = graph.pop_ready_nodes()
+        while ready_nodes:
+            for node in ready_nodes:
+
+                # Deal with box
+                box_name = node.name
+                if not isinstance(node.meta, Ibox):
+                    toexec_box_names.append(box_name)
+                    continue
+
+                # Deal with ibox
+                if box_name in windows or box_name in iter_map:
+                    continue
+
+                # Construct the first itarative graphs
+                nb_of_iterations = node.meta.get_nb_of_iterations()
+                if not nb_of_iterations:
                     raise ValueError("IBox '{0}' can't be executed.".format(
                         box_name))
+                windows[box_name] = {
+                    "next": 0, "total": nb_of_iterations,
+                    "driver": box_name, "streams": None}
+                self._expand_iterations(
+                    graph, box_name, iter_map, box_map, links, windows, window)
+
+            ready_nodes = graph.pop_ready_nodes()
+
+        return sorted(toexec_box_names)
+
+    def _expand_iterations(self, graph, box_name, iter_map, box_map, links,
+                           windows, window):
+        """ Expand the next iterations of an ibox.
+
+        The iterations are expanded in order while the ibox, and each ibox
+        that streams its iterations, has less than 'window' expanded and
+        not completed iterations.
+
+        Parameters
+        ----------
+        graph: Graph
+            the updated graph representation.
+        box_name: str
+            the ibox name.
+        iter_map: dict
+            the dictionary containing a mapping between all the ibox names
+            and the number of boxes still to execute in each expanded
+            iteration.
+        box_map: dict
+            the dictionary containing a mapping between all the ibox names
+            and associated bbox or pbox iterations.
+        links: dict
+            the box links used to stream the iterations, None if the
+            iterations are not streamed.
+        windows: dict
+            the expansion state of each ibox: the index of the 'next'
+            iteration to expand, the 'total' number of iterations, the
+            'driver' ibox whose expansion also expands this ibox and the
+            iboxes that stream the ibox iterations ('streams').
+        window: int
+            the maximum number of expanded and not completed iterations of
+            an ibox, None to expand all the iterations at once.
+        """
+        # Get the iterations that can be expanded
+        state = windows.get(box_name)
+        if state is None:
+            return
+        stop = state["total"]
+        if window is not None:
+            expanded = max([
+                len(iter_map.get(name, {})) for name, item in windows.items()
+                if item["driver"] == box_name])
+            stop = min(stop, state["next"] + window - expanded)
+        if stop <= state["next"]:
+            return
+        iterations = range(state["next"], stop)
+        state["next"] = stop
+
+        # Expand the iterations
+        ibox = graph.find_node(box_name).meta
+        itergraphs = ibox.itergraphs(box_name, iterations=iterations)
+        self._add_itergraphs(
+            graph, box_name, itergraphs, iter_map, box_map, state["total"])
+        if links is not None:
+            self._stream_iterations(
+                graph, box_name, itergraphs, iter_map, box_map, links,
+                windows)
+
+    def _add_itergraphs(self, graph, box_name, itergraphs, iter_map,
+                        box_map, nb_of_iterations=None):
+        """ Add the iterative graphs of an ibox in the graph.
+
+        The reduction of the ibox outputs starts when its first iterations
+        are added.
 
-                # Update the input graph and the execution list
-                iter_map[box_name] = []
-                iterboxes = []
-                for itername, iteritem in itergraphs.items():
-                    itergraph, iterbox = iteritem
-                    graph.add_graph(itergraph)
-                    _, iteration = itername.split(Ibox.itersep)
-                    iteration = int(iteration)
-                    iterboxes.append((iteration, iterbox))
-                    iter_map[box_name].extend(
-                        [node.name for node in itergraph._nodes.values()])
-                iterboxes = sorted(iterboxes, key=lambda item: item[0])
-                box_map[box_name] = [item[1] for item in iterboxes]
+        Parameters
+        ----------
+        graph: Graph
+            the updated graph representation.
+        box_name: str
+            the ibox name.
+        itergraphs: dict
+            the ibox iterative graphs (see 'Ibox.itergraphs').
+        iter_map: dict
+            the dictionary containing a mapping between all the ibox names
+            and the number of boxes still to execute in each expanded
+            iteration.
+        box_map: dict
+            the dictionary containing a mapping between all the ibox names
+            and associated bbox or pbox iterations.
+        nb_of_iterations: int (optional, default None)
+            the number of iterations of the ibox, by default the number of
+            iterative graphs.
+        """
+        if box_name not in iter_map:
+            nb_of_iterations = nb_of_iterations or len(itergraphs)
+            iter_map[box_name] = {}
+            box_map[box_name] = {}
+            graph.find_node(box_name).meta.start_reduction(nb_of_iterations)
+        for itername, iteritem in itergraphs.items():
+            itergraph, iterbox = iteritem
+            graph.add_graph(itergraph)
+            _, iteration = itername.rsplit(Ibox.itersep, 1)
+            iteration = int(iteration)
+            box_map[box_name][iteration] = iterbox
+            iter_map[box_name][iteration] = len(itergraph._nodes)
+
+    def _stream_iterations(self, graph, box_name, itergraphs, iter_map,
+                           box_map, links, windows=None):
+        """ Expand the iterations of the downstream iterative boxes that can
+        stream the iterations of an expanded ibox.
+
+        A downstream ibox can stream the iterations if its only predecessor
+        is the expanded ibox, if it zips its iterative inputs, if none of
+        them is a switch and if all its iterative inputs, and only them, are
+        linked to iterative outputs of the expanded ibox.
+        The iteration 'i' of the downstream ibox then waits for the
+        iteration 'i' of the expanded ibox only and gets its iterative
+        inputs from the outputs of this iteration. The streamed ibox
+        iterations are themselves streamed to the next iboxes.
+
+        Parameters
+        ----------
+        graph: Graph
+            the updated graph representation.
+        box_name: str
+            the expanded ibox name.
+        itergraphs: dict
+            the expanded ibox iterative graphs (see 'Ibox.itergraphs').
+        iter_map: dict
+            the dictionary containing a mapping between all the ibox names
+            and the number of boxes still to execute in each expanded
+            iteration.
+        box_map: dict
+            the dictionary containing a mapping between all the ibox names
+            and associated bbox or pbox iterations.
+        links: dict
+            the box links (see '_box_links').
+        windows: dict (optional, default None)
+            the expansion state of the iboxes (see '_expand_iterations').
+        """
+        if windows is None:
+            windows = {box_name: {
+                "next": len(itergraphs), "total": len(itergraphs),
+                "driver": box_name, "streams": None}}
+        expanded = [(box_name, itergraphs)]
+        while expanded:
+            src_name, src_itergraphs = expanded.pop()
+            iterations = [int(itername.rsplit(Ibox.itersep, 1)[1])
+                          for itername in src_itergraphs]
+            for dest_name, iterlinks in self._iteration_streams(
+                    graph, src_name, links, windows):
+
+                # Expand the downstream ibox iterations and link each
+                # iteration to the corresponding upstream iteration
+                dest_ibox = graph.find_node(dest_name).meta
+                state = windows[dest_name]
+                dest_itergraphs = dest_ibox.itergraphs(
+                    dest_name, nb_of_iterations=state["total"],
+                    iterations=iterations)
+                state["next"] += len(iterations)
+                self._add_itergraphs(graph, dest_name, dest_itergraphs,
+                                     iter_map, box_map, state["total"])
+                for itername, (src_graph, src_box) in src_itergraphs.items():
+                    _, iteration = itername.rsplit(Ibox.itersep, 1)
+                    dest_graph, dest_box = dest_itergraphs[
+                        dest_name + Ibox.itersep + iteration]
+                    for src_control, dest_control in iterlinks:
+                        src_box.stream(src_control, dest_box, dest_control)
+                    for src_node in src_graph._nodes.values():
+                        if any(item.name in src_graph._nodes
+                               for item in src_node.links_to):
+                            continue
+                        for dest_node in dest_graph._nodes.values():
+                            if dest_node.links_from_degree == 0:
+                                graph.add_link(src_node.name, dest_node.name)
+                expanded.append((dest_name, dest_itergraphs))
+
+    def _iteration_streams(self, graph, box_name, links, windows):
+        """ List the downstream iterative boxes that stream the iterations
+        of an ibox (see '_stream_iterations').
+
+        The streams are searched when the first iterations of the ibox are
+        expanded and the streaming iboxes are then driven by the ibox
+        driver.
+
+        Parameters
+        ----------
+        graph: Graph
+            the updated graph representation.
+        box_name: str
+            the expanded ibox name.
+        links: dict
+            the box links (see '_box_links').
+        windows: dict
+            the expansion state of the iboxes (see '_expand_iterations').
+
+        Returns
+        -------
+        streams: list of 2-uplet
+            the streaming ibox names and the linked iterative source and
+            destination control names.
+        """
+        state = windows[box_name]
+        if state["streams"] is not None:
+            return state["streams"]
+        state["streams"] = []
+        src_ibox = graph.find_node(box_name).meta
+        for node in list(graph.find_node(box_name).links_to):
+
+            # Check that the downstream box can stream the iterations
+            dest_ibox = node.meta
+            if (not isinstance(dest_ibox, Ibox) or
+                    dest_ibox.itermode != "zip" or
+                    dest_ibox.iterswitches or
+                    node.name in windows or
+                    [item.name for item in node.links_from] != [box_name]):
+                continue
+            iterlinks = []
+            for src_control, dest_control in links.get(
+                    (box_name, node.name), []):
+                src_control = src_control[len(Ibox.iterprefix):]
+                dest_control = dest_control[len(Ibox.iterprefix):]
+                if (src_control not in src_ibox.iteroutputs or
+                        dest_control not in dest_ibox.iterinputs):
+                    iterlinks = None
+                    break
+                iterlinks.append((src_control, dest_control))
+            if iterlinks is None or (
+                    sorted(set(item[1] for item in iterlinks)) !=
+                    sorted(dest_ibox.iterinputs)):
+                continue
+            windows[node.name] = {
+                "next": 0, "total": state["total"],
+                "driver": state["driver"], "streams": None}
+            state["streams"].append((node.name, iterlinks))
+        return state["streams"]
+
+    def _box_links(self, box, prefix=""):
+        """ List the control links between the boxes of a pbox.
+
+        The inner pboxes are flattened as in '_create_graph', the links
+        that cross a pbox boundary are not listed.
+
+        Parameters
+        ----------
+        box: Pbox (mandatory)
+            a pbox.
+        prefix: str (optional, default '')
+            a prefix for the box names.
+
+        Returns
+        -------
+        links: dict
+            the linked source and destination control names indexed by the
+            source and destination box names.
+        """
+        links = {}
+        for box_name, inner_box in box._boxes.items():
+            if isinstance(inner_box, Pbox):
+                links.update(self._box_links(
+                    inner_box, prefix + "{0}.".format(box_name)))
+        for linkrep in box._links:
+            src_box_name, src_ctrl, dest_box_name, dest_ctrl = parse_link(
+                linkrep)
+            if src_box_name == "" or dest_box_name == "":
+                continue
+            links.setdefault(
+                (prefix + src_box_name, prefix + dest_box_name), []).append(
+                    (src_ctrl, dest_ctrl))
+        return links
 
     def _create_graph(self, box, prefix="", flatten=True, add_io=False,
                       filter_inactive=False):
@@ -512,6 +1215,13 @@ class Pbox(object):
                     linktype = "link"
                 self._add_link(linkdesc, linktype)
 
+        # Add the links of the inner pipelines in the dataflow table
+        for box in self._boxes.values():
+            if isinstance(box, Ibox):
+                box = box.iterbox
+            if isinstance(box, Pbox):
+                self._dataflow.merge(box._dataflow)
+
     def _add_switch(self, switchdesc):
         """ Add a switch in the pipeline from its description.
 
@@ -558,7 +1268,10 @@ class Pbox(object):
                   ".".format(switch_name, "-".join(switch_keys), self.id)))
         setattr(self.inputs, switch_name, control)
         self._switches[switch_name] = switch_paths
-        control.add_observer("value", self._update_activation)
+        # The control must not keep the pipeline alive: the pipeline copies
+        # of the iterative boxes are then released without a garbage
+        # collection
+        control.add_observer("value", self._update_activation, weak=True)
         control.value = switch_keys[0]
 
     def _update_activation(self, signal):
@@ -616,15 +1329,37 @@ class Pbox(object):
         box_module = boxdesc[self.unit_attributes[1]][0]
         iterinputs = boxdesc.get(self.unit_attributes[3], [])
         iteroutputs = boxdesc.get(self.unit_attributes[4], [])
+        chunksizes = boxdesc.get(self.unit_attributes[5], []) + [
+            item[self.unit_iter[1]] for item in iterinputs
+            if self.unit_iter[1] in item]
         if box_module.endswith(".xml"):
-            box = Pbox(box_module)
+            box = Pbox(box_module, compiled=self._compiled)
         else:
-            box = Bbox(box_module)
+            box = Bbox(box_module, compiled=self._compiled)
             box.update_control_names(box_name)
         if iterinputs != [] or iteroutputs != []:
             iterinputs = [item["name"] for item in iterinputs]
-            iteroutputs = [item["name"] for item in iteroutputs]
-            box = Ibox(box, iterinputs, iteroutputs)
+            reducers = dict(
+                (item["name"], item[self.unit_iter[2]].strip())
+                for item in iteroutputs if self.unit_iter[2] in item)
+            iteroutputs = [item["name"] for item in iteroutputs
+                           if item["name"] not in reducers]
+            chunksize = 1
+            if chunksizes:
+                chunksize = chunksizes[0].strip()
+                if chunksize != "auto":
+                    try:
+                        chunksize = int(chunksize)
+                    except ValueError:
+                        pass
+            itermode = boxdesc.get(self.unit_attributes[6], ["zip"])[0]
+            box = Ibox(box, iterinputs, iteroutputs, chunksize, reducers,
+                       itermode.strip())
+        elif chunksizes or self.unit_attributes[6] in boxdesc:
+            raise ValueError(
+                "A chunk size or an iteration mode is defined for the non "
+                "iterative box '{0}' in '{1}'.".format(
+                    box_name, self._xmlfile))
         self._boxes[box_name] = box
 
         # Set the new box default parameters
@@ -644,9 +1379,9 @@ class Pbox(object):
                 # Set the input or output default paramters
                 box_pname = box_defaults[self.unit_set[0]]
                 box_pvalue = eval(box_defaults[self.unit_set[1]])
-                if box_pname in self._boxes[box_name].inputs.controls:
+                if box_pname in self._boxes[box_name].inputs:
                     control = getattr(self._boxes[box_name].inputs, box_pname)
-                elif box_pname in self._boxes[box_name].outputs.controls:
+                elif box_pname in self._boxes[box_name].outputs:
                     control = getattr(self._boxes[box_name].outputs, box_pname)
                 else:
                     raise ValueError(
@@ -690,20 +1425,21 @@ class Pbox(object):
             setattr(
                 self.outputs, destination, self._get_control(source, False))
         elif linktype == "input":
-            if source not in self.inputs.controls:
+            if source not in self.inputs:
                 setattr(
                     self.inputs, source, self._get_control(destination, True))
             else:
                 src_control = self._get_control(source, False)
                 dest_control = self._get_control(destination, True)
-                src_control.add_observer("value", dest_control._update_value)
+                self._dataflow.add_link(src_control, dest_control)
         # Deal with inner pipeline link
         # In this case an observer is registered on the source control that
-        # updates the output control when some changes occured.
+        # updates the output control when some changes occured and the link
+        # is added to the pipeline dataflow table.
         elif linktype == "link":
             src_control = self._get_control(source, False)
             dest_control = self._get_control(destination, True)
-            src_control.add_observer("value", dest_control._update_value)
+            self._dataflow.add_link(src_control, dest_control)
         else:
             raise ValueError("Unrecognized link type '{0}'.".format(linktype))
 
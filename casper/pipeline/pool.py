@@ -0,0 +1,560 @@
+#! /usr/bin/env python
+##########################################################################
+# CASPER - Copyright (C) AGrigis, 2013
+# Distributed under the terms of the CeCILL-B license, as published by
+# the CEA-CNRS-INRIA. Refer to the LICENSE file or to
+# http://www.cecill.info/licences/Licence_CeCILL-B_V1-en.html
+# for details.
+##########################################################################
+
+# System import
+import multiprocessing
+import logging
+# COMPATIBILITY: module renamed in python 3
+try:
+    import Queue as queue
+except ImportError:
+    import queue
+
+# Casper import
+from .bbox import Bbox
+from .shared import SharedArrays
+
+
+# Define the logger
+logger = logging.getLogger(__name__)
+
+
+FLAG_ALL_DONE = b"WORK_FINISHED"
+FLAG_WORKER_FINISHED_PROCESSING = b"WORKER_FINISHED_PROCESSING"
+
+
+class BboxCache(object):
+    """ A bounded cache of bboxes indexed by function descriptions.
+
+    When the cache is full, the least recently used bbox is evicted.
+    A cached bbox controls are reset each time it is returned.
+
+    Attributes
+    ----------
+    `size`: int
+        the maximum number of cached bboxes.
+    `hits`, `misses`: int
+        the cache statistics.
+    """
+    def __init__(self, size=32):
+        """ Initialize the BboxCache class.
+
+        Parameters
+        ----------
+        size: int (optional, default 32)
+            the maximum number of cached bboxes.
+        """
+        self.size = size
+        self.hits = 0
+        self.misses = 0
+        self._bboxes = {}
+        self._tick = 0
+
+    def __len__(self):
+        """ The number of cached bboxes.
+        """
+        return len(self._bboxes)
+
+    def get(self, funcdesc):
+        """ Get a bbox with initial control values.
+
+        Parameters
+        ----------
+        funcdesc: string (mandatory)
+            a python function path relative to the module we want to
+            decorate in a building box.
+
+        Returns
+        -------
+        bbox: Bbox
+            the requested bbox.
+        """
+        # Cache hit: reset the cached bbox
+        self._tick += 1
+        if funcdesc in self._bboxes:
+            self.hits += 1
+            bbox = self._bboxes[funcdesc][1]
+            bbox.reset_controls()
+
+        # Cache miss: build the bbox and evict the least recently used one
+        # if the cache is full
+        else:
+            self.misses += 1
+            bbox = Bbox(funcdesc)
+            if self.size <= 0:
+                return bbox
+            if len(self._bboxes) >= self.size:
+                lru_funcdesc = min(
+                    self._bboxes, key=lambda key: self._bboxes[key][0])
+                del self._bboxes[lru_funcdesc]
+        self._bboxes[funcdesc] = (self._tick, bbox)
+
+        return bbox
+
+    def statistics(self):
+        """ Get the cache statistics.
+
+        Returns
+        -------
+        statistics: dict
+            the cache 'hits', 'misses', 'hit_rate' and 'size'.
+        """
+        nb_of_calls = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": float(self.hits) / nb_of_calls if nb_of_calls else 0.,
+            "size": len(self._bboxes)
+        }
+
+
+def bbox_worker(workers_bbox, workers_returncode, cache_size=32, index=0):
+    """ The worker function of a bbox, invoked in a Process.
+
+    A job executes a chunk of one or more calls of the same function and
+    returns the returncodes of all the calls at once, each call having its
+    own exitcode.
+
+    The bboxes are kept in a cache so that the repeated execution of a
+    function does not reload the function and rebuild its controls.
+    The shared arrays produced by the worker are kept in a resident store
+    until the master reports that their shared file is released, so that a
+    downstream box executed by the same worker gets them without mapping
+    the shared files. The store is emptied when the shared files of a new
+    execution are received.
+    The environment reference, a whitelist or the baseline of the 'diff'
+    policy, is received once and kept for the next jobs that only contain
+    the environment capture policy.
+
+    Parameters
+    ----------
+    workers_bbox, workers_returncode: multiprocessing.Queue
+        the input and output queues.
+    cache_size: int
+        the maximum number of bboxes kept in the worker cache.
+    index: int
+        the worker index reported in the returncodes.
+    """
+    from casper.lib.cache import Memory
+    import traceback
+
+    memories = {}
+    bbox_cache = BboxCache(cache_size)
+    store = {}
+    store_directory = None
+    environ_reference = None
+    while True:
+        inputs = workers_bbox.get()
+        if inputs == FLAG_ALL_DONE:
+            workers_returncode.put(FLAG_WORKER_FINISHED_PROCESSING)
+            break
+        (process_names, box_funcdesc, chunk_inputs, environ, cachedir,
+         sharing) = inputs
+        environ_policy = environ[0]
+        if len(environ) > 1:
+            environ_reference = environ[1]
+        shared = None
+        if sharing is not None:
+            directory, min_nbytes, released = sharing
+            if directory != store_directory:
+                store.clear()
+                store_directory = directory
+            shared = SharedArrays(directory, min_nbytes, store=store)
+            shared.prune(released)
+        if cachedir not in memories:
+            memories[cachedir] = Memory(cachedir)
+        chunk_returncode = {}
+        for process_name, bbox_inputs in zip(process_names, chunk_inputs):
+            try:
+                if shared is not None:
+                    bbox_inputs = shared.attach(bbox_inputs)
+                bbox = bbox_cache.get(box_funcdesc)
+                bbox.environ_policy = environ_policy
+                bbox.environ_reference = environ_reference
+                bbox = memories[cachedir].cache(bbox)
+                with bbox.inputs.batch():
+                    for control_name, value in bbox_inputs.items():
+                        setattr(bbox.inputs, control_name, value)
+                bbox_returncode = bbox(process_name)
+                bbox_returncode[process_name]["exitcode"] = 0
+                if shared is not None:
+                    for key in ("inputs", "outputs"):
+                        bbox_returncode[process_name][key] = shared.share(
+                            bbox_returncode[process_name][key])
+            except:
+                bbox_returncode = {process_name: {}}
+                bbox_returncode[process_name]["inputs"] = {}
+                bbox_returncode[process_name]["outputs"] = {}
+                bbox_returncode[process_name]["exitcode"] = (
+                    "1 - {0}'".format(traceback.format_exc()))
+            bbox_returncode[process_name]["bbox_cache"] = (
+                bbox_cache.statistics())
+            bbox_returncode[process_name]["worker"] = index
+            if shared is not None:
+                bbox_returncode[process_name]["object_store"] = {
+                    "hits": shared.hits,
+                    "hit_nbytes": shared.hit_nbytes,
+                    "size": len(store)
+                }
+            chunk_returncode.update(bbox_returncode)
+        if shared is not None:
+            shared.forget()
+        workers_returncode.put(chunk_returncode)
+
+
+class WorkerPool(object):
+    """ A pool of processes that execute bboxes.
+
+    The pool lives outside a single pbox execution: it can be passed to or
+    attached to several pboxes and its workers are reused between the
+    executions. Call 'shutdown' to stop the workers.
+
+    Each worker has its own job queue. A job is sent to the idle worker
+    that holds the largest part of its shared input arrays in its resident
+    store, so that these arrays are not mapped from the shared files. If
+    the workers holding the arrays are busy, the job is sent to another
+    worker that maps the shared files. The environment reference of a job
+    is sent only to the workers that do not hold it yet.
+
+    Attributes
+    ----------
+    `cpus`: int
+        the number of workers.
+    `cache_size`: int
+        the maximum number of bboxes kept in each worker cache.
+    `locality`: bool
+        if False, the jobs are sent to the least loaded worker whatever
+        the location of their shared input arrays.
+    `workers`: list of multiprocessing.Process
+        the running workers.
+
+    Methods
+    -------
+    start
+    check
+    is_alive
+    submit
+    submit_chunk
+    get
+    wait
+    shutdown
+    """
+    poll_interval = 1.
+
+    def __init__(self, cpus=1, cache_size=32, locality=True):
+        """ Initialize the WorkerPool class.
+
+        Parameters
+        ----------
+        cpus: int (optional, default 1)
+            the number of workers to start.
+        cache_size: int (optional, default 32)
+            the maximum number of bboxes kept in each worker cache.
+        locality: bool (optional, default True)
+            if True, send the jobs to the workers that hold their shared
+            input arrays.
+        """
+        if cpus < 1:
+            raise ValueError("A pool needs at least one worker, got "
+                             "'{0}'.".format(cpus))
+        self.cpus = cpus
+        self.cache_size = cache_size
+        self.locality = locality
+        self.workers = []
+        self._workers_bbox = []
+        self._workers_returncode = None
+        self._loads = []
+        self._locations = {}
+        self._released = []
+        self._directory = None
+        self._environs = []
+        self.start()
+
+    def __enter__(self):
+        """ Use the pool as a context manager.
+        """
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        """ Shutdown the pool when leaving the context.
+        """
+        self.shutdown()
+
+    def __repr__(self):
+        """ WorkerPool class representation.
+        """
+        return "{0}(cpus={1}, alive={2})".format(
+            self.__class__.__name__, self.cpus, self.is_alive())
+
+    ###########################################################################
+    # Public Members
+    ###########################################################################
+
+    def start(self):
+        """ Start the workers with fresh queues.
+
+        The workers still running are terminated first.
+        """
+        self._terminate()
+        self._workers_bbox = [
+            multiprocessing.Queue() for index in range(self.cpus)]
+        self._workers_returncode = multiprocessing.Queue()
+        self._loads = [0] * self.cpus
+        self._locations = {}
+        self._released = [[] for index in range(self.cpus)]
+        self._directory = None
+        self._environs = [None] * self.cpus
+        for index in range(self.cpus):
+            process = multiprocessing.Process(
+                target=bbox_worker,
+                args=(self._workers_bbox[index], self._workers_returncode,
+                      self.cache_size, index))
+            process.daemon = True
+            process.start()
+            self.workers.append(process)
+
+    def is_alive(self):
+        """ Check that all the workers are running.
+
+        Returns
+        -------
+        is_alive: bool
+            True if the pool is started and all its workers are running.
+        """
+        return (len(self.workers) == self.cpus and
+                all(process.is_alive() for process in self.workers))
+
+    def check(self):
+        """ Health check: restart the pool if a worker is not running.
+
+        A worker that died may have left the queues in an undefined state,
+        so the whole pool is restarted. This method must not be called while
+        some jobs are in progress.
+
+        Returns
+        -------
+        restarted: bool
+            True if the pool has been restarted.
+        """
+        if self.is_alive():
+            return False
+        logger.warning("Restarting the '{0}' workers.".format(self))
+        self.start()
+        return True
+
+    def submit(self, process_name, box_funcdesc, box_inputs,
+               environ=("none", None), cachedir=None, shared=None):
+        """ Send a bbox job to the workers.
+
+        Parameters
+        ----------
+        process_name: str (mandatory)
+            the name used to store the job returncode.
+        box_funcdesc: str (mandatory)
+            the bbox function description.
+        box_inputs: dict (mandatory)
+            the bbox input control values.
+        environ, cachedir, shared: (optional)
+            see 'submit_chunk'.
+
+        Returns
+        -------
+        index: int
+            the index of the worker that will execute the job.
+        """
+        return self.submit_chunk(
+            [process_name], box_funcdesc, [box_inputs], environ, cachedir,
+            shared)
+
+    def submit_chunk(self, process_names, box_funcdesc, chunk_inputs,
+                     environ=("none", None), cachedir=None, shared=None):
+        """ Send a job executing several calls of a bbox to the workers.
+
+        The returncodes of all the calls are returned at once by 'get'.
+
+        Parameters
+        ----------
+        process_names: list of str (mandatory)
+            the names used to store the returncode of each call.
+        box_funcdesc: str (mandatory)
+            the bbox function description.
+        chunk_inputs: list of dict (mandatory)
+            the bbox input control values of each call.
+        environ: 2-uplet (optional, default ('none', None))
+            the environment capture policy and reference (see
+            'capture_environ'). The reference is sent to the selected
+            worker only if it does not already hold this reference object.
+        cachedir: string (optional, default None)
+            the directory in which the smart-caching will work. If None no
+            caching is done.
+        shared: SharedArrays (optional, default None)
+            if specified, the large numpy arrays are exchanged with the
+            workers through shared memory-mapped files.
+
+        Returns
+        -------
+        index: int
+            the index of the worker that will execute the job.
+        """
+        sharing = None
+        handles = []
+        if shared is not None:
+            self._forget_released(shared)
+            chunk_inputs = shared.share(chunk_inputs)
+            handles = shared.handles(chunk_inputs)
+        index = self._select_worker(handles)
+        if shared is not None:
+            sharing = (shared.directory, shared.min_nbytes,
+                       self._released[index])
+            self._released[index] = []
+        policy, reference = environ
+        if reference is self._environs[index]:
+            environ = (policy, )
+        else:
+            self._environs[index] = reference
+        self._loads[index] += 1
+        self._workers_bbox[index].put(
+            (process_names, box_funcdesc, chunk_inputs, environ, cachedir,
+             sharing))
+        return index
+
+    def get(self):
+        """ Wait for the next job returncode.
+
+        The workers are checked regularly while waiting, so that a dead
+        worker does not block the caller forever.
+
+        Returns
+        -------
+        returncode: dict
+            the returncode of a job: a chunk job returns the returncodes of
+            all its calls.
+        """
+        while True:
+            try:
+                returncode = self._workers_returncode.get(
+                    timeout=self.poll_interval)
+                break
+            except queue.Empty:
+                if not self.is_alive():
+                    raise RuntimeError(
+                        "A worker of '{0}' died, the pool needs to be "
+                        "restarted.".format(self))
+
+        # Update the worker loads and the locations of the shared arrays
+        index = None
+        for box_returncode in returncode.values():
+            index = box_returncode.get("worker", index)
+            if "object_store" in box_returncode:
+                for handle in SharedArrays.handles(
+                        box_returncode["outputs"]):
+                    self._locations[handle.path] = (index, handle.nbytes)
+        if index is not None:
+            self._loads[index] -= 1
+
+        return returncode
+
+    def wait(self):
+        """ Wait for the jobs in progress and discard their returncodes.
+
+        The pool can then be reused after an interrupted execution. If a
+        worker died, the pool is left to 'check'.
+        """
+        try:
+            while any(self._loads):
+                self.get()
+        except RuntimeError:
+            logger.warning("A worker of '{0}' died while waiting for the "
+                           "jobs in progress.".format(self))
+
+    def shutdown(self, timeout=10.):
+        """ Stop the workers.
+
+        Poison pills are sent to the workers and the workers that do not
+        stop before the timeout are terminated.
+
+        Parameters
+        ----------
+        timeout: float (optional, default 10.)
+            the time in seconds to wait for the workers to stop.
+        """
+        alive_workers = [
+            index for index, process in enumerate(self.workers)
+            if process.is_alive()]
+        for index in alive_workers:
+            self._workers_bbox[index].put(FLAG_ALL_DONE)
+        workers_finished = 0
+        while workers_finished < len(alive_workers):
+            try:
+                flag = self._workers_returncode.get(timeout=timeout)
+            except queue.Empty:
+                break
+            if flag == FLAG_WORKER_FINISHED_PROCESSING:
+                workers_finished += 1
+        self._terminate()
+
+    ###########################################################################
+    # Private Members
+    ###########################################################################
+
+    def _select_worker(self, handles):
+        """ Select the worker that will execute a job.
+
+        Parameters
+        ----------
+        handles: list of ArrayHandle
+            the shared input arrays of the job.
+
+        Returns
+        -------
+        index: int
+            the index of the idle worker holding the largest part of the
+            shared input arrays, or of the least loaded worker if no idle
+            worker holds them.
+        """
+        local_nbytes = [0] * self.cpus
+        if self.locality:
+            for handle in handles:
+                if handle.path in self._locations:
+                    index, nbytes = self._locations[handle.path]
+                    local_nbytes[index] += nbytes
+        return min(range(self.cpus), key=lambda index: (
+            self._loads[index] > 0, -local_nbytes[index],
+            self._loads[index], index))
+
+    def _forget_released(self, shared):
+        """ Forget the locations of the released shared files.
+
+        The released files are reported to each worker with its next job.
+        The locations of the files of a previous execution are forgotten
+        when the shared files of a new execution are submitted.
+
+        Parameters
+        ----------
+        shared: SharedArrays
+            the shared arrays of the execution.
+        """
+        if shared.directory != self._directory:
+            self._directory = shared.directory
+            self._locations = {}
+            self._released = [[] for index in range(self.cpus)]
+        for path in shared.released:
+            self._locations.pop(path, None)
+            for released in self._released:
+                released.append(path)
+        del shared.released[:]
+
+    def _terminate(self):
+        """ Terminate and forget the workers.
+        """
+        for process in self.workers:
+            if process.is_alive():
+                process.terminate()
+            process.join()
+        del self.workers[:]
@@ -0,0 +1,219 @@
+#! /usr/bin/env python
+##########################################################################
+# CASPER - Copyright (C) AGrigis, 2013
+# Distributed under the terms of the CeCILL-B license, as published by
+# the CEA-CNRS-INRIA. Refer to the LICENSE file or to
+# http://www.cecill.info/licences/Licence_CeCILL-B_V1-en.html
+# for details.
+##########################################################################
+
+# System import
+import numpy
+
+
+class Reducer(object):
+    """ Fold the output values of the iterations of an iterative box.
+
+    The values are added as the iterations complete, in any order, so that
+    only the aggregate is kept.
+
+    Attributes
+    ----------
+    `nb_of_iterations`: int
+        the number of iterations.
+    `name`: str
+        the reduced control name.
+    """
+    def __init__(self, nb_of_iterations, name=""):
+        """ Initialize the Reducer class.
+
+        Parameters
+        ----------
+        nb_of_iterations: int (mandatory)
+            the number of iterations.
+        name: str (optional, default '')
+            the reduced control name.
+        """
+        self.nb_of_iterations = nb_of_iterations
+        self.name = name
+        self.value = None
+        self.count = 0
+
+    def add(self, iteration, value):
+        """ Fold the value of an iteration.
+
+        Parameters
+        ----------
+        iteration: int (mandatory)
+            the iteration index.
+        value: object (mandatory)
+            the iteration output value.
+        """
+        if self.count == 0:
+            self.value = value
+        else:
+            self.value = self.fold(self.value, value)
+        self.count += 1
+
+    def fold(self, value, item):
+        """ Combine the aggregate with an iteration value.
+
+        Parameters
+        ----------
+        value: object (mandatory)
+            the current aggregate.
+        item: object (mandatory)
+            the iteration output value.
+
+        Returns
+        -------
+        value: object
+            the new aggregate.
+        """
+        raise NotImplementedError("A 'fold' method has to be defined in "
+                                  "child classes.")
+
+    def result(self):
+        """ Get the reduced value.
+
+        Returns
+        -------
+        value: object
+            the reduced value.
+        """
+        return self.value
+
+
+class ListReducer(Reducer):
+    """ Store the iteration values in a list ordered by iteration.
+    """
+    def __init__(self, nb_of_iterations, name=""):
+        """ Initialize the ListReducer class.
+        """
+        super(ListReducer, self).__init__(nb_of_iterations, name)
+        self.value = [None] * nb_of_iterations
+
+    def add(self, iteration, value):
+        """ Store the value of an iteration.
+        """
+        self.value[iteration] = value
+        self.count += 1
+
+
+class ConcatReducer(Reducer):
+    """ Concatenate the iteration lists or arrays in the iteration order.
+
+    The values of the iterations that complete before their predecessors
+    are kept until they can be concatenated.
+    """
+    def __init__(self, nb_of_iterations, name=""):
+        """ Initialize the ConcatReducer class.
+        """
+        super(ConcatReducer, self).__init__(nb_of_iterations, name)
+        self.value = []
+        self.pending = {}
+        self.next_iteration = 0
+
+    def add(self, iteration, value):
+        """ Concatenate the value of an iteration.
+        """
+        self.pending[iteration] = value
+        while self.next_iteration in self.pending:
+            item = self.pending.pop(self.next_iteration)
+            if isinstance(item, numpy.ndarray):
+                self.value.append(item)
+            else:
+                self.value.extend(item)
+            self.next_iteration += 1
+        self.count += 1
+
+    def result(self):
+        """ Get the concatenated list or array.
+        """
+        if any(isinstance(item, numpy.ndarray) for item in self.value):
+            return numpy.concatenate(self.value)
+        return self.value
+
+
+class SumReducer(Reducer):
+    """ Sum the iteration values.
+    """
+    def fold(self, value, item):
+        """ Add an iteration value.
+        """
+        return value + item
+
+
+class MeanReducer(SumReducer):
+    """ Average the iteration values.
+    """
+    def result(self):
+        """ Get the mean value.
+        """
+        if self.count == 0:
+            return None
+        return self.value / float(self.count)
+
+
+class MinReducer(Reducer):
+    """ Get the minimum of the iteration values, element-wise for arrays.
+    """
+    def fold(self, value, item):
+        """ Keep the minimum value.
+        """
+        if isinstance(value, numpy.ndarray):
+            return numpy.minimum(value, item)
+        return min(value, item)
+
+
+class MaxReducer(Reducer):
+    """ Get the maximum of the iteration values, element-wise for arrays.
+    """
+    def fold(self, value, item):
+        """ Keep the maximum value.
+        """
+        if isinstance(value, numpy.ndarray):
+            return numpy.maximum(value, item)
+        return max(value, item)
+
+
+class StackReducer(Reducer):
+    """ Stack the iteration values in an array whose first dimension is the
+    iteration index.
+
+    The array is allocated when the first value is added.
+    """
+    def add(self, iteration, value):
+        """ Copy the value of an iteration in the stacked array.
+        """
+        value = numpy.asarray(value)
+        if self.value is None:
+            self.value = numpy.empty(
+                (self.nb_of_iterations, ) + value.shape, dtype=value.dtype)
+        self.value[iteration] = value
+        self.count += 1
+
+
+class FirstEqualReducer(Reducer):
+    """ Check that all the iterations return the same value.
+    """
+    def fold(self, value, item):
+        """ Check that the iteration value is the aggregate.
+        """
+        if not value == item:
+            raise ValueError(
+                "The '{0}' standard ibox output can't have different "
+                "values {1}.".format(self.name, [value, item]))
+        return value
+
+
+reducers = {
+    "list": ListReducer,
+    "concat": ConcatReducer,
+    "sum": SumReducer,
+    "mean": MeanReducer,
+    "min": MinReducer,
+    "max": MaxReducer,
+    "stack": StackReducer,
+    "first_equal": FirstEqualReducer
+}
@@ -0,0 +1,288 @@
+#! /usr/bin/env python
+##########################################################################
+# CASPER - Copyright (C) AGrigis, 2013
+# Distributed under the terms of the CeCILL-B license, as published by
+# the CEA-CNRS-INRIA. Refer to the LICENSE file or to
+# http://www.cecill.info/licences/Licence_CeCILL-B_V1-en.html
+# for details.
+##########################################################################
+
+# System import
+import os
+import uuid
+import shutil
+import tempfile
+import numpy
+
+
+class ArrayHandle(object):
+    """ A small picklable reference to a numpy array stored in a
+    memory-mapped file.
+
+    Attributes
+    ----------
+    `path`: str
+        the file containing the array data.
+    `dtype`: str
+        the array data type.
+    `shape`: tuple
+        the array shape.
+    `nbytes`: int
+        the array size in bytes.
+    """
+    def __init__(self, path, dtype, shape, nbytes):
+        """ Initialize the ArrayHandle class.
+        """
+        self.path = path
+        self.dtype = dtype
+        self.shape = shape
+        self.nbytes = nbytes
+
+    def attach(self, mode="c"):
+        """ Map the array in memory without copying its data.
+
+        Parameters
+        ----------
+        mode: str (optional, default 'c')
+            the mapping mode: in copy-on-write mode 'c' the modifications
+            are not written in the shared file, in mode 'r' the array is
+            read-only.
+
+        Returns
+        -------
+        array: numpy.memmap
+            the shared array.
+        """
+        return numpy.memmap(self.path, dtype=self.dtype, mode=mode,
+                            shape=self.shape)
+
+    def __repr__(self):
+        """ ArrayHandle class representation.
+        """
+        return "{0}({1}, {2}, {3})".format(
+            self.__class__.__name__, self.path, self.dtype, self.shape)
+
+
+class SharedArrays(object):
+    """ Exchange large numpy arrays through memory-mapped files.
+
+    The arrays contained in a value (possibly nested in lists, tuples or
+    dictionaries) are replaced by handles with 'share' and the handles are
+    replaced by memory-mapped arrays with 'attach'. An attached array that
+    is shared again reuses its handle, so that its data is never copied.
+
+    A worker can also keep the arrays it shares in a resident store: the
+    handles of the stored arrays are then attached without mapping the
+    shared files. The arrays attached with a store are read-only so that
+    an array gets the same protection wherever it is attached.
+
+    Attributes
+    ----------
+    `directory`: str
+        the directory containing the shared files.
+    `min_nbytes`: int
+        the minimum size in bytes of a shared array. Smaller arrays are
+        kept in the values.
+    `nbytes`: int
+        the number of bytes written in shared files.
+    `store`: dict
+        the resident arrays indexed by shared file, None if no array is
+        kept.
+    `hits`, `hit_nbytes`: int
+        the number and size of the arrays attached from the store.
+    `released`: list of str
+        the shared files removed with 'release' and not yet reported to
+        the workers.
+    """
+    def __init__(self, directory=None, min_nbytes=1 << 20, store=None):
+        """ Initialize the SharedArrays class.
+
+        Parameters
+        ----------
+        directory: str (optional, default None)
+            the directory containing the shared files. If None a temporary
+            directory is created, in '/dev/shm' if available.
+        min_nbytes: int (optional, default 1Mo)
+            the minimum size in bytes of a shared array.
+        store: dict (optional, default None)
+            the resident arrays indexed by shared file. If specified the
+            shared arrays are added to the store and the attached arrays
+            are read-only.
+        """
+        if directory is None:
+            shmdir = "/dev/shm"
+            if not os.path.isdir(shmdir):
+                shmdir = None
+            directory = tempfile.mkdtemp(prefix="casper_", dir=shmdir)
+        self.directory = directory
+        self.min_nbytes = min_nbytes
+        self.nbytes = 0
+        self.store = store
+        self.hits = 0
+        self.hit_nbytes = 0
+        self.released = []
+        self._handles = {}
+        self._paths = {}
+
+    def share(self, value):
+        """ Replace the large arrays of a value by handles.
+
+        Parameters
+        ----------
+        value: object (mandatory)
+            a python object.
+
+        Returns
+        -------
+        shared_value: object
+            the input value where the large arrays are replaced by handles.
+        """
+        # Deal with containers
+        if isinstance(value, dict):
+            return dict((key, self.share(item))
+                        for key, item in value.items())
+        elif isinstance(value, (list, tuple)):
+            shared_value = [self.share(item) for item in value]
+            if isinstance(value, tuple):
+                shared_value = tuple(shared_value)
+            return shared_value
+
+        # Deal with arrays: reuse the handle of an attached array
+        elif isinstance(value, numpy.ndarray):
+            if id(value) in self._handles:
+                return self._handles[id(value)][1]
+            if (value.nbytes < self.min_nbytes or value.nbytes == 0 or
+                    value.dtype.hasobject):
+                return value
+            path = os.path.join(self.directory, uuid.uuid4().hex)
+            array = numpy.memmap(path, dtype=value.dtype, mode="w+",
+                                 shape=value.shape)
+            array[...] = value
+            array.flush()
+            del array
+            self.nbytes += value.nbytes
+            handle = ArrayHandle(path, value.dtype.str, value.shape,
+                                 value.nbytes)
+            self._index(value, handle)
+            if self.store is not None:
+                array = value.view()
+                array.flags.writeable = False
+                self.store[path] = array
+            return handle
+
+        return value
+
+    def attach(self, value):
+        """ Replace the handles of a value by memory-mapped arrays.
+
+        Parameters
+        ----------
+        value: object (mandatory)
+            a python object.
+
+        Returns
+        -------
+        attached_value: object
+            the input value where the handles are replaced by arrays.
+        """
+        # Deal with containers
+        if isinstance(value, dict):
+            return dict((key, self.attach(item))
+                        for key, item in value.items())
+        elif isinstance(value, (list, tuple)):
+            attached_value = [self.attach(item) for item in value]
+            if isinstance(value, tuple):
+                attached_value = tuple(attached_value)
+            return attached_value
+
+        # Deal with handles
+        elif isinstance(value, ArrayHandle):
+            if self.store is None:
+                array = value.attach()
+            elif value.path in self.store:
+                self.hits += 1
+                self.hit_nbytes += value.nbytes
+                array = self.store[value.path].view()
+            else:
+                array = value.attach(mode="r")
+            self._index(array, value)
+            return array
+
+        return value
+
+    @staticmethod
+    def handles(value):
+        """ List the handles contained in a value.
+
+        Parameters
+        ----------
+        value: object (mandatory)
+            a python object.
+
+        Returns
+        -------
+        handles: list of ArrayHandle
+            the handles contained in the value.
+        """
+        if isinstance(value, dict):
+            value = list(value.values())
+        if isinstance(value, (list, tuple)):
+            handles = []
+            for item in value:
+                handles.extend(SharedArrays.handles(item))
+            return handles
+        elif isinstance(value, ArrayHandle):
+            return [value]
+        return []
+
+    def forget(self):
+        """ Forget the shared and attached arrays without removing the
+        shared files.
+        """
+        self._handles = {}
+        self._paths = {}
+
+    def _index(self, array, handle):
+        """ Record the handle of an array and index it by shared file.
+        """
+        self._handles[id(array)] = (array, handle)
+        self._paths.setdefault(handle.path, set()).add(id(array))
+
+    def release(self, path):
+        """ Remove a shared file.
+
+        The arrays already attached remain valid on POSIX systems.
+
+        Parameters
+        ----------
+        path: str (mandatory)
+            the shared file to remove.
+        """
+        for key in self._paths.pop(path, ()):
+            self._handles.pop(key, None)
+        if self.store is not None:
+            self.store.pop(path, None)
+        self.released.append(path)
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+    def prune(self, paths):
+        """ Remove from the store the arrays whose shared file has been
+        released.
+
+        Parameters
+        ----------
+        paths: list of str (mandatory)
+            the released shared files.
+        """
+        if self.store is not None:
+            for path in paths:
+                self.store.pop(path, None)
+
+    def close(self):
+        """ Remove all the shared files.
+        """
+        self.forget()
+        shutil.rmtree(self.directory, ignore_errors=True)
@@ -10,9 +10,14 @@
 # System import
 import unittest
 import os
+import copy
+import sys
+import shutil
+import tempfile
 
 # Casper import
 from casper.pipeline import Bbox
+from casper.pipeline.compiled import CompiledCache
 
 
 class TestBBox(unittest.TestCase):
@@ -56,6 +61,14 @@ class TestBBox(unittest.TestCase):
         self.mybbox.inputs.fname = self.myfile
         self.assertEqual(self.mybbox.inputs.fname.value, self.myfile)
 
+        # Test the boxes of a function share their prototype but not their
+        # controls
+        mybbox = Bbox(self.myfuncdesc)
+        self.assertTrue(mybbox._prototype is self.mybbox._prototype)
+        self.assertFalse(mybbox.inputs.fname is self.mybbox.inputs.fname)
+        self.assertTrue(mybbox.outputs.fname is mybbox.inputs.fname)
+        self.assertEqual(mybbox.inputs.fname.value, None)
+
     def test_bbox_execution(self):
         """ Method to test if a bbox can be properly executed.
         """
@@ -71,6 +84,88 @@ class TestBBox(unittest.TestCase):
         self.mybbox()
         self.assertEqual(self.mybbox.outputs.string.value,
                          "-".join([repr(self.myfile), repr(self.mydir)]))
+        self.assertEqual(self.mybbox._plan,
+                         (["fname", "directory"], ["string"]))
+
+        # Execute the box again with the same execution plan
+        plan = self.mybbox._plan
+        self.mybbox.inputs.directory = None
+        returncode = self.mybbox("mybbox")
+        self.assertTrue(self.mybbox._plan is plan)
+        self.assertEqual(returncode["mybbox"]["outputs"]["string"],
+                         "-".join([repr(self.myfile), repr(None)]))
+        self.assertEqual(returncode["mybbox"]["outputs"]["fname"],
+                         self.myfile)
+
+    def test_bbox_deepcopy(self):
+        """ Method to test the copied bbox shares the function prototype.
+        """
+        mybbox = Bbox(self.myfuncdesc)
+        mybbox.inputs.directory = self.mydir
+        copied_bbox = copy.deepcopy(mybbox)
+        self.assertTrue(copied_bbox._prototype is mybbox._prototype)
+        self.assertTrue(copied_bbox.proto is mybbox.proto)
+        self.assertFalse(copied_bbox.inputs is mybbox.inputs)
+        self.assertEqual(copied_bbox.inputs.directory.value, self.mydir)
+        copied_bbox.inputs.directory = None
+        self.assertEqual(mybbox.inputs.directory.value, self.mydir)
+
+    def test_lazy_bbox(self):
+        """ Method to test if a bbox imports its module only when its
+        function is needed.
+        """
+        # Return to new line
+        print()
+
+        # Create a module and cache its description
+        module_name = "casper_lazy_module"
+        cachedir = tempfile.mkdtemp()
+        sys.path.insert(0, cachedir)
+        try:
+            with open(os.path.join(cachedir, module_name + ".py"),
+                      "w") as open_file:
+                open_file.write("\n".join([
+                    "def scale(value, factor=2):",
+                    "    \"\"\" Scale a value.",
+                    "",
+                    "    <unit>",
+                    "        <input name=\"value\" type=\"Int\" "
+                    "description=\"test\" />",
+                    "        <input name=\"factor\" type=\"Int\" "
+                    "description=\"test\" />",
+                    "        <output name=\"scaled\" type=\"Int\" "
+                    "description=\"test\" />",
+                    "    </unit>",
+                    "    \"\"\"",
+                    "    scaled = value * factor",
+                    "    return scaled",
+                    ""]))
+            funcdesc = module_name + ".scale"
+            compiled = CompiledCache(funcdesc, cachedir)
+            mybbox = Bbox(funcdesc, compiled=compiled)
+            compiled.save()
+            del sys.modules[module_name]
+
+            # Test the box is created without importing its module
+            compiled = CompiledCache(funcdesc, cachedir)
+            self.mybbox = Bbox(funcdesc, compiled=compiled)
+            self.assertEqual(compiled.hits, 1)
+            self.assertFalse(module_name in sys.modules)
+            self.assertEqual(self.mybbox.id, mybbox.id)
+            self.assertEqual(self.mybbox.__doc__, mybbox.__doc__)
+            self.assertEqual(self.mybbox.inputs.controls, ["value", "factor"])
+            self.assertEqual(self.mybbox.inputs.factor.value, 2)
+            self.assertTrue(self.mybbox.inputs.factor.optional)
+
+            # Test the module is imported when the box is executed
+            self.mybbox.inputs.value = 3
+            self.mybbox()
+            self.assertTrue(module_name in sys.modules)
+            self.assertEqual(self.mybbox.outputs.scaled.value, 6)
+        finally:
+            sys.path.remove(cachedir)
+            sys.modules.pop(module_name, None)
+            shutil.rmtree(cachedir)
 
 
 def test():
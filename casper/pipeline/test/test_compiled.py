@@ -0,0 +1,108 @@
+#! /usr/bin/env python
+##########################################################################
+# CASPER - Copyright (C) AGrigis, 2013
+# Distributed under the terms of the CeCILL-B license, as published by
+# the CEA-CNRS-INRIA. Refer to the LICENSE file or to
+# http://www.cecill.info/licences/Licence_CeCILL-B_V1-en.html
+# for details.
+##########################################################################
+
+# System import
+import unittest
+import os
+import shutil
+import tempfile
+
+# Casper import
+from casper.pipeline.compiled import CompiledCache
+from casper.pipeline.compiled import PrototypeRegistry
+
+
+class TestCompiledCache(unittest.TestCase):
+    """ Test the cache of parsed descriptions.
+    """
+    def setUp(self):
+        """ Create a source file.
+        """
+        self.cachedir = tempfile.mkdtemp()
+        self.source = os.path.join(self.cachedir, "source.xml")
+        with open(self.source, "w") as open_file:
+            open_file.write("source")
+        self.parsed = []
+
+    def tearDown(self):
+        """ Remove the cache directory.
+        """
+        shutil.rmtree(self.cachedir)
+
+    def parse(self, value):
+        """ Record the parsed descriptions.
+        """
+        self.parsed.append(value)
+        return {"value": value}
+
+    def test_get(self):
+        """ Method to test the cached descriptions.
+        """
+        # Test the descriptions are kept in memory without cache directory
+        compiled = CompiledCache("desc.xml")
+        self.assertEqual(compiled.get("key", self.source, self.parse, 1),
+                         {"value": 1})
+        self.assertEqual(compiled.get("key", self.source, self.parse, 2),
+                         {"value": 1})
+        self.assertEqual(compiled.get("key", "_bad_", self.parse, 3),
+                         {"value": 3})
+        self.assertEqual(self.parsed, [1, 3])
+        self.assertEqual((compiled.hits, compiled.misses), (1, 1))
+        compiled.save()
+        self.assertEqual(compiled.path, None)
+
+        # Test the descriptions are restored from the cache directory
+        compiled = CompiledCache("desc.xml", self.cachedir)
+        compiled.get("key", self.source, self.parse, 4)
+        compiled.save()
+        compiled = CompiledCache("desc.xml", self.cachedir)
+        self.assertEqual(compiled.get("key", self.source, self.parse, 5),
+                         {"value": 4})
+        self.assertEqual(self.parsed, [1, 3, 4])
+
+        # Test a modified source is parsed again
+        with open(self.source, "w") as open_file:
+            open_file.write("modified source")
+        compiled = CompiledCache("desc.xml", self.cachedir)
+        self.assertEqual(compiled.get("key", self.source, self.parse, 6),
+                         {"value": 6})
+        self.assertEqual(compiled.misses, 1)
+
+    def test_registry(self):
+        """ Method to test the registered prototypes.
+        """
+        # Test the prototypes are found while their source is unchanged
+        registry = PrototypeRegistry()
+        prototype = object()
+        self.assertEqual(registry.find("func", self.source), None)
+        registry.register("func", self.source, prototype)
+        registry.register("bad", "_bad_", prototype)
+        self.assertEqual(len(registry), 1)
+        self.assertTrue(registry.find("func", self.source) is prototype)
+        self.assertEqual(registry.find("func", "_bad_"), None)
+        self.assertEqual((registry.hits, registry.misses), (1, 2))
+
+        # Test a modified source invalidates the prototype
+        with open(self.source, "w") as open_file:
+            open_file.write("modified source")
+        self.assertEqual(registry.find("func", self.source), None)
+        registry.clear()
+        self.assertEqual(len(registry), 0)
+
+
+def test():
+    """ Function to execute unitests.
+    """
+    suite = unittest.TestLoader().loadTestsFromTestCase(TestCompiledCache)
+    runtime = unittest.TextTestRunner(verbosity=2).run(suite)
+    return runtime.wasSuccessful()
+
+
+if __name__ == "__main__":
+    test()
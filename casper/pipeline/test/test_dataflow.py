@@ -0,0 +1,142 @@
+#! /usr/bin/env python
+##########################################################################
+# CASPER - Copyright (C) AGrigis, 2013
+# Distributed under the terms of the CeCILL-B license, as published by
+# the CEA-CNRS-INRIA. Refer to the LICENSE file or to
+# http://www.cecill.info/licences/Licence_CeCILL-B_V1-en.html
+# for details.
+##########################################################################
+
+# System import
+import unittest
+import os
+import copy
+import warnings
+
+# Casper import
+from casper.lib.controls import controls
+from casper.pipeline import Pbox
+from casper.pipeline.dataflow import Dataflow
+
+
+class TestDataflow(unittest.TestCase):
+    """ Test the batch propagation of the control values.
+    """
+    def setUp(self):
+        """ Create a chain of list controls with a fan-in.
+        """
+        self.controls = [controls["List"](content="Int") for index in range(4)]
+        self.dataflow = Dataflow()
+        self.dataflow.add_link(self.controls[0], self.controls[1])
+        self.dataflow.add_link(self.controls[1], self.controls[2])
+        self.dataflow.add_link(self.controls[3], self.controls[2])
+        self.validations = []
+        for control in self.controls:
+            control._is_valid = self.counter(control._is_valid)
+
+    def counter(self, is_valid):
+        """ Record the validations of a control.
+        """
+        def decorated_is_valid(value):
+            self.validations.append(value)
+            return is_valid(value)
+        return decorated_is_valid
+
+    def test_update(self):
+        """ Method to test the batch updates.
+        """
+        # Test a single set propagates through the observers
+        self.controls[0].value = [1]
+        self.assertEqual([control.value for control in self.controls],
+                         [[1], [1], [1], None])
+        self.assertEqual(self.dataflow.nb_of_links, 3)
+
+        # Test each destination is validated once: the fan-in destination
+        # gets the value of its source that comes last in the link order and
+        # the destinations of the same type as their source are trusted
+        self.validations = []
+        signals = []
+        self.controls[2].add_observer("value", signals.append)
+        self.dataflow.update([(self.controls[0], [2]),
+                              (self.controls[3], [3])])
+        self.assertEqual([control.value for control in self.controls],
+                         [[2], [2], [2], [3]])
+        self.assertEqual(self.validations, [[2], [3]])
+        self.assertEqual([signal.value for signal in signals], [[2]])
+
+        # Test an invalid value is not propagated
+        with warnings.catch_warnings(record=True) as records:
+            warnings.simplefilter("always")
+            self.dataflow.update([(self.controls[0], ["bad"])])
+        self.assertEqual(len(records), 1)
+        self.assertEqual(self.controls[1].value, [2])
+
+        # Test the controls that are not linked are set
+        control = controls["Int"]()
+        self.dataflow.update([(control, 1)])
+        self.assertEqual(control.value, 1)
+
+    def test_untrusted_link(self):
+        """ Method to test the destinations of another type are validated.
+        """
+        control = controls["List"](content="Float")
+        self.dataflow.add_link(self.controls[2], control)
+        with warnings.catch_warnings(record=True) as records:
+            warnings.simplefilter("always")
+            self.dataflow.update([(self.controls[0], [1])])
+        self.assertEqual(len(records), 1)
+        self.assertEqual(self.controls[2].value, [1])
+        self.assertEqual(control.value, None)
+
+    def test_copy(self):
+        """ Method to test the copied tables update the copied controls.
+        """
+        dataflow, linked_controls = copy.deepcopy(
+            (self.dataflow, self.controls))
+        dataflow.update([(linked_controls[0], [4])])
+        self.assertEqual(linked_controls[2].value, [4])
+        self.assertEqual(self.controls[2].value, None)
+
+    def test_cycle(self):
+        """ Method to test the cycles are detected.
+        """
+        self.dataflow.add_link(self.controls[2], self.controls[0])
+        self.assertRaises(ValueError, self.dataflow.update,
+                          [(self.controls[0], [1])])
+
+    def test_pbox_dataflow(self):
+        """ Method to test the links of the inner pipelines are merged.
+        """
+        pbox = Pbox("casper.demo.xml_pipeline.xml")
+        self.assertEqual(pbox._dataflow.nb_of_links, 4)
+        myfile = os.path.abspath(__file__)
+        pbox.update_controls([(pbox._boxes["p1"].outputs.string, myfile)])
+        self.assertEqual(
+            pbox._boxes["p2"]._boxes["p1"].inputs.fname.value, myfile)
+
+    def test_pbox_batch(self):
+        """ Method to test the transactions on the pipeline inputs go through
+        the dataflow table.
+        """
+        pbox = Pbox("casper.demo.xml_pipeline.xml")
+        signals = []
+        inner_control = pbox._boxes["p1"].inputs.directory
+        inner_control.add_observer("value", signals.append)
+        mydir = os.path.dirname(os.path.abspath(__file__))
+        with pbox.inputs.batch():
+            pbox.inputs.pdirectory = os.path.dirname(mydir)
+            pbox.inputs.pdirectory = mydir
+        self.assertEqual(inner_control.value, mydir)
+        self.assertEqual([signal.value for signal in signals], [mydir])
+
+
+def test():
+    """ Function to execute unitests.
+    """
+    suite = unittest.TestLoader().loadTestsFromTestCase(TestDataflow)
+    runtime = unittest.TextTestRunner(verbosity=2).run(suite)
+    return runtime.wasSuccessful()
+
+
+if __name__ == "__main__":
+    test()
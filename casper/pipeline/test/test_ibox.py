@@ -10,12 +10,21 @@
 # System import
 import unittest
 import os
+import gc
+import weakref
 import numpy
+try:
+    import tracemalloc
+except ImportError:
+    tracemalloc = None
 
 # Casper import
 from casper.pipeline import Bbox
 from casper.pipeline import Pbox
 from casper.pipeline import Ibox
+from casper.pipeline.ibox import BboxIteration
+from casper.pipeline.ibox import InnerBox
+from casper.pipeline.ibox import PboxIteration
 from casper.lib.controls import List
 
 
@@ -34,6 +43,11 @@ class TestIBox(unittest.TestCase):
         self.mypyramiddesc = "casper.demo.pyramid_pipeline.xml"
         self.myswitchdesc = "casper.demo.switch_pipeline.xml"
         self.myiterativedesc = "casper.demo.iterative_pipeline.xml"
+        self.mylineardesc = "casper.demo.linear_2_pipeline.xml"
+        self.myreducedesc = "casper.demo.reduce_pipeline.xml"
+        self.mysweepdesc = "casper.demo.sweep_pipeline.xml"
+        self.mysumdesc = "casper.demo.sum_pipeline.xml"
+        self.myscale = "casper.demo.module.array_scale"
         self.myfile = os.path.abspath(__file__)
         self.mydir = os.path.dirname(self.myfile)
 
@@ -93,6 +107,123 @@ class TestIBox(unittest.TestCase):
         self.assertEqual(returncode["myibox0"]["outputs"]["string"],
                          "-".join([repr(self.myfile), repr(self.mydir)]))
 
+    def test_itergraphs(self):
+        """ Method to test the lightweight bbox iterations.
+        """
+        # Create the box
+        box = Bbox(self.myfuncdesc)
+        myibox = Ibox(box, iterinputs=["fname"], iteroutputs=["string"])
+        myibox.inputs.directory = self.mydir
+        myinit = os.path.join(self.mydir, "test_bbox.py")
+        myibox.inputs.iterfname = [self.myfile, myinit]
+
+        # Test the iterations are built when used
+        itergraphs = myibox.itergraphs("myibox")
+        self.assertEqual(sorted(itergraphs.keys()), ["myibox&0", "myibox&1"])
+        iterbox = itergraphs["myibox&1"][1]
+        self.assertTrue(isinstance(iterbox, BboxIteration))
+        self.assertEqual(iterbox.values, {"fname": myinit})
+        self.assertEqual(iterbox.desc, self.myfuncdesc)
+        self.assertEqual(iterbox._box, None)
+        self.assertEqual(iterbox.inputs.fname.value, myinit)
+        self.assertEqual(iterbox.inputs.directory.value, self.mydir)
+        self.assertTrue(iterbox._box is not None)
+        self.assertTrue(iterbox._box._func is box._func)
+        self.assertFalse(iterbox.inputs.fname is box.inputs.fname)
+        self.assertEqual(box.inputs.fname.value, None)
+
+        # Test the iteration execution
+        returncode = iterbox("myibox&1")
+        self.assertEqual(returncode["myibox&1"]["outputs"]["string"],
+                         "-".join([repr(myinit), repr(self.mydir)]))
+        self.assertEqual(box.outputs.string.value, None)
+
+    def test_pbox_itergraphs(self):
+        """ Method to test the pbox iterations expanded from a template.
+        """
+        # Create the box
+        box = Pbox(self.mylineardesc)
+        myibox = Ibox(box, iterinputs=["inp"], iteroutputs=["outp"])
+        myibox.inputs.iterinp = ["a", "b"]
+
+        # Test the iteration graphs are relabelled copies of the template
+        itergraphs = myibox.itergraphs("myibox")
+        self.assertEqual(sorted(itergraphs.keys()), ["myibox&0", "myibox&1"])
+        itergraph, iterbox = itergraphs["myibox&1"]
+        self.assertTrue(isinstance(iterbox, PboxIteration))
+        self.assertEqual(sorted(itergraph._nodes.keys()),
+                         ["myibox&1.c1.c1", "myibox&1.c1.c2"])
+        self.assertEqual(itergraph._links,
+                         [("myibox&1.c1.c1", "myibox&1.c1.c2")])
+        node = itergraph.find_node("myibox&1.c1.c1")
+        self.assertTrue(isinstance(node.meta, InnerBox))
+
+        # Test the pbox is copied when an inner box is used
+        self.assertEqual(iterbox._box, None)
+        self.assertEqual(node.meta.inputs.inp.value, "b")
+        self.assertTrue(iterbox._box is not None)
+        self.assertFalse(iterbox._box is box)
+        self.assertEqual(box._boxes["c1"]._boxes["c1"].inputs.inp.value,
+                         None)
+        node.meta.outputs.outp = "b"
+        self.assertEqual(iterbox.outputs.outp.value, None)
+        inner_box = itergraph.find_node("myibox&1.c1.c2").meta
+        self.assertEqual(inner_box.inputs.inp.value, "b")
+        inner_box.outputs.outp = "b"
+        self.assertEqual(iterbox.outputs.outp.value, "b")
+
+    def test_switch_itergraphs(self):
+        """ Method to test the pbox iterations over a switch value.
+        """
+        # Create the box
+        box = Pbox(self.myswitchdesc)
+        myibox = Ibox(box, iterinputs=["inp", "bas"], iteroutputs=["outp"])
+        myibox.inputs.iterinp = ["a", "b", "c"]
+        myibox.inputs.iterbas = ["hiver", "ete", "hiver"]
+        self.assertEqual(myibox.iterswitches, ["bas"])
+
+        # Test each iteration runs the selected switch path
+        for iterations in (None, [1], [0, 2]):
+            itergraphs = myibox.itergraphs("s", iterations=iterations)
+            for itername, (itergraph, iterbox) in itergraphs.items():
+                node_names = [node_name[len(itername) + 1:]
+                              for node_name in itergraph._nodes]
+                is_ete = (iterbox.values["bas"] == "ete")
+                self.assertEqual("short" in node_names, is_ete)
+                self.assertEqual("pantalon" in node_names, not is_ete)
+                self.assertEqual("ceinture" in node_names, not is_ete)
+        self.assertEqual(sorted(myibox._templates), [("ete", ), ("hiver", )])
+        self.assertTrue(box._boxes["pantalon"].active)
+        self.assertFalse(box._boxes["short"].active)
+
+    def test_released_iterations(self):
+        """ Method to test the pbox iterations are released as soon as they
+        are no more referenced.
+        """
+        # Create the box
+        box = Pbox(self.myswitchdesc)
+        myibox = Ibox(box, iterinputs=["inp"], iteroutputs=["outp"])
+        myibox.inputs.iterinp = [str(index) for index in range(100)]
+
+        # Test the iteration copies are released without garbage collection
+        # once their graph nodes are removed, as done by the scheduler
+        itergraphs = myibox.itergraphs("s")
+        copies = []
+        gc.disable()
+        try:
+            while itergraphs:
+                itergraph, iterbox = itergraphs.popitem()[1]
+                iterbox.inputs.bas = "ete"
+                copies.append(weakref.ref(iterbox._box))
+                self.assertFalse(iterbox._box._boxes["pantalon"].active)
+                for node_name in list(itergraph._nodes):
+                    itergraph.remove_node(node_name)
+            del itergraph, iterbox
+            self.assertEqual([copy() for copy in copies], [None] * 100)
+        finally:
+            gc.enable()
+        self.assertTrue(box._boxes["pantalon"].active)
+
     def test_xml_ibox(self):
         """ Method to test if a pbox can contain an ibox.
         """
@@ -121,6 +252,197 @@ class TestIBox(unittest.TestCase):
             pview.show()
             app.exec_()
 
+    def test_reduced_ibox(self):
+        """ Method to test the reduced outputs of an ibox.
+        """
+        # Return to new line
+        print
+
+        # Create the box
+        self.mypbox = Pbox(self.myreducedesc)
+        self.assertEqual(self.mypbox._boxes["scale"].reducers,
+                         {"scaled": "sum"})
+        self.assertEqual(self.mypbox._boxes["scale"].iteroutputs, [])
+        self.mypbox.inputs.size = 3
+        self.mypbox.inputs.factors = [1., 2., 3.]
+
+        # Test execution: the returncodes of the reduced iterations are not
+        # kept
+        returncode = self.mypbox(cpus=2)
+        self.assertEqual(
+            sorted(Pbox.split_name(name)[1] for name in returncode),
+            ["create"])
+        self.assertEqual(self.mypbox.outputs.outp.value.tolist(),
+                         [0., 6., 12.])
+        self.assertEqual(self.mypbox.outputs.stacked.value.tolist(),
+                         [[0., 1., 2.], [0., 2., 4.], [0., 3., 6.]])
+
+    def test_itermodes(self):
+        """ Method to test the zip and product iteration modes.
+        """
+        # Return to new line
+        print
+
+        # Test raises
+        box = Bbox(self.myscale)
+        self.assertRaises(ValueError, Ibox, box, ["array", "factor"],
+                          ["scaled"], itermode="cartesian")
+
+        # Test the zipped iterations
+        myibox = Ibox(box, ["array", "factor"], ["scaled"])
+        myibox.inputs.iterarray = ["a", "b"]
+        myibox.inputs.iterfactor = [1., 2., 3.]
+        self.assertEqual(myibox.get_nb_of_iterations(), None)
+        self.assertEqual(myibox.itergraphs("myibox"), {})
+        myibox.inputs.iterfactor = [1., 2.]
+        self.assertEqual(myibox.get_nb_of_iterations(), 2)
+        self.assertEqual(myibox.iteration_values(1),
+                         {"array": "b", "factor": 2.})
+
+        # Test the product iterations are generated from their index
+        myibox = Ibox(box, ["array", "factor"], ["scaled"],
+                      itermode="product")
+        self.assertEqual(myibox.get_nb_of_iterations(), None)
+        myibox.inputs.iterarray = ["a", "b"]
+        myibox.inputs.iterfactor = [1., 2., 3.]
+        self.assertEqual(myibox.get_nb_of_iterations(), 6)
+        self.assertEqual(
+            [myibox.iteration_values(index) for index in range(6)],
+            [{"array": array, "factor": factor}
+             for array in ("a", "b") for factor in (1., 2., 3.)])
+        itergraphs = myibox.itergraphs("myibox")
+        self.assertEqual(len(itergraphs), 6)
+        self.assertEqual(itergraphs["myibox&4"][1].values,
+                         {"array": "b", "factor": 2.})
+
+        # Test execution
+        self.mypbox = Pbox(self.mysweepdesc)
+        self.assertEqual(self.mypbox._boxes["scale"].itermode, "product")
+        self.mypbox.inputs.arrays = [numpy.ones(2), numpy.arange(2.)]
+        self.mypbox.inputs.factors = [1., 2., 3.]
+        self.mypbox(cpus=2)
+        self.assertEqual(
+            [item.tolist() for item in self.mypbox.outputs.outp.value],
+            [[1., 1.], [2., 2.], [3., 3.], [0., 1.], [0., 2.], [0., 3.]])
+
+    def test_iteration_window(self):
+        """ Method to test the bounded expansion of the iterations.
+        """
+        # Return to new line
+        print
+
+        # Record the number of expanded and not completed iterations
+        expanded = {}
+
+        class WindowPbox(Pbox):
+            def _add_itergraphs(self, graph, box_name, itergraphs, iter_map,
+                                box_map, nb_of_iterations=None):
+                Pbox._add_itergraphs(self, graph, box_name, itergraphs,
+                                     iter_map, box_map, nb_of_iterations)
+                expanded[box_name] = max(
+                    expanded.get(box_name, 0), len(iter_map[box_name]))
+
+        # Test raises
+        self.mypbox = WindowPbox(self.myreducedesc)
+        self.assertRaises(ValueError, self.mypbox, iteration_window=0)
+
+        # Test execution
+        self.mypbox.inputs.size = 3
+        self.mypbox.inputs.factors = [float(item) for item in range(10)]
+        self.mypbox(cpus=2, iteration_window=2)
+        self.assertEqual(expanded, {"scale": 2, "stack": 2})
+        self.assertEqual(self.mypbox.outputs.outp.value.tolist(),
+                         [0., 45., 90.])
+        self.assertEqual(self.mypbox.outputs.stacked.value[:, 1].tolist(),
+                         self.mypbox.inputs.factors.value)
+
+        # Test the streamed iterations are expanded with their upstream
+        # iterations
+        expanded.clear()
+        self.mypbox = WindowPbox(self.myiterativedesc)
+        self.mypbox.inputs.inp = "str"
+        self.mypbox(streaming=True, iteration_window=1)
+        self.assertEqual(expanded, {"chaussettes": 1, "chaussures": 1})
+        self.assertEqual(self.mypbox.outputs.outp.value, "str0str1")
+
+    @unittest.skipIf(tracemalloc is None, "requires tracemalloc")
+    def test_iteration_window_memory(self):
+        """ Method to test the master memory does not depend on the number
+        of iterations when an iteration window is used.
+        """
+        # Return to new line
+        print()
+
+        # Measure the peak memory allocated by the master
+        def peak(nb_of_iterations):
+            self.mypbox = Pbox(self.mysumdesc)
+            self.mypbox.inputs.size = 3
+            self.mypbox.inputs.factors = [
+                float(item) for item in range(nb_of_iterations)]
+            gc.collect()
+            tracemalloc.start()
+            try:
+                self.mypbox(iteration_window=4)
+                return tracemalloc.get_traced_memory()[1]
+            finally:
+                tracemalloc.stop()
+
+        # Test the peak memory stays flat
+        peak(10)
+        small_peak = peak(50)
+        large_peak = peak(400)
+        self.assertEqual(self.mypbox.outputs.outp.value.tolist(),
+                         [0., 79800., 159600.])
+        self.assertTrue(large_peak < 1.5 * small_peak)
+
+    def test_streaming_ibox(self):
+        """ Method to test if chained iboxes can stream their iterations.
+        """
+        # Return to new line
+        print
+
+        # Create the box
+        self.mypbox = Pbox(self.myiterativedesc)
+        self.mypbox.inputs.inp = "str"
+
+        # Test the downstream ibox is expanded with the upstream ibox and
+        # that its iterations wait for the upstream iterations only
+        links = self.mypbox._box_links(self.mypbox)
+        self.assertEqual(links[("chaussettes", "chaussures")],
+                         [("iteroutp", "iterinp")])
+        graph, _, _ = self.mypbox._create_graph(
+            self.mypbox, filter_inactive=True)
+        iter_map = {}
+        box_map = {}
+        self.assertEqual(self.mypbox._update_graph(
+            graph, iter_map, box_map, links=links), ["slip"])
+        graph.remove_node("slip")
+        self.mypbox._boxes["slip"].outputs.listoutp = ["a", "b"]
+        self.assertEqual(sorted(self.mypbox._update_graph(
+            graph, iter_map, box_map, links=links)),
+            ["chaussettes&0", "chaussettes&1"])
+        self.assertEqual(
+            sorted(iter_map.keys()), ["chaussettes", "chaussures"])
+        self.assertFalse("pantalon" in iter_map)
+
+        # Test the streamed iterations are not built until they are used
+        for box_name in ("chaussettes", "chaussures"):
+            for iteration in (0, 1):
+                self.assertTrue(box_map[box_name][iteration]._box is None)
+        box_map["chaussettes"][0].outputs.outp = "a"
+        self.assertTrue(box_map["chaussures"][0]._box is None)
+        self.assertEqual(box_map["chaussures"][0].values, {"inp": "a"})
+        graph.remove_node("chaussettes&0")
+        self.assertEqual(self.mypbox._update_graph(
+            graph, iter_map, box_map, links=links), ["chaussures&0.c1.c1"])
+        self.assertEqual(
+            box_map["chaussures"][0].inputs.inp.value, "a")
+        self.assertEqual(box_map["chaussures"][1].inputs.inp.value, None)
+
+        # Test execution
+        self.mypbox(streaming=True)
+        self.assertEqual(self.mypbox.outputs.outp.value, "str0str1")
+
 
 def test():
     """ Function to execute unitests.
@@ -10,9 +10,13 @@
 # System import
 import unittest
 import os
+import tempfile
+import shutil
+import numpy
 
 # Casper import
 from casper.pipeline import Pbox
+from casper.pipeline.compiled import CompiledCache
 
 
 class TestPBox(unittest.TestCase):
@@ -30,6 +34,7 @@ class TestPBox(unittest.TestCase):
         self.mypyramiddesc = "casper.demo.pyramid_pipeline.xml"
         self.myswitchdesc = "casper.demo.switch_pipeline.xml"
         self.myiterativedesc = "casper.demo.iterative_pipeline.xml"
+        self.myarraydesc = "casper.demo.array_pipeline.xml"
         self.myfile = os.path.abspath(__file__)
         self.mydir = os.path.dirname(self.myfile)
         self.mylinks = ["fname->p1.fname", "pdirectory->p1.directory",
@@ -86,6 +91,168 @@ class TestPBox(unittest.TestCase):
         self.assertEqual(self.mypbox.outputs.outp2.value, "my_value_2")
         self.assertEqual(self.mypbox.outputs.outp3.value, "my_value_1")
 
+    def test_pbox_priority_execution(self):
+        """ Method to test if a pbox can be executed using a critical path
+        strategy.
+        """
+        # Return to new line
+        print()
+
+        # Create the box
+        self.mypbox = Pbox(self.myclothingdesc)
+        self.assertRaises(ValueError, self.mypbox, schedule="bad")
+
+        # Test the priorities
+        self.mypbox.durations["chaussettes"] = (10., 1)
+        exec_graph, _, _ = self.mypbox._create_graph(
+            self.mypbox, filter_inactive=True)
+        priorities = {}
+        self.assertEqual(self.mypbox._box_priority(
+            exec_graph, "chaussettes", priorities, 1.), 11.)
+        self.assertEqual(self.mypbox._box_priority(
+            exec_graph, "slip", priorities, 1.), 4.)
+        self.assertEqual(self.mypbox._box_priority(
+            exec_graph, "chemise", priorities, 1.), 4.)
+
+        # Test execution: the ready boxes are dispatched by decreasing
+        # priority and not in name order
+        self.mypbox.durations["slip"] = (10., 1)
+        self.mypbox.inputs.inp1 = "my_value_1"
+        self.mypbox.inputs.inp2 = "my_value_2"
+        self.mypbox.inputs.inp3 = "my_value_1"
+        returncode = self.mypbox(schedule="critical_path")
+        dispatched = [
+            Pbox.split_name(process_name)[1] for process_name in sorted(
+                returncode, key=lambda name: Pbox.split_name(name)[0])]
+        self.assertEqual(dispatched[:3], ["slip", "chaussettes", "chemise"])
+        self.assertEqual(self.mypbox.outputs.outp1.value, "my_value_2")
+        self.assertEqual(self.mypbox.outputs.outp2.value, "my_value_2")
+        self.assertEqual(self.mypbox.durations["chaussettes"][1], 2)
+        self.assertEqual(self.mypbox.durations["slip"][1], 2)
+
+    def test_pbox_cached_execution(self):
+        """ Method to test if a pbox can be executed using the
+        smart-caching.
+        """
+        # Return to new line
+        print()
+
+        # Create the box
+        self.mypbox = Pbox(self.myclothingdesc)
+        self.mypbox.inputs.inp1 = "my_value_1"
+        self.mypbox.inputs.inp2 = "my_value_2"
+        self.mypbox.inputs.inp3 = "my_value_1"
+
+        # Test execution: the second execution is restored from the cache
+        cachedir = tempfile.mkdtemp()
+        try:
+            returncode = self.mypbox(cachedir=cachedir)
+            self.assertEqual(len(returncode), 8)
+            self.assertTrue(any(
+                "cached" not in item for item in returncode.values()))
+            self.mypbox._boxes["veste"].outputs.outp = None
+            returncode = self.mypbox(cachedir=cachedir)
+            self.assertEqual(len(returncode), 8)
+            self.assertTrue(all(
+                item["cached"] for item in returncode.values()))
+            self.assertEqual(self.mypbox.outputs.outp2.value, "my_value_2")
+            self.mypbox.inputs.inp3 = "my_value_3"
+            returncode = self.mypbox(cachedir=cachedir)
+            executed_box_names = [
+                Pbox.split_name(name)[1] for name, item in returncode.items()
+                if "cached" not in item]
+            self.assertTrue("chaussettes" in executed_box_names)
+            self.assertFalse("slip" in executed_box_names)
+        finally:
+            shutil.rmtree(cachedir)
+
+    def test_pbox_shared_execution(self):
+        """ Method to test if a pbox can exchange numpy arrays through
+        shared files.
+        """
+        # Return to new line
+        print()
+
+        # Create the box
+        self.mypbox = Pbox(self.myarraydesc)
+        self.mypbox.inputs.size = 1000
+
+        # Test execution: the arrays are attached to shared files that are
+        # removed at the end of the execution
+        returncode = self.mypbox(cpus=2, share_arrays=1)
+        self.assertEqual(len(returncode), 3)
+        self.assertEqual(self.mypbox.shared, None)
+        self.assertTrue(isinstance(
+            self.mypbox.outputs.outp1.value, numpy.memmap))
+        self.assertEqual(self.mypbox.outputs.outp1.value.tolist(),
+                         (numpy.arange(1000) * 2.).tolist())
+        self.assertEqual(self.mypbox.outputs.outp2.value.tolist(),
+                         (numpy.arange(1000) * 2.).tolist())
+
+        # Test execution: the small arrays are copied
+        self.mypbox(cpus=2, share_arrays=1 << 20)
+        self.assertFalse(isinstance(
+            self.mypbox.outputs.outp1.value, numpy.memmap))
+        self.assertEqual(self.mypbox.outputs.outp1.value.tolist(),
+                         (numpy.arange(1000) * 2.).tolist())
+
+    def test_pbox_chunked_execution(self):
+        """ Method to test if the iterations of an ibox can be executed
+        in chunks.
+        """
+        # Return to new line
+        print()
+
+        # Create the box
+        self.mypbox = Pbox(self.myiterativedesc)
+        self.mypbox.inputs.inp = "str"
+
+        # Test the chunk size definition
+        self.mypbox._add_box({
+            "name": ["chunked"], "module": [self.mycloth],
+            "iterinput": [{"name": "inp", "chunksize": "3"}]})
+        self.assertEqual(self.mypbox._boxes["chunked"].chunksize, 3)
+        self.mypbox._add_box({
+            "name": ["autochunked"], "module": [self.mycloth],
+            "iterinput": [{"name": "inp"}], "chunksize": ["auto"]})
+        self.assertEqual(self.mypbox._boxes["autochunked"].chunksize, "auto")
+        self.assertRaises(ValueError, self.mypbox._add_box, {
+            "name": ["bad"], "module": [self.mycloth],
+            "iterinput": [{"name": "inp", "chunksize": "0"}]})
+        self.assertRaises(ValueError, self.mypbox._add_box, {
+            "name": ["bad"], "module": [self.mycloth], "chunksize": ["2"]})
+        del self.mypbox._boxes["chunked"]
+        del self.mypbox._boxes["autochunked"]
+
+        # Test the grouping of the ready iterations
+        ibox = self.mypbox._boxes["chaussettes"]
+        graph, _, _ = self.mypbox._create_graph(
+            self.mypbox, filter_inactive=True)
+        box_names = ["chaussettes&0", "slip", "chaussettes&1"]
+        self.assertEqual(self.mypbox._chunk_boxes(graph, box_names, 1),
+                         [["chaussettes&0"], ["slip"], ["chaussettes&1"]])
+        ibox.chunksize = 2
+        self.assertEqual(self.mypbox._chunk_boxes(graph, box_names, 1),
+                         [["chaussettes&0", "chaussettes&1"], ["slip"]])
+        ibox.chunksize = "auto"
+        self.assertEqual(len(self.mypbox._chunk_boxes(graph, box_names, 1)),
+                         3)
+        self.mypbox.durations["chaussettes"] = (0.01, 1)
+        self.assertEqual(len(self.mypbox._chunk_boxes(graph, box_names, 1)),
+                         2)
+        self.assertEqual(len(self.mypbox._chunk_boxes(graph, box_names, 2)),
+                         3)
+
+        # Test execution: the chunked iterations are executed by the same
+        # worker and keep their own returncodes
+        ibox.chunksize = 2
+        returncode = self.mypbox(cpus=2)
+        self.assertEqual(self.mypbox.outputs.outp.value, "str0str1")
+        workers = [item["worker"] for name, item in returncode.items()
+                   if Pbox.split_name(name)[3] == "chaussettes"]
+        self.assertEqual(len(workers), 2)
+        self.assertEqual(workers[0], workers[1])
+
     def test_xml_pbox(self):
         """ Method to test if a pbox can contain a pbox.
         """
@@ -111,6 +278,35 @@ class TestPBox(unittest.TestCase):
         self.assertEqual(self.mypbox.inputs.pdirectory.value,
                          self.mypbox._boxes["p1"].inputs.directory.value)
 
+    def test_compiled_xml_pbox(self):
+        """ Method to test if a pbox can be created from the parsed
+        descriptions stored on disk.
+        """
+        # Return to new line
+        print()
+
+        # Test the cold and warm creations
+        cachedir = tempfile.mkdtemp()
+        try:
+            self.mypbox = Pbox(self.mypipexmldesc,
+                               compiled_cachedir=cachedir)
+            self.assertEqual(len(os.listdir(cachedir)), 1)
+            compiled = CompiledCache(self.mypipexmldesc, cachedir)
+            mypbox = Pbox(self.mypipexmldesc, compiled=compiled)
+            self.assertEqual(compiled.misses, 0)
+            self.assertEqual(compiled.hits, 5)
+            self.assertEqual(mypbox.proto, self.mypbox.proto)
+            self.assertEqual(mypbox._links, self.mypbox._links)
+            self.assertEqual(mypbox._boxes["p1"].proto,
+                             self.mypbox._boxes["p1"].proto)
+            self.assertEqual(mypbox._boxes["p1"].__doc__,
+                             self.mypbox._boxes["p1"].__doc__)
+            mypbox._boxes["p1"].outputs.string = self.myfile
+            self.assertEqual(mypbox._boxes["p2"].inputs.fname.value,
+                             self.myfile)
+        finally:
+            shutil.rmtree(cachedir)
+
     def test_xml_pbox_execution(self):
         """ Method to test if a pbox containing a pbox can be properly
         executed.
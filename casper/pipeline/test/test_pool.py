@@ -0,0 +1,185 @@
+#! /usr/bin/env python
+##########################################################################
+# CASPER - Copyright (C) AGrigis, 2013
+# Distributed under the terms of the CeCILL-B license, as published by
+# the CEA-CNRS-INRIA. Refer to the LICENSE file or to
+# http://www.cecill.info/licences/Licence_CeCILL-B_V1-en.html
+# for details.
+##########################################################################
+
+# System import
+import unittest
+
+# Casper import
+from casper.pipeline import Pbox
+from casper.pipeline import WorkerPool
+from casper.pipeline.pool import BboxCache
+
+
+class TestWorkerPool(unittest.TestCase):
+    """ Test the persistent worker pool.
+    """
+
+    def setUp(self):
+        """ Initialize the TestWorkerPool class.
+        """
+        self.myfuncdesc = "casper.demo.module.a_function_to_wrap"
+        self.mycloth = "casper.demo.module.clothing"
+        self.myclothingdesc = "casper.demo.clothing_pipeline.xml"
+        self.myiterativedesc = "casper.demo.iterative_pipeline.xml"
+        self.myarraydesc = "casper.demo.array_pipeline.xml"
+        self.pool = WorkerPool(cpus=2)
+
+    def tearDown(self):
+        """ Stop the pool workers.
+        """
+        self.pool.shutdown()
+
+    def test_raises(self):
+        """ Method to test the raises.
+        """
+        self.assertRaises(ValueError, WorkerPool, 0)
+
+    def test_reuse(self):
+        """ Method to test if the workers survive between executions.
+        """
+        # Return to new line
+        print()
+
+        # Execute two pipelines with the same pool
+        pids = [process.pid for process in self.pool.workers]
+        mypbox = Pbox(self.myclothingdesc)
+        mypbox.inputs.inp1 = "my_value_1"
+        mypbox.inputs.inp2 = "my_value_2"
+        mypbox.inputs.inp3 = "my_value_1"
+        mypbox(pool=self.pool)
+        self.assertEqual(mypbox.outputs.outp1.value, "my_value_2")
+        self.assertEqual(mypbox.outputs.outp2.value, "my_value_2")
+        # With two workers 'chaussures' receives the value of the last
+        # completed of its two inputs
+        self.assertIn(mypbox.outputs.outp3.value, ["my_value_1", "my_value_2"])
+        mypbox = Pbox(self.myiterativedesc)
+        mypbox.pool = self.pool
+        mypbox.inputs.inp = "str"
+        mypbox()
+        self.assertEqual(mypbox.outputs.outp.value, "str0str1")
+        self.assertTrue(self.pool.is_alive())
+        self.assertEqual(
+            [process.pid for process in self.pool.workers], pids)
+
+    def test_bbox_cache(self):
+        """ Method to test the worker bbox cache.
+        """
+        # Test the LRU eviction
+        cache = BboxCache(size=1)
+        bbox = cache.get(self.mycloth)
+        bbox.inputs.inp = "toto"
+        bbox()
+        self.assertEqual(bbox.outputs.outp.value, "toto")
+        self.assertTrue(cache.get(self.mycloth) is bbox)
+        self.assertEqual(bbox.inputs.inp.value, None)
+        self.assertEqual(bbox.outputs.outp.value, None)
+        cache.get(self.myfuncdesc)
+        self.assertEqual(len(cache), 1)
+        self.assertFalse(cache.get(self.mycloth) is bbox)
+        self.assertEqual(cache.statistics(), {
+            "hits": 1, "misses": 3, "hit_rate": 0.25, "size": 1})
+
+        # Test the statistics returned by the workers
+        pool = WorkerPool(cpus=1)
+        for index in range(3):
+            pool.submit(str(index), self.mycloth, {"inp": str(index)})
+            returncode = pool.get()[str(index)]
+            self.assertEqual(returncode["outputs"]["outp"], str(index))
+            self.assertEqual(returncode["environ"], None)
+        self.assertEqual(returncode["bbox_cache"]["hits"], 2)
+        self.assertEqual(returncode["bbox_cache"]["misses"], 1)
+
+        # Test the environment capture
+        pool.submit("3", self.mycloth, {"inp": "3"}, ("whitelist", ["PATH"]))
+        returncode = pool.get()["3"]
+        self.assertEqual(list(returncode["environ"].keys()), ["PATH"])
+        baseline = {}
+        for index in range(4, 6):
+            pool.submit(str(index), self.mycloth, {"inp": str(index)},
+                        ("diff", baseline))
+            returncode = pool.get()[str(index)]
+            self.assertTrue("PATH" in returncode["environ"])
+            self.assertTrue(pool._environs[0] is baseline)
+        pool.submit("6", self.mycloth, {"inp": "6"})
+        returncode = pool.get()["6"]
+        self.assertEqual(returncode["environ"], None)
+        pool.shutdown()
+
+    def test_locality(self):
+        """ Method to test if the jobs are sent to the workers holding
+        their shared input arrays.
+        """
+        # Return to new line
+        print()
+
+        # Execute a pipeline: one scale box is executed by the worker that
+        # created the array, the other one maps the shared file
+        mypbox = Pbox(self.myarraydesc)
+        mypbox.inputs.size = 1000
+        returncode = mypbox(pool=self.pool, share_arrays=1)
+        workers = {}
+        for process_name, box_returncode in returncode.items():
+            box_name = Pbox.split_name(process_name)[1]
+            workers[box_name] = box_returncode["worker"]
+            self.assertTrue(
+                box_returncode["object_store"]["size"] in (1, 2))
+        hits = sorted([returncode[name]["object_store"]["hit_nbytes"]
+                       for name in returncode])
+        self.assertEqual(hits, [0, 0, 8000])
+        self.assertEqual(
+            sorted([workers["scale1"], workers["scale2"]]), [0, 1])
+        self.assertEqual(mypbox.outputs.outp1.value.tolist(),
+                         mypbox.outputs.outp2.value.tolist())
+        self.assertEqual(self.pool._loads, [0, 0])
+
+    def test_execution_error(self):
+        """ Method to test if the workers survive a failed execution.
+        """
+        # Return to new line
+        print()
+
+        # The ibox of the pipeline has no iteration
+        pids = [process.pid for process in self.pool.workers]
+        mypbox = Pbox(self.myiterativedesc)
+        self.assertRaises(ValueError, mypbox, pool=self.pool)
+        self.assertTrue(self.pool.is_alive())
+        self.assertEqual(
+            [process.pid for process in self.pool.workers], pids)
+        self.assertEqual(self.pool._loads, [0, 0])
+
+        # Test the pool can be reused
+        mypbox.inputs.inp = "str"
+        mypbox(pool=self.pool)
+        self.assertEqual(mypbox.outputs.outp.value, "str0str1")
+
+    def test_health_check(self):
+        """ Method to test if a dead worker is restarted.
+        """
+        self.assertFalse(self.pool.check())
+        self.pool.workers[0].terminate()
+        self.pool.workers[0].join()
+        self.assertFalse(self.pool.is_alive())
+        self.assertRaises(RuntimeError, self.pool.get)
+        self.assertTrue(self.pool.check())
+        self.assertTrue(self.pool.is_alive())
+        self.pool.shutdown()
+        self.assertFalse(self.pool.is_alive())
+        self.assertEqual(self.pool.workers, [])
+
+
+def test():
+    """ Function to execute unitests.
+    """
+    suite = unittest.TestLoader().loadTestsFromTestCase(TestWorkerPool)
+    runtime = unittest.TextTestRunner(verbosity=2).run(suite)
+    return runtime.wasSuccessful()
+
+
+if __name__ == "__main__":
+    test()
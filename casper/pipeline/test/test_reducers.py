@@ -0,0 +1,124 @@
+#! /usr/bin/env python
+##########################################################################
+# CASPER - Copyright (C) AGrigis, 2013
+# Distributed under the terms of the CeCILL-B license, as published by
+# the CEA-CNRS-INRIA. Refer to the LICENSE file or to
+# http://www.cecill.info/licences/Licence_CeCILL-B_V1-en.html
+# for details.
+##########################################################################
+
+# System import
+import unittest
+import numpy
+
+# Casper import
+from casper.pipeline import Bbox
+from casper.pipeline import Ibox
+from casper.pipeline.reducers import reducers
+
+
+class TestReducers(unittest.TestCase):
+    """ Test the iterative output reducers.
+    """
+
+    def setUp(self):
+        """ Initialize the TestReducers class.
+        """
+        self.mycloth = "casper.demo.module.clothing"
+        self.myscale = "casper.demo.module.array_scale"
+
+    def reduce(self, name, values, order=None):
+        """ Fold values in the given iteration order.
+        """
+        reducer = reducers[name](len(values), "outp")
+        for iteration in order or range(len(values)):
+            reducer.add(iteration, values[iteration])
+        return reducer.result()
+
+    def test_reducers(self):
+        """ Method to test the folded values.
+        """
+        # Test the scalar reducers
+        order = [2, 0, 3, 1]
+        self.assertEqual(self.reduce("list", [1, 2, 3, 4], order),
+                         [1, 2, 3, 4])
+        self.assertEqual(self.reduce("sum", [1, 2, 3, 4], order), 10)
+        self.assertEqual(self.reduce("mean", [1, 2, 3, 4], order), 2.5)
+        self.assertEqual(self.reduce("min", [3, 1, 4, 2], order), 1)
+        self.assertEqual(self.reduce("max", [3, 1, 4, 2], order), 4)
+        self.assertEqual(self.reduce("first_equal", ["a", "a"]), "a")
+        self.assertRaises(ValueError, self.reduce, "first_equal", ["a", "b"])
+
+        # Test the ordered concatenation
+        reducer = reducers["concat"](3)
+        reducer.add(2, ["e"])
+        reducer.add(1, ["c", "d"])
+        self.assertEqual(reducer.value, [])
+        self.assertEqual(sorted(reducer.pending.keys()), [1, 2])
+        reducer.add(0, ["a", "b"])
+        self.assertEqual(reducer.pending, {})
+        self.assertEqual(reducer.result(), ["a", "b", "c", "d", "e"])
+        self.assertEqual(self.reduce(
+            "concat", [numpy.zeros(2), numpy.ones(1)], [1, 0]).tolist(),
+            [0., 0., 1.])
+
+        # Test the array reducers
+        values = [numpy.arange(3) * factor for factor in (1, 2, 3)]
+        self.assertEqual(self.reduce("sum", values, [2, 0, 1]).tolist(),
+                         [0, 6, 12])
+        self.assertEqual(self.reduce("max", values[::-1]).tolist(),
+                         [0, 3, 6])
+        stacked = self.reduce("stack", values, [1, 2, 0])
+        self.assertEqual(stacked.shape, (3, 3))
+        self.assertEqual(stacked.tolist(), [item.tolist() for item in values])
+
+    def test_ibox_reducers(self):
+        """ Method to test the ibox reduced outputs.
+        """
+        # Test raises
+        box = Bbox(self.myscale)
+        self.assertRaises(ValueError, Ibox, box, ["factor"], [],
+                          reducers={"scaled": "median"})
+        self.assertRaises(ValueError, Ibox, box, ["factor"], ["scaled"],
+                          reducers={"scaled": "sum"})
+        self.assertRaises(ValueError, Ibox, box, ["factor"],
+                          reducers={"unknown": "sum"})
+
+        # Test the reduced output is folded as the iterations complete
+        myibox = Ibox(box, ["factor"], reducers={"scaled": "mean"})
+        self.assertEqual(myibox.outputs.controls, ["scaled"])
+        self.assertFalse(myibox.outputs.scaled is box.outputs.scaled)
+        iterboxes = []
+        for factor in (1., 3.):
+            iterbox = Bbox(self.myscale)
+            iterbox.outputs.scaled = numpy.ones(2) * factor
+            iterboxes.append(iterbox)
+        myibox.start_reduction(2)
+        myibox.reduce_iteration(1, iterboxes[1])
+        myibox.reduce_iteration(0, iterboxes[0])
+        self.assertEqual(myibox.outputs.scaled.value, None)
+        myibox.finish_reduction()
+        self.assertEqual(myibox.outputs.scaled.value.tolist(), [2., 2.])
+
+        # Test the standard outputs are still checked
+        box = Bbox(self.mycloth)
+        myibox = Ibox(box, ["inp"])
+        iterboxes = [Bbox(self.mycloth), Bbox(self.mycloth)]
+        iterboxes[0].outputs.outp = "a"
+        iterboxes[1].outputs.outp = "b"
+        self.assertRaises(ValueError, myibox.update_iteroutputs, iterboxes)
+        iterboxes[1].outputs.outp = "a"
+        myibox.update_iteroutputs(iterboxes)
+        self.assertEqual(myibox.outputs.outp.value, "a")
+
+
+def test():
+    """ Function to execute unitests.
+    """
+    suite = unittest.TestLoader().loadTestsFromTestCase(TestReducers)
+    runtime = unittest.TextTestRunner(verbosity=2).run(suite)
+    return runtime.wasSuccessful()
+
+
+if __name__ == "__main__":
+    test()
@@ -0,0 +1,96 @@
+#! /usr/bin/env python
+##########################################################################
+# CASPER - Copyright (C) AGrigis, 2013
+# Distributed under the terms of the CeCILL-B license, as published by
+# the CEA-CNRS-INRIA. Refer to the LICENSE file or to
+# http://www.cecill.info/licences/Licence_CeCILL-B_V1-en.html
+# for details.
+##########################################################################
+
+# System import
+import unittest
+import os
+import pickle
+import numpy
+
+# Casper import
+from casper.pipeline.shared import ArrayHandle
+from casper.pipeline.shared import SharedArrays
+
+
+class TestSharedArrays(unittest.TestCase):
+    """ Test the numpy arrays exchanged through shared files.
+    """
+    def setUp(self):
+        """ Initialize the TestSharedArrays class.
+        """
+        self.shared = SharedArrays(min_nbytes=80)
+
+    def tearDown(self):
+        """ Remove the shared files.
+        """
+        self.shared.close()
+
+    def test_share(self):
+        """ Method to test the sharing of arrays.
+        """
+        # Test the large arrays are replaced by handles
+        array = numpy.arange(20, dtype=float).reshape(4, 5)
+        small_array = numpy.arange(2)
+        value = {"a": [array, small_array], "b": (array, "string")}
+        shared_value = self.shared.share(value)
+        handle = shared_value["a"][0]
+        self.assertTrue(isinstance(handle, ArrayHandle))
+        self.assertTrue(shared_value["b"][0] is handle)
+        self.assertTrue(shared_value["a"][1] is small_array)
+        self.assertEqual(shared_value["b"][1], "string")
+        self.assertEqual(self.shared.nbytes, array.nbytes)
+        self.assertEqual(self.shared.handles(shared_value), [handle, handle])
+
+        # Test the handles are replaced by arrays without copying the files
+        shared_value = pickle.loads(pickle.dumps(shared_value))
+        attached_value = self.shared.attach(shared_value)
+        attached_array = attached_value["a"][0]
+        self.assertTrue(isinstance(attached_array, numpy.memmap))
+        self.assertEqual(attached_array.tolist(), array.tolist())
+        self.assertTrue(self.shared.share(attached_array).path, handle.path)
+        self.assertEqual(self.shared.nbytes, array.nbytes)
+
+        # Test the modifications are not written in the shared files
+        attached_array[0, 0] = 100
+        self.assertEqual(handle.attach()[0, 0], 0)
+
+    def test_release(self):
+        """ Method to test the release of the shared files.
+        """
+        array = numpy.ones(100)
+        other_handle = self.shared.share(array)
+        handle = self.shared.share(numpy.zeros(100))
+        attached_array = self.shared.attach(handle)
+        self.shared.release(handle.path)
+        self.assertIs(self.shared.share(array), other_handle)
+        self.assertFalse(os.path.isfile(handle.path))
+        self.assertEqual(attached_array.sum(), 0)
+        self.assertEqual(self.shared.released, [handle.path])
+
+        # Test the released arrays are removed from a worker store
+        store = {}
+        shared = SharedArrays(self.shared.directory, 1, store=store)
+        handle = shared.share(numpy.zeros(100))
+        self.assertEqual(list(store), [handle.path])
+        shared.prune(["unknown", handle.path])
+        self.assertEqual(store, {})
+        self.shared.close()
+        self.assertFalse(os.path.isdir(self.shared.directory))
+
+
+def test():
+    """ Function to execute unitests.
+    """
+    suite = unittest.TestLoader().loadTestsFromTestCase(TestSharedArrays)
+    runtime = unittest.TextTestRunner(verbosity=2).run(suite)
+    return runtime.wasSuccessful()
+
+
+if __name__ == "__main__":
+    test()
@@ -9,9 +9,16 @@
 
 # System import
 import unittest
+import os
+import glob
 
 # Casper import
+import casper.demo
+from casper.lib.controls import controls
+from casper.demo import module
+from casper.lib.base.xmltodict import xmltodict
 from casper.pipeline.utils import ControlObject
+from casper.pipeline.utils import capture_environ
 from casper.pipeline.utils import load_xml_description
 from casper.pipeline.utils import parse_docstring
 
@@ -27,6 +34,23 @@ class TestUtils(unittest.TestCase):
 
         # Test raise case
         self.assertRaises(IOError, load_xml_description, "")
+        xmlfiles = glob.glob(os.path.join(
+            os.path.dirname(casper.demo.__file__), "*.xml"))
+        self.assertRaises(ValueError, load_xml_description, xmlfiles[0],
+                          "bad")
+
+        # Test the backends load the same descriptions
+        for xmlfile in xmlfiles:
+            self.assertEqual(load_xml_description(xmlfile),
+                             load_xml_description(xmlfile, "minidom"))
+        xmlstring = ("<pipeline a=\"1\"><!-- c --><units b=\"2\"><unit>"
+                     "<name>n</name></unit><unit/></units><links> </links>"
+                     "<docstring> <?pi d?> text</docstring></pipeline>")
+        self.assertEqual(xmltodict(xmlstring), {
+            "units": [{"b": ["2"], "unit": [{"name": ["n"]}, {}]}],
+            "links": [{}], "docstring": [{}]})
+        self.assertEqual(xmltodict(xmlstring),
+                         xmltodict(xmlstring, "minidom"))
 
     def test_parse_docstring(self):
         """ Method to test the parsing of docstring.
@@ -36,6 +60,37 @@ class TestUtils(unittest.TestCase):
 
         # Test default case
         self.assertEqual(parse_docstring(""), [])
+        self.assertRaises(ValueError, parse_docstring, "<unit></unit>", "bad")
+
+        # Test the backends parse the same descriptions
+        for func in (module.a_function_to_wrap, module.array_scale):
+            parameters = parse_docstring(func.__doc__)
+            self.assertTrue(len(parameters) > 0)
+            self.assertEqual(parameters,
+                             parse_docstring(func.__doc__, "minidom"))
+
+    def test_capture_environ(self):
+        """ Method to test the environment capture policies.
+        """
+        # Test raise case
+        self.assertRaises(ValueError, capture_environ, "bad")
+
+        # Test the policies
+        baseline = capture_environ("full")
+        self.assertEqual(baseline, dict(os.environ))
+        self.assertEqual(capture_environ("none"), None)
+        self.assertEqual(capture_environ("whitelist", ["PATH", "_bad_"]),
+                         {"PATH": os.environ["PATH"]})
+        self.assertEqual(capture_environ("diff", baseline), {})
+        os.environ["CASPER_TEST"] = "1"
+        try:
+            del baseline["PATH"]
+            baseline["CASPER_REMOVED"] = "1"
+            self.assertEqual(capture_environ("diff", baseline), {
+                "CASPER_TEST": "1", "PATH": os.environ["PATH"],
+                "CASPER_REMOVED": None})
+        finally:
+            del os.environ["CASPER_TEST"]
 
     def test_controlobject(self):
         """ Method to test the control object.
@@ -47,6 +102,51 @@ class TestUtils(unittest.TestCase):
         controller = ControlObject()
         self.assertRaises(ValueError, controller.__getitem__, "bad")
 
+        # Test the controls are registered in insertion order
+        for name in ("c", "a", "b"):
+            setattr(controller, name, controls["Int"]())
+        self.assertEqual(controller.controls, ["c", "a", "b"])
+        self.assertTrue("a" in controller)
+        self.assertFalse("_controls" in controller)
+        self.assertTrue(controller["a"] is controller.a)
+        controller.a = 1
+        self.assertEqual(controller["a"].value, 1)
+
+    def test_controlobject_batch(self):
+        """ Method to test the control object transactions.
+        """
+        # Create two observed controls
+        controller = ControlObject()
+        controller.a = controls["Int"]()
+        controller.b = controls["Int"]()
+        signals = []
+        controller.a.add_observer("value", signals.append)
+        controller.b.add_observer("value", signals.append)
+
+        # Test the values are set at the end of the transaction and that the
+        # observers are notified once with the last values
+        with controller.batch():
+            controller.a = 1
+            controller.b = 2
+            controller.a = 3
+            with controller.batch():
+                controller.b = 4
+            self.assertEqual(controller.a.value, None)
+        self.assertEqual([controller.a.value, controller.b.value], [3, 4])
+        self.assertEqual([signal.value for signal in signals], [3, 4])
+        self.assertEqual(controller.controls, ["a", "b"])
+
+        # Test the recorded values are discarded on error
+        try:
+            with controller.batch():
+                controller.a = 5
+                raise RuntimeError
+        except RuntimeError:
+            pass
+        self.assertEqual(controller.a.value, 3)
+        controller.a = 6
+        self.assertEqual(controller.a.value, 6)
+
 
 def test():
     """ Function to execute unitests.
@@ -9,19 +9,44 @@
 
 # System import
 import os
+import contextlib
 
 # Xml import
 import xml.dom.minidom
+import xml.etree.ElementTree as ElementTree
 from casper.lib.base.xmltodict import xmltodict
 
 
 class ControlObject(object):
     """ Dummy class for controls.
+
+    The control values can be set in a transaction (see 'batch'): the
+    validation of the new values and the notification of the observers are
+    deferred until the end of the transaction.
     """
-    def __init__(self):
+    def __init__(self, dataflow=None):
         """ Initilaize the ControlObject class.
+
+        Parameters
+        ----------
+        dataflow: Dataflow (optional, default None)
+            the links of the pipeline owning the controls. If specified, the
+            values set in a transaction are propagated in a single pass
+            through the pipeline links.
+        """
+        self._dataflow = dataflow
+        self._pending = None
+        self._controls = {}
+
+    def __contains__(self, name):
+        """ Check if a control is defined.
+
+        Parameters
+        ----------
+        name: string (mandatory)
+            the control name.
         """
-        self.controls = []
+        return name in self._controls
 
     def __getitem__(self, name):
         """ Return a control when an item is asked.
@@ -31,8 +56,8 @@ class ControlObject(object):
         name: string (mandatory)
             the name of the control we want to acess.
         """
-        if name in self.controls:
-            return getattr(self, name)
+        if name in self._controls:
+            return self._controls[name]
         else:
             raise ValueError(
                 "'{0}' is not a valid control name. Controls available are "
@@ -42,7 +67,7 @@ class ControlObject(object):
         """ When a new attribute is set, store the attribute name in the
         'controls'.
         When the attribute is a control set the new value to the control value
-        attribute.
+        attribute, or record it during a transaction.
 
         Parameters
         ----------
@@ -51,18 +76,56 @@ class ControlObject(object):
         value: object (mandatory)
             the value of the attribute to set.
         """
-        # Store attribute names
-        if hasattr(self, "controls") and name not in self.controls:
-            self.controls.append(name)
+        # Private attributes defined in the constructor
+        registry = self.__dict__.get("_controls")
+        if registry is None:
+            super(ControlObject, self).__setattr__(name, value)
 
         # Control special case
-        if hasattr(self, name):
-            self.__getattribute__(name).value = value
-
-        # Default case
+        elif name in registry:
+            control = registry[name]
+            if self._pending is not None:
+                self._pending[control] = value
+            else:
+                control.value = value
+
+        # Default case: store the attribute in the controls
         else:
+            registry[name] = value
             super(ControlObject, self).__setattr__(name, value)
 
+    @property
+    def controls(self):
+        """ The control names in insertion order.
+        """
+        return list(self._controls)
+
+    @contextlib.contextmanager
+    def batch(self):
+        """ Set several control values in a transaction.
+
+        The values set in the transaction are recorded: the controls keep
+        their previous values until the end of the transaction where each
+        control is validated and set once with the last recorded value, and
+        its observers are notified once. The recorded values are discarded
+        if an exception is raised in the transaction. A nested transaction
+        is part of the enclosing one.
+        """
+        if self._pending is not None:
+            yield self
+            return
+        super(ControlObject, self).__setattr__("_pending", {})
+        try:
+            yield self
+            updates = list(self._pending.items())
+        finally:
+            super(ControlObject, self).__setattr__("_pending", None)
+        if self._dataflow is not None:
+            self._dataflow.update(updates)
+        else:
+            for control, value in updates:
+                control.value = value
+
 
 def title_for(title):
     """ Create a title from an underscore-separated string.
@@ -80,13 +143,55 @@ def title_for(title):
     return title.replace("_", " ").title().replace(" ", "")
 
 
-def parse_docstring(docstring):
+def capture_environ(policy="none", reference=None):
+    """ Capture the process environment following a policy.
+
+    Parameters
+    ----------
+    policy: str (optional, default 'none')
+        the capture policy: 'none' captures nothing, 'whitelist' captures
+        the variables listed in 'reference', 'diff' captures the variables
+        that differ from the 'reference' environment (a removed variable is
+        set to None) and 'full' captures the whole environment.
+    reference: list or dict (optional, default None)
+        the whitelist variable names or the baseline environment.
+
+    Returns
+    -------
+    environ: dict
+        the captured environment, None if the policy is 'none'.
+    """
+    if policy == "none":
+        return None
+    elif policy == "full":
+        return dict(os.environ)
+    elif policy == "whitelist":
+        return dict((name, os.environ[name]) for name in reference or []
+                    if name in os.environ)
+    elif policy == "diff":
+        reference = reference or {}
+        environ = dict((name, value) for name, value in os.environ.items()
+                       if reference.get(name) != value)
+        for name in reference:
+            if name not in os.environ:
+                environ[name] = None
+        return environ
+    else:
+        raise ValueError(
+            "Unrecognized environment capture policy '{0}'. Supported "
+            "policies are {1}.".format(
+                policy, ["none", "whitelist", "diff", "full"]))
+
+
+def parse_docstring(docstring, backend="etree"):
     """ Parse the given docstring to get the <unit> xml-like structure.
 
     Parameters
     ----------
     docstring: str (mandatory)
         a string where we will try to found the <process> xml-like structure.
+    backend: str (optional, default 'etree')
+        the xml parser: 'etree' (ElementTree) or 'minidom'.
 
     Returns
     -------
@@ -109,28 +214,47 @@ def parse_docstring(docstring):
         return parameters
 
     # Find all the xml 'input', 'output' and 'return' tag elements
-    document = xml.dom.minidom.parseString(capsul_description)
-    for node in document.childNodes[0].childNodes:
+    if backend == "etree":
+        for node in ElementTree.fromstring(capsul_description):
+
+            # Assert we have an 'item' node
+            if node.tag not in ["input", "output"]:
+                continue
+
+            # Set each xml 'item' tag element in the parameter list
+            parameters.append(
+                dict(list(node.attrib.items()) + [("role", node.tag)]))
+
+    elif backend == "minidom":
+        document = xml.dom.minidom.parseString(capsul_description)
+        for node in document.childNodes[0].childNodes:
+
+            # Assert we have an 'item' node
+            if (node.nodeType != node.ELEMENT_NODE or
+                    node.tagName not in ["input", "output"]):
+                continue
 
-        # Assert we have an 'item' node
-        if (node.nodeType != node.ELEMENT_NODE or
-                node.tagName not in ["input", "output"]):
-            continue
+            # Set each xml 'item' tag element in the parameter list
+            parameters.append(
+                dict(list(node.attributes.items()) + [("role", node.tagName)]))
 
-        # Set each xml 'item' tag element in the parameter list
-        parameters.append(
-            dict(node.attributes.items() + [("role", node.tagName)]))
+    else:
+        raise ValueError(
+            "Unrecognized xml backend '{0}'. Supported backends are "
+            "{1}.".format(backend, ["etree", "minidom"]))
 
     return parameters
 
 
-def load_xml_description(xmlfile):
+def load_xml_description(xmlfile, backend="etree"):
     """ Load the given xml description.
 
     Parameters
     ----------
     xmlfile: string (mandatory)
         a file containing a xml formated description.
+    backend: str (optional, default 'etree')
+        the xml parser: 'etree' (ElementTree) or 'minidom'.
 
     Returns
     -------
@@ -144,7 +268,7 @@ def load_xml_description(xmlfile):
 
     # Parse the xml file
     with open(xmlfile) as open_description:
-        desc = xmltodict(open_description.read())
+        desc = xmltodict(open_description.read(), backend)
 
     return desc
 
@@ -152,7 +276,10 @@ def load_xml_description(xmlfile):
 def workerfunction(func):
     """ Function that can be used as a decorator for pbox call function.
 
-    Insure that all the workers terminate properly.
+    If the execution fails, insure that a pool created for the execution is
+    stopped with 'WorkerPool.shutdown', that the jobs in progress of a
+    persistent pool are completed so that the pool can be reused, and that
+    the shared files are removed. The error is then raised again.
 
     Parameters
     ----------
@@ -168,8 +295,15 @@ def workerfunction(func):
         try:
             return func(self, *args, **kwargs)
         except:
-            for process in self.workers:
-                process.terminate()
-                process.join()
+            if getattr(self, "_execution_pool", None) is not None:
+                pool, is_temporary_pool = self._execution_pool
+                self._execution_pool = None
+                if is_temporary_pool:
+                    pool.shutdown()
+                else:
+                    pool.wait()
+            if getattr(self, "shared", None) is not None:
+                self.shared.close()
+                self.shared = None
             raise
     return decorated_func